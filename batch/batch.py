@@ -0,0 +1,238 @@
+import argparse
+import io
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from cache.cache import cached_assemble, cached_compile, cached_parse, cached_transpile, get_cache_directory
+from compiler.compiler import compile_program
+from compiler.computer import execute_program
+from compiler.optimizer import optimize
+from interpreter.interpreter import interpret
+from interpreter.closures import interpret_closures
+from interpreter.machine import interpret_machine
+from transpiler.transpile import run_python
+from vm.bytecode import compile_bytecode
+from vm.vm import run_bytecode
+from streams.streams import BUFFER_LINES, Streams, split_lines, using_streams
+
+"""
+Runs many jobs of PyScript programs in a pool of worker processes
+
+python3 batch/batch.py jobs.jsonl --output results.jsonl
+python3 batch/batch.py jobs.jsonl --output results.jsonl --workers 8 --timeout 10
+
+the manifest has one job per line, only script is required
+    {"id": "job-1", "script": "programs/collatz.ps", "input": ["97"], "mode": "-interpret"}
+    input is the text or the list of lines read by capture, mode is one of the modes below, -interpret by default
+
+every distinct script and mode is prepared once (parsed, compiled, transpiled...) before any job runs
+and handed to each worker when it starts, so a job only runs the program
+
+the results have one line per job in the order of the manifest
+    {"id": "job-1", "script": "programs/collatz.ps", "mode": "-interpret", "status": 0, "stdout": "...",
+     "error": "", "seconds": 0.0012}
+status is 0 when the program finished, the exit code when it called exit, 1 when it failed and 124 on timeout
+"""
+
+MODES = ["-interpret", "-interpret-closures", "-interpret-machine", "-vm", "-transpile", "-compile", "-compile-optimized"]
+DEFAULT_MODE = "-interpret"
+CHUNK_SIZE = 32 # jobs sent to a worker at a time
+FAILED = 1
+TIMED_OUT = 124
+
+# (script, mode) -> the prepared program, or the error preparing it
+Prepared = Dict[Tuple[str, str], Tuple[object, str]]
+
+class JobTimeout(Exception):
+    pass
+
+# ----------------------------------------------------------------
+# preparing
+# ----------------------------------------------------------------
+def prepare(script: str, mode: str, cache_directory: str):
+    if mode in ["-interpret", "-interpret-closures", "-interpret-machine"]:
+        return cached_parse(script, cache_directory)
+    elif mode == "-vm":
+        return compile_bytecode(*cached_parse(script, cache_directory))
+    elif mode == "-transpile":
+        return cached_transpile(script, cache_directory)
+    elif mode == "-compile":
+        instructions, data, _ = cached_compile(script, cache_directory)
+        return (instructions, data)
+    elif mode == "-compile-optimized":
+        instructions, data, _ = compile_program(optimize(cached_assemble(script, cache_directory)))
+        return (instructions, data)
+    else:
+        assert False, f"Unreachable in prepare, bad mode {mode}"
+
+def prepare_all(jobs: List[Dict]) -> Prepared:
+    cache_directory = get_cache_directory()
+    prepared = {}
+    for job in jobs:
+        key = (job["script"], job["mode"])
+        if key in prepared:
+            continue
+        try:
+            prepared[key] = (prepare(job["script"], job["mode"], cache_directory), "")
+        except Exception as error:
+            prepared[key] = (None, describe_error(error))
+    return prepared
+
+# ----------------------------------------------------------------
+# running, in the workers
+# ----------------------------------------------------------------
+worker_prepared = {}
+worker_timeout = 0.0
+
+def start_worker(prepared: Prepared, timeout: float):
+    global worker_prepared, worker_timeout
+    worker_prepared = prepared
+    worker_timeout = timeout
+
+def run_prepared(mode: str, program):
+    if mode == "-interpret":
+        interpret(*program)
+    elif mode == "-interpret-closures":
+        interpret_closures(*program)
+    elif mode == "-interpret-machine":
+        interpret_machine(*program)
+    elif mode == "-vm":
+        run_bytecode(program)
+    elif mode == "-transpile":
+        run_python(program)
+    elif mode == "-compile" or mode == "-compile-optimized":
+        execute_program(*program)
+    else:
+        assert False, f"Unreachable in run_prepared, bad mode {mode}"
+
+# runs one job on its input lines, returns (status, stdout, error, seconds)
+def run_job(job: Tuple[str, str, List[str]]) -> Tuple[int, str, str, float]:
+    script, mode, input_lines = job
+    program, error = worker_prepared[(script, mode)]
+    if error != "":
+        return (FAILED, "", error, 0.0)
+
+    stdout = io.StringIO()
+    status = 0
+    start = time.perf_counter()
+    try:
+        with using_streams(Streams(input_lines, stdout, BUFFER_LINES)):
+            with time_limit(worker_timeout):
+                run_prepared(mode, program)
+    except JobTimeout:
+        status, error = TIMED_OUT, f"timed out after {worker_timeout}s"
+    except SystemExit as exit:
+        status = exit.code if isinstance(exit.code, int) else FAILED
+    except Exception as exception:
+        status, error = FAILED, describe_error(exception)
+    return (status, stdout.getvalue(), error, time.perf_counter() - start)
+
+# raises JobTimeout in the job after seconds, 0 for no limit
+# the SIGALRM handler from before is put back afterwards, so running inline leaves the caller's handler alone
+class time_limit:
+    def __init__(self, seconds: float):
+        self.seconds = seconds if hasattr(signal, "SIGALRM") else 0
+        self.previous_handler = None
+
+    def __enter__(self):
+        if self.seconds > 0:
+            self.previous_handler = signal.signal(signal.SIGALRM, raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, self.seconds)
+
+    def __exit__(self, *exception):
+        if self.seconds > 0:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self.previous_handler)
+
+def raise_timeout(signal_number, frame):
+    raise JobTimeout()
+
+def describe_error(error: Exception) -> str:
+    return f"{type(error).__name__}: {error}"
+
+# ----------------------------------------------------------------
+# manifest and results
+# ----------------------------------------------------------------
+def read_manifest(file_name: str) -> List[Dict]:
+    jobs = []
+    with open(file_name, "r") as f:
+        for number, line in enumerate(f, 1):
+            if line.strip() == "":
+                continue
+            job = json.loads(line)
+            if "script" not in job:
+                raise ValueError(f"{file_name} line {number}: a job needs a script")
+            mode = job.get("mode", DEFAULT_MODE)
+            if mode not in MODES:
+                raise ValueError(f"{file_name} line {number}: unknown mode {mode}, expected one of {', '.join(MODES)}")
+            input_lines = job.get("input", [])
+            if isinstance(input_lines, str):
+                input_lines = split_lines(input_lines)
+            jobs.append({"id": job.get("id", str(len(jobs))), "script": job["script"], "mode": mode, "input": input_lines})
+    return jobs
+
+def run_batch(jobs: List[Dict], output_file: str, workers: int, timeout: float, chunk_size: int) -> int:
+    prepared = prepare_all(jobs)
+    tasks = [(job["script"], job["mode"], job["input"]) for job in jobs]
+    failures = 0
+    with open(output_file, "w") as f:
+        if workers == 0:
+            # in this process, for debugging
+            start_worker(prepared, timeout)
+            results = map(run_job, tasks)
+            failures = write_results(jobs, results, f)
+        else:
+            with ProcessPoolExecutor(workers, initializer=start_worker, initargs=(prepared, timeout)) as executor:
+                failures = write_results(jobs, executor.map(run_job, tasks, chunksize=chunk_size), f)
+    return failures
+
+# writes one line per result as it arrives, returns the number of failed jobs
+def write_results(jobs: List[Dict], results, f) -> int:
+    failures = 0
+    for job, (status, stdout, error, seconds) in zip(jobs, results):
+        if status != 0:
+            failures += 1
+        f.write(json.dumps({
+            "id": job["id"],
+            "script": job["script"],
+            "mode": job["mode"],
+            "status": status,
+            "stdout": stdout,
+            "error": error,
+            "seconds": round(seconds, 6)
+        }) + "\n")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="run a manifest of PyScript jobs in a pool of worker processes")
+    parser.add_argument("manifest", help="JSON lines file with one job per line")
+    parser.add_argument("--output", default="results.jsonl", help="JSON lines file for the results")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes, 0 runs every job here")
+    parser.add_argument("--timeout", type=float, default=0, help="seconds a job may run, 0 for no limit")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="jobs sent to a worker at a time")
+    arguments = parser.parse_args()
+
+    try:
+        jobs = read_manifest(arguments.manifest)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    failures = run_batch(jobs, arguments.output, arguments.workers, arguments.timeout, arguments.chunk_size)
+    seconds = time.perf_counter() - start
+    rate = len(jobs) / seconds if seconds > 0 else 0
+    print(f"{len(jobs)} jobs, {failures} failed, {seconds:.2f}s ({rate:.0f} jobs/s), results in {arguments.output}",
+        file=sys.stderr)
+    if failures > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
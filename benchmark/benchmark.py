@@ -0,0 +1,325 @@
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from parsing.parse import parse
+from compiler.assembler import assemble
+from compiler.compiler import compile_program
+from compiler.computer import execute_program
+from compiler.object_file import read_object, write_object
+from compiler.profiler import Profile
+from interpreter.interpreter import interpret
+from vm.bytecode import compile_bytecode
+from vm.vm import run_bytecode
+from transpiler.transpile import run_python, transpile
+from streams.streams import BUFFER_LINES, Streams, using_streams
+
+"""
+Runs every program in programs/ through each pipeline and compares the results against a baseline
+
+python3 benchmark/benchmark.py                      compare against benchmark/baseline.json
+python3 benchmark/benchmark.py --save-baseline      store the results as the new baseline
+python3 benchmark/benchmark.py --output results.json --threshold 0.1 fizzbuzz prime
+python3 benchmark/benchmark.py --times --baseline local.json --save-baseline   record seconds on this machine
+python3 benchmark/benchmark.py --times --baseline local.json                   compare seconds on this machine
+
+pipelines
+    interpret       parse, interpret
+    vm              parse, compile to bytecode, execute
+    transpile       parse, transpile to Python, execute
+    compile         parse, assemble, compile, execute
+    run-compiled    load the binary object file, execute
+
+each pipeline records per stage and in total
+    seconds         the best of --repeat runs
+    work            the seconds divided by the best seconds of a fixed calibration loop run between the pipelines
+    peak_memory     the most memory allocated during the stage beyond what was allocated before it
+and also the total relative to interpret and for compiled programs the simulated cycles
+exits with 1 when any work, peak memory, relative total or cycles is worse than the baseline by more than the threshold
+
+work, peak memory, relative totals and cycles are about the same on every machine, so they are what the committed baseline holds
+seconds are only saved and compared with --times, against a baseline saved with --times on the same machine
+"""
+
+BASELINE_FILE = os.path.join(root_directory, "benchmark", "baseline.json")
+PROGRAMS_DIRECTORY = os.path.join(root_directory, "programs")
+PIPELINES = ["interpret", "vm", "transpile", "compile", "run-compiled"]
+THRESHOLD = 0.25 # allowed slowdown, 0.25 is 25%
+REPEAT = 5
+MINIMUM_SECONDS = 0.01 # stages faster than this are too noisy to compare
+MINIMUM_BYTES = 4096 # stages allocating less than this are too noisy to compare
+CALIBRATION_ITERATIONS = 200000 # about as many seconds as a small program takes to interpret
+PORTABLE_MEASURES = ["work", "peak_memory", "relative", "cycles"] # about the same on every machine
+TIMED_MEASURES = ["seconds"]
+
+# the lines fed to the capture commands of each program
+program_inputs = {
+    "collatz": ["97"],
+    "collatz_recursive": ["97"],
+    "factorial": ["15"],
+    "fibonacci": ["60"],
+    "fizzbuzz": ["300"],
+    "palindrome": ["1234321"],
+    "palindromic_prime": ["1000"],
+    "prime": ["400"],
+    "square_root": ["100000"]
+}
+
+# ----------------------------------------------------------------
+# running
+# ----------------------------------------------------------------
+# runs fn on input_lines with its output thrown away, returns its result
+# through buffered streams, the same as main.py and batch/batch.py
+def run_scripted(fn: Callable, input_lines: List[str]):
+    with using_streams(Streams(input_lines, io.StringIO(), BUFFER_LINES)):
+        return fn()
+
+# the garbage collector is off while timing, as in timeit, so a collection left over from another stage is not counted
+# the garbage collector is off while timing, as in timeit, so a collection left over from another stage is not counted
+def time_stage(stages: Dict[str, float], stage: str, fn: Callable):
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = fn()
+        stages[stage] = time.perf_counter() - start
+    finally:
+        gc.enable()
+    return result
+
+# for use while tracemalloc traces, the memory still held by the values of earlier stages is not counted
+def measure_stage_memory(stages: Dict[str, int], stage: str, fn: Callable):
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    result = fn()
+    stages[stage] = tracemalloc.get_traced_memory()[1] - before
+    return result
+
+# a fixed amount of plain Python work, the unit the work measure counts in
+def calibration_loop():
+    state = {"value": 0}
+    for i in range(CALIBRATION_ITERATIONS):
+        state["value"] = (state["value"] + i * 7) % 1000003
+    return state["value"]
+
+# one run of the pipeline, returns what measure_stage measured for each stage
+def run_pipeline(pipeline: str, file_name: str, input_lines: List[str], measure_stage: Callable = time_stage) -> Dict:
+    stages = {}
+    if pipeline == "interpret":
+        parsed = measure_stage(stages, "parse", lambda: parse(file_name))
+        measure_stage(stages, "execute", lambda: run_scripted(lambda: interpret(*parsed), input_lines))
+    elif pipeline == "vm":
+        parsed = measure_stage(stages, "parse", lambda: parse(file_name))
+        bytecode = measure_stage(stages, "compile", lambda: compile_bytecode(*parsed))
+        measure_stage(stages, "execute", lambda: run_scripted(lambda: run_bytecode(bytecode), input_lines))
+    elif pipeline == "transpile":
+        parsed = measure_stage(stages, "parse", lambda: parse(file_name))
+        source = measure_stage(stages, "transpile", lambda: transpile(*parsed))
+        measure_stage(stages, "execute", lambda: run_scripted(lambda: run_python(source), input_lines))
+    elif pipeline == "compile":
+        parsed = measure_stage(stages, "parse", lambda: parse(file_name))
+        assembled = measure_stage(stages, "assemble", lambda: assemble(*parsed))
+        instructions, data, _ = measure_stage(stages, "compile", lambda: compile_program(assembled))
+        measure_stage(stages, "execute", lambda: run_scripted(lambda: execute_program(instructions, data), input_lines))
+    elif pipeline == "run-compiled":
+        object_file = write_object(*compile_program(assemble(*parse(file_name))))
+        instructions, data, _ = measure_stage(stages, "load", lambda: read_object(object_file))
+        measure_stage(stages, "execute", lambda: run_scripted(lambda: execute_program(instructions, data), input_lines))
+    else:
+        assert False, f"Unreachable in run_pipeline, bad pipeline {pipeline}"
+    return stages
+
+def get_peak_memory(pipeline: str, file_name: str, input_lines: List[str]) -> Dict[str, int]:
+    tracemalloc.start()
+    try:
+        return run_pipeline(pipeline, file_name, input_lines, measure_stage_memory)
+    finally:
+        tracemalloc.stop()
+
+def get_cycles(file_name: str, input_lines: List[str]) -> int:
+    instructions, data, symbols = compile_program(assemble(*parse(file_name)))
+    profile = Profile(symbols)
+    run_scripted(lambda: execute_program(instructions, data, profile=profile), input_lines)
+    return profile.get_cycles()
+
+def benchmark_program(name: str, repeat: int) -> Dict[str, Dict]:
+    file_name = os.path.join(PROGRAMS_DIRECTORY, f"{name}.ps")
+    input_lines = program_inputs[name]
+    cycles = get_cycles(file_name, input_lines)
+
+    # the pipelines and the calibration loop take turns, so a slow moment of the machine slows all of them and not one
+    runs = {pipeline: [] for pipeline in PIPELINES}
+    calibration = {}
+    calibrations = []
+    for _ in range(repeat):
+        for pipeline in PIPELINES:
+            time_stage(calibration, "calibration", calibration_loop)
+            calibrations.append(calibration["calibration"])
+            runs[pipeline].append(run_pipeline(pipeline, file_name, input_lines))
+    calibration_seconds = min(calibrations)
+
+    result = {}
+    for pipeline in PIPELINES:
+        seconds = {stage: min(run[stage] for run in runs[pipeline]) for stage in runs[pipeline][0]}
+        seconds["total"] = sum(seconds.values())
+        measures = {
+            "seconds": seconds,
+            "work": {stage: value / calibration_seconds for stage, value in seconds.items()},
+            "peak_memory": get_peak_memory(pipeline, file_name, input_lines)
+        }
+        if pipeline == "compile" or pipeline == "run-compiled":
+            measures["cycles"] = cycles
+        result[pipeline] = measures
+    # a ratio between engines on the same machine, where the seconds of each are not
+    for measures in result.values():
+        measures["relative"] = measures["seconds"]["total"] / result["interpret"]["seconds"]["total"]
+    return result
+
+# the results without the seconds, which only mean anything on the machine they were measured on
+def without_times(results: Dict) -> Dict:
+    return {
+        **results,
+        "programs": {
+            name: {
+                pipeline: {measure: value for measure, value in measures.items() if measure in PORTABLE_MEASURES}
+                for pipeline, measures in pipelines.items()
+            }
+            for name, pipelines in results["programs"].items()
+        }
+    }
+
+def benchmark(names: List[str], repeat: int) -> Dict:
+    return {
+        "python": sys.version.split()[0],
+        "repeat": repeat,
+        "programs": {name: benchmark_program(name, repeat) for name in names}
+    }
+
+# ----------------------------------------------------------------
+# comparing
+# ----------------------------------------------------------------
+# every measure which got worse than the baseline by more than threshold
+# the seconds are only compared with times, the baseline must then come from this machine
+def compare(results: Dict, baseline: Dict, threshold: float, times: bool = False) -> List[str]:
+    regressions = []
+    compared_measures = PORTABLE_MEASURES + (TIMED_MEASURES if times else [])
+    for name, pipelines in results["programs"].items():
+        for pipeline, measures in pipelines.items():
+            base = baseline.get("programs", {}).get(name, {}).get(pipeline, {})
+            for measure in compared_measures:
+                for stage, value, base_value in get_pairs(measures.get(measure), base.get(measure)):
+                    if not base_value or is_noise(measure, stage, measures):
+                        continue
+                    change = value / base_value - 1
+                    if change > threshold:
+                        label = measure if stage == "" else f"{measure} {stage}"
+                        regressions.append(f"{name} {pipeline} {label}: {format_measure(measure, base_value)} -> "
+                            + f"{format_measure(measure, value)} (+{100 * change:.1f}%)")
+    return regressions
+
+# (stage, value, base value) for a measure taken per stage, ("", value, base value) for a single measure
+def get_pairs(value, base_value) -> List[Tuple[str, float, float]]:
+    if value is None or base_value is None:
+        return []
+    if isinstance(value, dict):
+        return [(stage, value[stage], base_value.get(stage)) for stage in value if stage in base_value]
+    return [("", value, base_value)]
+
+# the stage was too quick or allocated too little in this run for a change to mean anything
+def is_noise(measure: str, stage: str, measures: Dict) -> bool:
+    if measure == "peak_memory":
+        return measures["peak_memory"][stage] < MINIMUM_BYTES
+    if measure == "relative":
+        return measures["seconds"]["total"] < MINIMUM_SECONDS
+    if measure == "work" or measure == "seconds":
+        return measures["seconds"][stage] < MINIMUM_SECONDS
+    return False
+
+def format_measure(measure: str, value) -> str:
+    if measure == "peak_memory":
+        return f"{value / 1024:.0f}KB"
+    if measure == "cycles":
+        return str(value)
+    if measure == "relative":
+        return f"{value:.2f}x"
+    if measure == "work":
+        return f"{value:.2f}"
+    return f"{1000 * value:.2f}ms"
+
+def format_results(results: Dict) -> str:
+    lines = [f"{'program':<20} {'pipeline':<14} {'total':>10} {'execute':>10} {'work':>8} {'relative':>9} "
+        + f"{'cycles':>10} {'execute memory':>15}"]
+    for name, pipelines in results["programs"].items():
+        for pipeline, measures in pipelines.items():
+            cycles = str(measures.get("cycles", "-"))
+            lines.append(f"{name:<20} {pipeline:<14} {format_measure('seconds', measures['seconds']['total']):>10} "
+                + f"{format_measure('seconds', measures['seconds']['execute']):>10} "
+                + f"{format_measure('work', measures['work']['total']):>8} "
+                + f"{format_measure('relative', measures['relative']):>9} {cycles:>10} "
+                + f"{format_measure('peak_memory', measures['peak_memory']['execute']):>15}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the programs in programs/ through every pipeline")
+    parser.add_argument("programs", nargs="*", default=list(program_inputs), help="programs to run, all by default")
+    parser.add_argument("--output", default="", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown, 0.25 is 25%%")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs per pipeline, the best is kept")
+    parser.add_argument("--times", action="store_true",
+        help="also save or compare the seconds, only against a baseline saved on this machine")
+    arguments = parser.parse_args()
+
+    for name in arguments.programs:
+        if name not in program_inputs:
+            parser.error(f"unknown program {name}, expected one of {', '.join(program_inputs)}")
+
+    results = benchmark(arguments.programs, arguments.repeat)
+    print(format_results(results))
+    if arguments.output != "":
+        write_json(arguments.output, results)
+    if arguments.save_baseline:
+        write_json(arguments.baseline, results if arguments.times else without_times(results))
+        print(f"saved baseline to {arguments.baseline}")
+        return
+
+    if not os.path.exists(arguments.baseline):
+        print(f"no baseline at {arguments.baseline}, run with --save-baseline to create one")
+        return
+    with open(arguments.baseline, "r") as f:
+        baseline = json.load(f)
+    if arguments.times and not has_times(baseline):
+        print(f"no timings in {arguments.baseline}, save a baseline on this machine with --times --save-baseline")
+        sys.exit(1)
+    regressions = compare(results, baseline, arguments.threshold, arguments.times)
+    if regressions:
+        print(f"{len(regressions)} regressions over {100 * arguments.threshold:.0f}%:")
+        for regression in regressions:
+            print(f"    {regression}")
+        sys.exit(1)
+    print(f"no regressions over {100 * arguments.threshold:.0f}%")
+
+def has_times(baseline: Dict) -> bool:
+    return any(
+        measure in measures
+        for pipelines in baseline.get("programs", {}).values()
+        for measures in pipelines.values()
+        for measure in TIMED_MEASURES
+    )
+
+def write_json(file_name: str, value: Dict):
+    with open(file_name, "w") as f:
+        json.dump(value, f, indent=4)
+
+if __name__ == "__main__":
+    main()
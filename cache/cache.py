@@ -0,0 +1,153 @@
+import hashlib
+import os
+import pickle
+from typing import Callable, Dict, List, Tuple
+
+from parsing.parse import parse, parse_source
+from compiler.assembler import assemble
+from compiler.compiler import compile_program
+from compiler.instruction import Instruction
+from transpiler.transpile import transpile
+
+# caches the parsed, assembled and compiled forms of a program on disk
+# entries are keyed by a hash of the program source, the stage and the toolchain version
+# so a changed program or a changed parser/assembler/compiler never reuses a stale entry
+
+# set this environment variable to a directory to turn the cache on
+CACHE_DIRECTORY_VARIABLE = "PYSCRIPT_CACHE_DIR"
+MAX_CACHE_SIZE = 64 * 1024 * 1024 # bytes, least recently used entries are evicted past this
+
+PARSED = "parsed"
+ASSEMBLED = "assembled"
+COMPILED = "compiled"
+TRANSPILED = "transpiled"
+
+toolchain_directories = ["parsing", "tokenization", "folding", "compiler", "transpiler", "cache"]
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def get_cache_directory() -> str:
+    return os.environ.get(CACHE_DIRECTORY_VARIABLE, "")
+
+# hash of the source of the toolchain itself
+toolchain_version = ""
+def get_toolchain_version() -> str:
+    global toolchain_version
+    if toolchain_version == "":
+        hasher = hashlib.sha256()
+        for directory in toolchain_directories:
+            path = os.path.join(root_directory, directory)
+            for file_name in sorted(os.listdir(path)):
+                if file_name.endswith(".py"):
+                    hasher.update(file_name.encode())
+                    with open(os.path.join(path, file_name), "rb") as f:
+                        hasher.update(f.read())
+        toolchain_version = hasher.hexdigest()
+    return toolchain_version
+
+def get_key(source: str, stage: str) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(f"{get_toolchain_version()}\n{stage}\n".encode())
+    hasher.update(source.encode())
+    return hasher.hexdigest()
+
+def get_entry_path(directory: str, source: str, stage: str) -> str:
+    return os.path.join(directory, f"{get_key(source, stage)}.pickle")
+
+# returns None if the entry is missing or unreadable
+def cache_load(directory: str, source: str, stage: str):
+    path = get_entry_path(directory, source, stage)
+    try:
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+        os.utime(path) # mark as recently used
+        return value
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError):
+        return None
+
+# a cache which cannot be written to is only a cache which always misses
+def cache_store(directory: str, source: str, stage: str, value, max_size: int = MAX_CACHE_SIZE):
+    path = get_entry_path(directory, source, stage)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(temporary_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path) # atomic so concurrent runs never see half an entry
+        evict(directory, max_size)
+    except (OSError, pickle.PickleError):
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+
+# removes the least recently used entries until the cache fits in max_size
+def evict(directory: str, max_size: int):
+    entries = []
+    total_size = 0
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".pickle"):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total_size -= size
+
+# returns the cached value for the stage or builds and stores it
+def cached(directory: str, source: str, stage: str, build: Callable):
+    if directory == "":
+        return build()
+    value = cache_load(directory, source, stage)
+    if value is None:
+        value = build()
+        cache_store(directory, source, stage, value)
+    return value
+
+def read_source(file_name: str) -> str:
+    with open(file_name, "r") as f:
+        return f.read()
+
+# ----------------------------------------------------------------
+# cached stages
+# ----------------------------------------------------------------
+# the file is read once and every stage is built from and keyed by that same source,
+# so a file edited while it is being built never stores a result under the wrong key
+def cached_parse(file_name: str, directory: str = ""):
+    if directory == "":
+        return parse(file_name)
+    return cached_parse_source(read_source(file_name), directory)
+
+def cached_assemble(file_name: str, directory: str = "") -> List[Instruction]:
+    if directory == "":
+        return assemble(*parse(file_name))
+    return cached_assemble_source(read_source(file_name), directory)
+
+# the instructions, data and symbols from compiler.compile_program
+def cached_compile(file_name: str, directory: str = "") -> Tuple[List[Instruction], List[Tuple[int, int]], Dict[str, int]]:
+    if directory == "":
+        return compile_program(assemble(*parse(file_name)))
+    source = read_source(file_name)
+    return cached(directory, source, COMPILED, lambda: compile_program(cached_assemble_source(source, directory)))
+
+def cached_transpile(file_name: str, directory: str = "") -> str:
+    if directory == "":
+        return transpile(*parse(file_name))
+    source = read_source(file_name)
+    return cached(directory, source, TRANSPILED, lambda: transpile(*cached_parse_source(source, directory)))
+
+def cached_parse_source(source: str, directory: str):
+    return cached(directory, source, PARSED, lambda: parse_source(source))
+
+def cached_assemble_source(source: str, directory: str) -> List[Instruction]:
+    return cached(directory, source, ASSEMBLED, lambda: assemble(*cached_parse_source(source, directory)))
@@ -8,70 +8,82 @@ from tokenization.value import BBinary, BCompare, BLiteral, BUnary, Boolean, NBi
 from tokenization.enums import PLUS, MINUS, DIVIDE, MULTIPLY, MOD
 from tokenization.enums import AND, OR, NOT
 from tokenization.enums import EQUAL, NOTEQUAL, LESSTHAN, GREATERTHAN
+from folding.fold import fold_program
+from folding.tail_calls import mark_tail_calls
+from compiler.instruction import IMMEDIATE, Instruction, Operand, immediate, direct, indirect, label, data, pstr
 
 SP = "_STACK_POINTER"
 RA = "_RETURN_ADDRESS"
 RES = "_RESULT"
+REGISTER_COUNT = 8 # virtual registers for the temporaries of an expression
+registers = [f"_REGISTER_{i}" for i in range(REGISTER_COUNT)]
+result_operand = direct(RES)
+register_operands = [direct(register) for register in registers]
 
 # ----------------------------------------------------------------
 # main assemble function
 # ----------------------------------------------------------------
-def assemble(declarations: List[Declaration], functions: List[Function], body: List[Command]):
+# returns the program as instructions from compiler/instruction.py,
+# compiler.instruction.format_program turns them into assembly text
+def assemble(declarations: List[Declaration], functions: List[Function], body: List[Command]) -> List[Instruction]:
+    declarations, functions, body = fold_program(declarations, functions, body)
+    functions = mark_tail_calls(functions)
     assembled_declarations = assemble_declarations(declarations)
     assembled_functions = assemble_functions(functions)
     assembled_body = assemble_body(body)
 
     result = []
-    result.append("BRCH _START_BODY") # begin at _START_BODY
+    result.append(("BRCH", immediate("_START_BODY"))) # begin at _START_BODY
     result.extend(assembled_declarations)
     result.extend(assembled_functions)
-    result.append("LABEL _START_BODY")
+    result.append(label("_START_BODY"))
     result.extend(assembled_body)
-    result.append("BRCH _HALT_LABEL")
-    result.append("LABEL _HALT_LABEL") # branch here to halt
-    result.append("HALT")
-    result.append(f"DATA {RES} 0") # store intermediate and final results
-    result.append(f"DATA {RA} 0")
-    result.append(f"DATA {SP} _STACK") # pointer to the top of the stack
-    result.append("LABEL _STACK") # start of stack
+    result.append(("BRCH", immediate("_HALT_LABEL")))
+    result.append(label("_HALT_LABEL")) # branch here to halt
+    result.append(("HALT",))
+    result.append(data(RES, 0)) # store intermediate and final results
+    result.extend(data(register, 0) for register in registers)
+    result.append(data(RA, 0))
+    result.append(data(SP, "_STACK")) # pointer to the top of the stack
+    result.append(label("_STACK")) # start of stack
     return result
 
 # assemble the declarations
 # from [Declaration(var1, val1), Declaration(var2, val2), ...]
-# to   ["DATA var1 val1", "DATA var2, val2", ...]
+# to   [DATA var1 val1, DATA var2 val2, ...]
 # the value is guarenteed to be a number literal
-def assemble_declarations(declarations: List[Declaration]) -> List[str]:
+def assemble_declarations(declarations: List[Declaration]) -> List[Instruction]:
     result = []
     for declaration in declarations:
-        assembled = f"DATA {declaration.variable} {get_number_from_value(declaration.value)}"
+        assembled = data(declaration.variable, get_number_from_value(declaration.value))
         result.append(assembled)
     return result
 
 # assemble the functions
-def assemble_functions(functions: List[Function]) -> List[str]:
+def assemble_functions(functions: List[Function]) -> List[Instruction]:
     result = []
     for function in functions:
         assembled_function = assemble_function(function)
         result.extend(assembled_function)
     return result
 
-def assemble_function(function: Function) -> List[str]:
+def assemble_function(function: Function) -> List[Instruction]:
     name = function.name
     body = function.body
     assembled_body = assemble_body(body)
 
     result = []
-    result.append(f"LABEL {get_function_label(name)}")
-    result.append(f"MOV (0 {SP}) {RA}")
-    result.append(f"ADD {SP} {SP} 1")
+    result.append(label(get_function_label(name)))
+    result.append(("MOV", indirect(0, SP), direct(RA)))
+    result.append(("ADDI", direct(SP), direct(SP), immediate(1)))
     result.extend(assembled_body)
-    result.append(f"MOV {RA} (-1 {SP})")
+    result.append(("MOV", direct(RA), indirect(-1, SP)))
     result.extend(pop)
-    result.append(f"BRCH (0 {RA})")
+    result.append(("BRCH", indirect(0, RA)))
     return result
 
 # assemble the body
-def assemble_body(body: List[Command]) -> List[str]:
+def assemble_body(body: List[Command]) -> List[Instruction]:
     result = []
     for command in body:
         assembled_command = assemble_command(command)
@@ -81,7 +93,7 @@ def assemble_body(body: List[Command]) -> List[str]:
 # ----------------------------------------------------------------
 # assemble commands
 # ----------------------------------------------------------------
-def assemble_command(command: Command) -> List[str]:
+def assemble_command(command: Command) -> List[Instruction]:
     type = command.type
     if type == Capture:
         return assemble_capture(command.content)
@@ -100,79 +112,74 @@ def assemble_command(command: Command) -> List[str]:
     else:
         print(f"unreachable in assemble_command bad type: {type}")
 
-def assemble_change(content: Change) -> List[str]:
+def assemble_change(content: Change) -> List[Instruction]:
     result = []
     assembled_value = assemble_value(content.value)
     result.extend(assembled_value)
-    result.append(f"MOV {content.variable} {RES}")
+    result.append(("MOV", direct(content.variable), result_operand))
     return result
 
-def assemble_show(content: Show) -> List[str]:
+def assemble_show(content: Show) -> List[Instruction]:
     if content.value.type == String:
-        return [f'PSTR "{content.value.content.content}"']
+        return [pstr(content.value.content.content)]
     
     result = []
     assembled_value = assemble_value(content.value)
     result.extend(assembled_value)
-    result.append(f"PVAL {RES}")
+    result.append(("PVAL", result_operand))
     return result
 
-def assemble_capture(content: Capture) -> List[str]:
-    return [f"READ {content.variable}"]
+def assemble_capture(content: Capture) -> List[Instruction]:
+    return [("READ", immediate(content.variable))]
 
-def assemble_if(content: If) -> List[str]:
-    assembled_cond = assemble_boolean(content.condition)
+def assemble_if(content: If) -> List[Instruction]:
     assembled_true_body = assemble_body(content.true_part)
     assembled_false_body = assemble_body(content.false_part)
 
-    true_label = get_label()
     false_label = get_label()
     end_label = get_label()
 
     result = []
-    result.extend(assembled_cond)
-    result.append(f"CBNZ {RES} {true_label}")
-    result.append(f"BRCH {false_label}")
-    result.append(f"LABEL {true_label}")
+    result.extend(assemble_branch(content.condition, false_label, False))
     result.extend(assembled_true_body)
-    result.append(f"BRCH {end_label}")
-    result.append(f"LABEL {false_label}")
+    if len(assembled_false_body) > 0:
+        result.append(("BRCH", immediate(end_label)))
+    result.append(label(false_label))
     result.extend(assembled_false_body)
-    result.append(f"BRCH {end_label}")
-    result.append(f"LABEL {end_label}")
+    result.append(label(end_label))
     return result
 
-def assemble_while(content: While) -> List[str]:
-    assembled_cond = assemble_boolean(content.condition)
+# the condition is tested at the bottom so each iteration takes a single branch
+def assemble_while(content: While) -> List[Instruction]:
     assembled_body = assemble_body(content.body)
 
-    top_label = get_label()
     body_label = get_label()
-    end_label = get_label()
+    test_label = get_label()
 
     result = []
-    result.append(f"LABEL {top_label}")
-    result.extend(assembled_cond)
-    result.append(f"CBNZ {RES} {body_label}")
-    result.append(f"BRCH {end_label}")
-    result.append(f"LABEL {body_label}")
+    result.append(("BRCH", immediate(test_label)))
+    result.append(label(body_label))
     result.extend(assembled_body)
-    result.append(f"BRCH {top_label}")
-    result.append(f"LABEL {end_label}")
+    result.append(label(test_label))
+    result.extend(assemble_branch(content.condition, body_label, True))
     return result
 
-def assemble_skip(content: Skip) -> List[str]:
+def assemble_skip(content: Skip) -> List[Instruction]:
     return []
 
-def assemble_run(content: Run) -> List[str]:
-    return [f"BLNK {RA} {get_function_label(content.function)}"]
+# a tail call gives up the frame of the current function before jumping
+# so the called function returns straight to our caller and the stack does not grow
+def assemble_run(content: Run) -> List[Instruction]:
+    if content.tail:
+        return [("MOV", direct(RA), indirect(-1, SP))] + pop + [("BRCH", immediate(get_function_label(content.function)))]
+    return [("BLNK", direct(RA), immediate(get_function_label(content.function)))]
 
 
 
 # ----------------------------------------------------------------
 # assemble values
 # ----------------------------------------------------------------
-def assemble_value(value: Value) -> List[str]:
+def assemble_value(value: Value) -> List[Instruction]:
     type = value.type
     if type == String:
         return assemble_string(value.content)
@@ -183,93 +190,184 @@ def assemble_value(value: Value) -> List[str]:
     else:
         assert False, f"Unreachable in assemble_value bad type {type}"
 
-# generates the assembly which puts the value on the stack
-def assemble_number(num: Number) -> List[str]:
-    type = num.type
-    if type == NBinary:
-        return assemble_nbinary(num.content)
-    elif type == NLiteral:
-        return assemble_nliteral(num.content)
-    elif type == NVariable:
-        return assemble_nvariable(num.content)
-    else:
-        assert False, f"Unreachable in assemble_number, bad type {type}"
+# generates the assembly which puts the value in RES
+def assemble_number(num: Number) -> List[Instruction]:
+    return assemble_into_result(num)
 
-def assemble_nbinary(num: NBinary) -> List[str]:
-    assembled_left = assemble_number(num.left)
-    assembled_right = assemble_number(num.right)
-    operation = get_operation(num.operation)
+def assemble_boolean(boolean: Boolean) -> List[Instruction]:
+    return assemble_into_result(boolean)
 
-    result = []
-    result.extend(assembled_left)
-    result.extend(push)
-    result.extend(assembled_right)
-    result.append(f"{operation} {RES} (-1 {SP}) {RES}")
-    result.extend(pop)
+def assemble_into_result(expression) -> List[Instruction]:
+    result, operand = assemble_expression(expression, [result_operand] + register_operands)
+    if operand != result_operand:
+        result.append(("MOV", result_operand, operand))
     return result
 
-def assemble_nliteral(num: NLiteral) -> List[str]:
-    return [f"MOV {RES} {num.value}"]
-
-def assemble_nvariable(num: NVariable) -> List[str]:
-    return [f"MOV {RES} {num.variable}"]
-
-
-def assemble_boolean(boolean: Boolean) -> List[str]:
-    type = boolean.type
-    if type == BCompare:
-        return assemble_bcompare(boolean.content)
+# generates the assembly which computes expression using the free registers
+# returns the assembly and the operand holding the value, which is the
+# literal or variable itself for a leaf so it never needs a register
+#
+# the child needing more registers is computed first (Sethi-Ullman) so an
+# expression needing at most len(free) registers never touches the stack,
+# past that the first child is spilled to the stack while the other is computed
+def assemble_expression(expression, free: List[Operand]):
+    children = get_children(expression)
+    if len(children) == 0:
+        return ([], get_leaf_operand(expression))
+
+    operation = get_operation(expression.content.operation)
+    if len(children) == 1:
+        result, operand = assemble_expression(children[0], free)
+        target = operand if operand in free else free[0]
+        result.append((operation, target, operand))
+        return (result, target)
+
+    left, right = children
+    result, left_operand, right_operand, spilled = assemble_operands(left, right, free)
+    if left_operand in free:
+        target = left_operand
+    elif right_operand in free:
+        target = right_operand
+    else:
+        target = free[0]
+    result.append(get_binary_instruction(operation, target, left_operand, right_operand))
+    if spilled:
+        result.extend(pop)
+    return (result, target)
+
+# computes both operands of a binary operation, returns the assembly, the two operands and
+# whether the first one computed was spilled to the stack, which must be popped after use
+def assemble_operands(left, right, free: List[Operand]):
+    swapped = get_need(right) > get_need(left)
+    first, second = (right, left) if swapped else (left, right)
+
+    result, first_operand = assemble_expression(first, free)
+    spilled = len(free) == 1 and get_need(second) > 0
+    if spilled:
+        # out of registers, spill the first value
+        result.append(("MOV", indirect(0, SP), first_operand))
+        result.append(("ADDI", direct(SP), direct(SP), immediate(1)))
+        first_operand = indirect(-1, SP)
+        remaining = free
+    else:
+        remaining = [register for register in free if register != first_operand]
+    assembled_second, second_operand = assemble_expression(second, remaining)
+    result.extend(assembled_second)
+
+    if swapped:
+        return (result, second_operand, first_operand, spilled)
+    return (result, first_operand, second_operand, spilled)
+
+# uses the immediate forms when adding or subtracting a literal
+def get_binary_instruction(operation: str, target: Operand, left: Operand, right: Operand) -> Instruction:
+    if operation == "ADD" and left[0] == IMMEDIATE and right[0] != IMMEDIATE:
+        left, right = right, left
+    if (operation == "ADD" or operation == "SUB") and right[0] == IMMEDIATE:
+        return (f"{operation}I", target, left, right)
+    return (operation, target, left, right)
+
+# the number of registers needed to compute expression into a register
+# leaves are used directly as operands and need none
+def get_need(expression) -> int:
+    children = get_children(expression)
+    if len(children) == 0:
+        return 0
+    if len(children) == 1:
+        return max(1, get_need(children[0]))
+    left, right = [get_need(child) for child in children]
+    if left == right:
+        return left + 1
+    return max(left, right)
+
+def get_children(expression) -> list:
+    type = expression.type
+    if type == NBinary or type == BCompare or type == BBinary:
+        return [expression.content.left, expression.content.right]
     elif type == BUnary:
-        return assemble_bunary(boolean.content)
-    elif type == BBinary:
-        return assemble_bbinary(boolean.content)
-    elif type == BLiteral:
-        return assemble_bliteral(boolean.content)
+        return [expression.content.body]
+    elif type == NLiteral or type == NVariable or type == BLiteral:
+        return []
     else:
-        assert False, f"Unreachable in assemble_boolean, bad type: {type}"
-
-def assemble_bcompare(boolean: BCompare) -> List[str]:
-    operation = get_operation(boolean.operation)
-    assembled_left = assemble_number(boolean.left)
-    assembled_right = assemble_number(boolean.right)
+        assert False, f"Unreachable in get_children, bad type {type}"
 
-    result = []
-    result.extend(assembled_left)
-    result.extend(push)
-    result.extend(assembled_right)
-    result.append(f"{operation} {RES} (-1 {SP}) {RES}")
-    result.extend(pop)
-    return result
-
-def assemble_bunary(boolean: BUnary) -> List[str]:
-    operation = get_operation(boolean.operation)
-    assembled_value = assemble_boolean(boolean.body)
+def get_leaf_operand(expression) -> Operand:
+    type = expression.type
+    if type == NLiteral:
+        return immediate(expression.content.value)
+    elif type == NVariable:
+        return direct(expression.content.variable)
+    elif type == BLiteral:
+        return immediate(1 if expression.content.value else 0)
+    else:
+        assert False, f"Unreachable in get_leaf_operand, bad type {type}"
 
-    result = []
-    result.extend(assembled_value)
-    result.append(f"{operation} {RES} {RES}")
+# ----------------------------------------------------------------
+# assemble branches
+# ----------------------------------------------------------------
+# generates the assembly which branches to target when condition is when
+# comparisons use the fused compare and branch ops, and and or skip
+# their right side when the left decides, unless the right side could fail
+def assemble_branch(condition: Boolean, target: str, when: bool) -> List[Instruction]:
+    type = condition.type
+    if type == BLiteral:
+        return [("BRCH", immediate(target))] if condition.content.value == when else []
+    elif type == BUnary and condition.content.operation == NOT:
+        return assemble_branch(condition.content.body, target, not when)
+    elif type == BCompare:
+        return assemble_compare_branch(condition.content, target, when)
+    elif type == BBinary and not can_fail(condition.content.right):
+        return assemble_short_circuit(condition.content, target, when)
+    else:
+        result = assemble_boolean(condition)
+        result.append(("CBNZ" if when else "CBZR", result_operand, immediate(target)))
+        return result
+
+def assemble_compare_branch(boolean: BCompare, target: str, when: bool) -> List[Instruction]:
+    result, left, right, spilled = assemble_operands(boolean.left, boolean.right, [result_operand] + register_operands)
+    if spilled:
+        # the stack slot has to be popped before branching
+        result.append((get_operation(boolean.operation), result_operand, left, right))
+        result.extend(pop)
+        result.append(("CBNZ" if when else "CBZR", result_operand, immediate(target)))
+        return result
+
+    # a > b is b < a
+    fused_branches = {
+        EQUAL: ("BEQ", "BNE", left, right),
+        NOTEQUAL: ("BNE", "BEQ", left, right),
+        LESSTHAN: ("BLT", "BGE", left, right),
+        GREATERTHAN: ("BLT", "BGE", right, left)
+    }
+    if boolean.operation not in fused_branches:
+        assert False, f"Unreachable in assemble_compare_branch, bad operation {boolean.operation}"
+    branch_true, branch_false, first, second = fused_branches[boolean.operation]
+    result.append((branch_true if when else branch_false, first, second, immediate(target)))
     return result
 
-def assemble_bbinary(boolean: BBinary) -> List[str]:
-    operation = get_operation(boolean.operation)
-    assembled_left = assemble_boolean(boolean.left)
-    assembled_right = assemble_boolean(boolean.right)
-
-    result = []
-    result.extend(assembled_left)
-    result.extend(push)
-    result.extend(assembled_right)
-    result.append(f"{operation} {RES} (-1 {SP}) {RES}")
-    result.extend(pop)
+# a or b: branch if a, branch if b
+# a and b: skip unless a, branch if b
+def assemble_short_circuit(boolean: BBinary, target: str, when: bool) -> List[Instruction]:
+    decides = boolean.operation == OR # the value of the left side which decides the result
+    if decides == when:
+        result = assemble_branch(boolean.left, target, when)
+        result.extend(assemble_branch(boolean.right, target, when))
+        return result
+    skip_label = get_label()
+    result = assemble_branch(boolean.left, skip_label, decides)
+    result.extend(assemble_branch(boolean.right, target, when))
+    result.append(label(skip_label))
     return result
 
-def assemble_bliteral(boolean: BLiteral) -> List[str]:
-    if boolean.value:
-        return [f"MOV {RES} 1"]
-    else:
-        return [f"MOV {RES} 0"]
+# whether computing the expression could stop the program, a division or mod by anything
+# other than a literal that is not 0
+def can_fail(expression) -> bool:
+    if expression.type == NBinary and expression.content.operation in [DIVIDE, MOD]:
+        right = expression.content.right
+        if right.type != NLiteral or right.content.value == 0:
+            return True
+    return any(can_fail(child) for child in get_children(expression))
 
-def assemble_string(string: String) -> List[str]:
+def assemble_string(string: String) -> List[Instruction]:
     assert False, f"Unreachable in assemble_string, strings cannot be assembled: {string}"
 
 
@@ -277,8 +375,8 @@ def assemble_string(string: String) -> List[str]:
 # ----------------------------------------------------------------
 # helper functions
 # ----------------------------------------------------------------
-push = [f"MOV (0 {SP}) {RES}", f"ADD {SP} {SP} 1"]
-pop = [f"SUB {SP} {SP} 1"]
+push = [("MOV", indirect(0, SP), result_operand), ("ADDI", direct(SP), direct(SP), immediate(1))]
+pop = [("SUBI", direct(SP), direct(SP), immediate(1))]
 
 def get_operation(operation):
     op_table = {
@@ -1,129 +1,261 @@
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from compiler.instruction import IMMEDIATE, DIRECT, INDIRECT, LABEL, DATA, PSTR
+from compiler.instruction import Address, Instruction, Operand, immediate, direct, indirect, label, data, pstr
 
+# compiles assembly to machine code in two passes over the program
+# 1. every LABEL and DATA name gets its address in a symbol table
+# 2. the names in each instruction are replaced by their addresses and its operation by its op code
+#
+# the program is a list or generator of instructions from compiler/instruction.py as the assembler makes them,
+# or of lines of assembly text which are parsed once, a generator is read once and kept for the second pass
+#
+# a compiled word is an instruction with an op code and addresses, the form compiler.computer runs,
+# or the value of a DATA. compile_program gives the words to run directly, compile gives them as text
 
-def compile(program: List[str]) -> List[str]:
-    state = {}
-    program = handle_label(program, state)
-    program = handle_data(program, state)
-    state = process_state(state)
-    program = replace_vars(program, state)
-    program = replace_commands(program)
+Program = Iterable[Union[Instruction, str]]
+Word = Union[Instruction, int]
 
-    return program
+def compile(program: Program) -> List[str]:
+    return list(compile_stream(program))
 
+# also returns the address of every LABEL and DATA name
+def compile_with_symbols(program: Program) -> Tuple[List[str], Dict[str, int]]:
+    symbols = {}
+    compiled = list(compile_stream(program, symbols))
+    return (compiled, symbols)
 
-def replace_commands(program: List[str]) -> List[str]:
-    result = []
-    for command in program:
-        split_command = my_split(command)
-        op_code = get_op_code(split_command[0])
-        split_command[0] = op_code
-        result.append(" ".join(split_command))
-    return result
+# yields one line of machine code at a time, symbols is filled in before the first line
+def compile_stream(program: Program, symbols: Dict[str, int] = None) -> Iterator[str]:
+    for word in link_stream(program, symbols):
+        yield format_word(word)
+
+# the instructions and (address, value) data words for compiler.computer.execute_program and the symbols
+# data addresses hold HALT in the instructions, the same as the computer decodes them
+def compile_program(program: Program) -> Tuple[List[Instruction], List[Tuple[int, int]], Dict[str, int]]:
+    symbols = {}
+    instructions = []
+    data_words = []
+    for word in link_stream(program, symbols):
+        if isinstance(word, int):
+            data_words.append((len(instructions), word))
+            instructions.append((op_code_table["HALT"],))
+        else:
+            instructions.append(word)
+    return (instructions, data_words, symbols)
+
+def link_stream(program: Program, symbols: Dict[str, int] = None) -> Iterator[Word]:
+    if symbols is None:
+        symbols = {}
+    instructions = []
+    for instruction in program:
+        if isinstance(instruction, str):
+            instruction = parse_instruction(instruction)
+            if instruction is None:
+                continue
+        instructions.append(instruction)
+    collect_symbols(instructions, symbols)
+    resolve_symbols(symbols)
+
+    for instruction in instructions:
+        op = instruction[0]
+        if op == LABEL:
+            continue
+        if op == DATA:
+            # the value is stored at the address of the DATA
+            yield resolve_address(instruction[2], symbols)
+            continue
+        yield link_instruction(instruction, symbols)
+
+# a LABEL names the address of the instruction after it and takes no space, a DATA names its own address
+def collect_symbols(program: List[Instruction], symbols: Dict):
+    address = 0
+    for instruction in program:
+        op = instruction[0]
+        if op == LABEL:
+            symbols[instruction[1]] = address
+            continue
+        if op == DATA:
+            symbols[instruction[1]] = address
+        address += 1
+
+# replaces every alias by the address it finally names
+# { "a": "b", "b": 10 } => { "a": 10, "b": 10 }
+# every name on a chain gets the final address so each chain is followed once
+def resolve_symbols(symbols: Dict):
+    for key in symbols:
+        chain = []
+        value = symbols[key]
+        while not isinstance(value, int):
+            if value not in symbols:
+                assert False, f"Unreachable in resolve_symbols, bad key {value}"
+            if value == key or value in chain:
+                assert False, f"Unreachable in resolve_symbols, {key} names itself"
+            chain.append(value)
+            value = symbols[value]
+        for name in chain:
+            symbols[name] = value
+        symbols[key] = value
+    return symbols
+
+# ("ADD", (DIRECT, "_RESULT", 0), (IMMEDIATE, 1, 0)) -> (ADD, (DIRECT, 5, 0), (IMMEDIATE, 1, 0))
+def link_instruction(instruction: Instruction, symbols: Dict[str, int]) -> Instruction:
+    op = instruction[0]
+    op_code = get_op_code(op)
+    if op == PSTR:
+        return (op_code, instruction[1])
+    operands = [(mode, resolve_address(address, symbols), offset) for mode, address, offset in instruction[1:]]
+    return (op_code, *operands)
+
+def resolve_address(address: Address, symbols: Dict[str, int]) -> int:
+    if isinstance(address, int):
+        return address
+    if address not in symbols:
+        assert False, f"Unreachable in resolve_address, {address} is not a LABEL or DATA"
+    return symbols[address]
+
+op_code_table = {
+    "HALT": 0b000000,
+    "MOV": 0b000001,
+    "ADD": 0b001000,
+    "SUB": 0b001001,
+    "MUL": 0b001010,
+    "DIV": 0b001011,
+    "MOD": 0b001100,
+    "ADDI": 0b001101,
+    "SUBI": 0b001110,
+    "EQ": 0b010000,
+    "NE": 0b010001,
+    "GT": 0b010010,
+    "LT": 0b010011,
+    "AND": 0b011000,
+    "ORR": 0b011001,
+    "NOT": 0b011010,
+    "BRCH": 0b100000,
+    "CBZR": 0b100001,
+    "CBNZ": 0b100010,
+    "BLNK": 0b100011,
+    "BEQ": 0b100100,
+    "BNE": 0b100101,
+    "BLT": 0b100110,
+    "BGE": 0b100111,
+    "READ": 0b101000,
+    "PVAL": 0b101001,
+    "PSTR": 0b101010,
+    "LABEL": 0b110000,
+    "CONST": 0b110001,
+    "DATA": 0b110010
+}
 
-def get_op_code(operation):
-    op_code_table = {
-        "HALT": "000000",
-        "MOV": "000001",
-        "ADD": "001000",
-        "SUB": "001001",
-        "MUL": "001010",
-        "DIV": "001011",
-        "MOD": "001100",
-        "EQ": "010000",
-        "NE": "010001",
-        "GT": "010010",
-        "LT": "010011",
-        "AND": "011000",
-        "ORR": "011001",
-        "NOT": "011010",
-        "BRCH": "100000",
-        "CBZR": "100001",
-        "CBNZ": "100010",
-        "BLNK": "100011",
-        "READ": "101000",
-        "PVAL": "101001",
-        "PSTR": "101010",
-        "LABEL": "110000",
-        "CONST": "110001",
-        "DATA": "110010"
-    }
+def get_op_code(operation: str) -> int:
     if operation not in op_code_table:
-        return operation
+        assert False, f"Unreachable in get_op_code, bad operation {operation}"
     return op_code_table[operation]
 
+# ----------------------------------------------------------------
+# machine code text
+# ----------------------------------------------------------------
+# (ADD, (DIRECT, 5, 0), (INDIRECT, 12, -1), (IMMEDIATE, 1, 0)) -> 001000 (5) (-1 (12)) 1
+def format_word(word: Word) -> str:
+    if isinstance(word, int):
+        return str(word)
+    op = word[0]
+    if op == op_code_table["PSTR"]:
+        return f'{op:06b} "{word[1]}"'
+    return " ".join([f"{op:06b}"] + [format_machine_operand(operand) for operand in word[1:]])
 
-# removes LABELs from the program and adds them to the state
-def handle_label(program: List[str], state: Dict) -> List[str]:
-    line_count = 0
-    result = []
+def format_machine_operand(operand: Operand) -> str:
+    mode, address, offset = operand
+    if mode == IMMEDIATE:
+        return str(address)
+    elif mode == DIRECT:
+        return f"({address})"
+    elif mode == INDIRECT:
+        return f"({offset} ({address}))"
+    else:
+        assert False, f"Unreachable in format_machine_operand, bad mode {mode}"
 
-    for command in program:
-        operation = command.split()[0].strip()
-        if operation == "LABEL":
-            label_name = command.split()[1].strip()
-            state[label_name] = line_count
-        else:
-            line_count += 1
-            result.append(command)
-    return result
+# the machine code text of a program from compile_program
+def format_compiled(instructions: List[Instruction], data_words: List[Tuple[int, int]]) -> List[str]:
+    values = dict(data_words)
+    return [str(values[address]) if address in values else format_word(instruction)
+        for address, instruction in enumerate(instructions)]
 
-# replaces DATAs from the program with their value and adds them to the state
-# labels must first be removed to call this function
-def handle_data(program: List[str], state: Dict) -> List[str]:
-    result = []
-    for i, command in enumerate(program):
-        operation = command.split()[0].strip()
-        if operation == "DATA":
-            data_name = command.split()[1].strip()
-            data_value = command.split()[2].strip()
-            result.append(data_value)
-            state[data_name] = i
-        else:
-            result.append(command)
-    return result
+# ----------------------------------------------------------------
+# assembly text
+# ----------------------------------------------------------------
+# a name read as a value stands for what is stored at its address, read as a target it is the address itself
+VALUE = "value"
+TARGET = "target"
 
-# gets determine and replaces all values in the hash with their final values
-# { "a": "b", "b": 10 } => { "a": 10, "b": 10 }
-def process_state(state: Dict):
-    def get_final_value(key: str, state):
-        if key not in state:
-            assert False, f"Unreachable in process_state, bad key {key}"
-        if isinstance(state[key], int):
-            return state[key]
-        else:
-            return get_final_value(state[key], state)
-    for key in state.keys():
-        state[key] = get_final_value(key, state)
-    return state
+# how each operand of an op is read, ops which are missing read every operand as a target
+operand_kinds = {
+    "MOV": [VALUE, VALUE],
+    "ADD": [VALUE, VALUE, VALUE],
+    "SUB": [VALUE, VALUE, VALUE],
+    "MUL": [VALUE, VALUE, VALUE],
+    "DIV": [VALUE, VALUE, VALUE],
+    "MOD": [VALUE, VALUE, VALUE],
+    "ADDI": [VALUE, VALUE, VALUE],
+    "SUBI": [VALUE, VALUE, VALUE],
+    "EQ": [VALUE, VALUE, VALUE],
+    "NE": [VALUE, VALUE, VALUE],
+    "GT": [VALUE, VALUE, VALUE],
+    "LT": [VALUE, VALUE, VALUE],
+    "AND": [VALUE, VALUE, VALUE],
+    "ORR": [VALUE, VALUE, VALUE],
+    "NOT": [VALUE, VALUE],
+    "CBZR": [VALUE, TARGET],
+    "CBNZ": [VALUE, TARGET],
+    "BEQ": [VALUE, VALUE, TARGET],
+    "BNE": [VALUE, VALUE, TARGET],
+    "BLT": [VALUE, VALUE, TARGET],
+    "BGE": [VALUE, VALUE, TARGET],
+    "PVAL": [VALUE],
+    "BLNK": [VALUE, TARGET]
+}
 
+# "ADD _RESULT (-1 _STACK_POINTER) 1" -> ("ADD", (DIRECT, "_RESULT", 0), (INDIRECT, "_STACK_POINTER", -1), (IMMEDIATE, 1, 0))
+# returns None for an empty line
+def parse_instruction(line: str) -> Optional[Instruction]:
+    words = my_split(line)
+    if len(words) == 0:
+        return None
+    op = words[0]
+    if op == LABEL:
+        return label(words[1])
+    if op == DATA:
+        return data(words[1], parse_address(words[2]))
+    if op == PSTR:
+        return pstr(words[1][1:-1]) # strip the quotes ""
+    if op not in op_code_table:
+        assert False, f"Unreachable in parse_instruction, bad operation {op}: {line}"
+    # ADDI x y 1, the last operand must be a literal
+    if (op == "ADDI" or op == "SUBI") and not is_int(words[3]):
+        assert False, f"Unreachable in parse_instruction, {op} needs a literal: {line}"
 
-def replace_vars(program: List[str], state: Dict) -> List[str]:
-    result = []
-    for command in program:
-        split_command = my_split(command)
-        op = split_command[0]
-        if op == "MOV":
-            result.append(replace_vars_mov(split_command, state))
-        elif op in ["ADD", "SUB", "MUL", "DIV", "MOD", "EQ", "NE", "GT", "LT", "AND", "ORR"]:
-            result.append(replace_vars_binary_op(split_command, state))
-        elif op in ["NOT"]:
-            result.append(replace_vars_unary_op(split_command, state))
-        elif op in ["CBZR", "CBNZ"]:
-            result.append(replace_vars_cond_branch(split_command, state))
-        elif op == "PVAL":
-            result.append(replace_vars_pval(split_command, state))    
-        elif op == "BRCH":
-            result.append(replace_vars_brch(split_command, state))
-        elif op == "BLNK":
-            result.append(replace_vars_blnk(split_command, state))
-        else:
-            for i, word in enumerate(split_command):
-                if word in state:
-                    split_command[i] = str(state[word])
-            result.append(" ".join(split_command))
+    kinds = operand_kinds.get(op, [])
+    operands = []
+    for i, word in enumerate(words[1:]):
+        operands.append(parse_operand(word, kinds[i] if i < len(kinds) else TARGET))
+    return (op, *operands)
 
-    return result
+# 5 -> 5 and (-1 _STACK_POINTER) -> ram[ram[_STACK_POINTER] - 1] and _RESULT -> ram[_RESULT] or the address of _RESULT
+def parse_operand(word: str, kind: str) -> Operand:
+    if word[0] == "(" and word[-1] == ")":
+        parts = word[1:-1].split()
+        if len(parts) == 1:
+            return direct(parse_address(parts[0]))
+        return indirect(int(parts[0]), parse_address(parts[1]))
+    if is_int(word):
+        return immediate(int(word))
+    if kind == VALUE:
+        return direct(word)
+    return immediate(word)
+
+def parse_address(word: str) -> Address:
+    if is_int(word):
+        return int(word)
+    return word
 
 def is_int(string):
     try:
@@ -132,45 +264,10 @@ def is_int(string):
     except:
         return False
 
-def replace_vars_mov(command, state):
-    destination = command[1]
-    source = command[2]
-    command[1] = get_address(destination, state)
-    if not is_int(source):
-        command[2] = get_address(source, state)
-    return " ".join(command)
-
-def replace_vars_binary_op(command, state):
-    command[1] = get_address(command[1], state)
-    command[2] = get_address(command[2], state)
-    command[3] = get_address(command[3], state)
-    return " ".join(command)
-
-def replace_vars_unary_op(command, state):
-    command[1] = get_address(command[1], state)
-    command[2] = get_address(command[2], state)
-    return " ".join(command)
-
-def replace_vars_pval(command, state):
-    command[1] = get_address(command[1], state)
-    return " ".join(command)
-
-def replace_vars_cond_branch(command, state):
-    command[1] = get_address(command[1], state)
-    if command[2] in state:
-        command[2] = str(state[command[2]])
-    return " ".join(command)
-
-def replace_vars_brch(command, state):
-    command[1] = get_brch_address(command[1], state)
-    return " ".join(command)
-
-def replace_vars_blnk(command, state):
-    command[1] = get_address(command[1], state)
-    command[2] = str(state[command[2]])
-    return " ".join(command)
-
 def my_split(string):
+    # only brackets and strings hold spaces inside a word
+    if "(" not in string and '"' not in string:
+        return [word for word in string.split(" ") if word != ""]
     curr_index = 0
     result = []
     while curr_index < len(string):
@@ -213,32 +310,3 @@ def end_of_number(string, index):
     if found == -1:
         return len(string) - 1
     return found - 1
-
-# 10 -> 10 and _RESULT -> state["_RESULT"]
-def get_destination_address(address, state):
-    if is_int(address):
-        return address
-    return str(state[address])
-
-# (8 10) -> 18 and (-1 SP) -> (-1 (state["SP"])) and _RESULT -> (state["_RESULT"])
-def get_address(address, state):
-    address = address.strip()
-    if address[0] == "(" and address[-1] == ")":
-        offset, addr = address[1:-1].split()
-        if not is_int(addr):
-            addr = state[addr]
-        return f"({int(offset)} ({int(addr)}))"
-    if not is_int(address):
-        return f"({state[address]})"
-    return address
-
-def get_brch_address(address, state):
-    address = address.strip()
-    if address[0] == "(" and address[-1] == ")":
-        offset, addr = address[1:-1].split()
-        if not is_int(addr):
-            addr = state[addr]
-        return f"({int(offset)} ({int(addr)}))"
-    if not is_int(address):
-        return f"{state[address]}"
-    return address
\ No newline at end of file
@@ -1,67 +1,235 @@
-
-
-from os import link
-from typing import Dict, List
+from array import array
+from typing import Dict, List, Tuple, Union
 from compiler.compiler import my_split
-
-arithmetic_ops = ["001000", "001001", "001010", "001011", "001100"]
-comparison_ops = ["010000", "010001", "010010", "010011"]
-binary_boolean_ops = ["011000", "011001"]
-unary_boolean_ops = ["011010"]
-branching_ops = ["100000", "100001", "100010", "100011"]
-io_ops = ["101000", "101001", "101010"]
-other_ops = ["000001"]
-
-def ram_fetch(ram: Dict, addr: int) -> int:
+from compiler.instruction import IMMEDIATE, DIRECT, INDIRECT, Instruction, Operand
+from streams.streams import capture, show
+
+# op codes are XXXYYY where XXX is the type and YYY is the specifier
+HALT = 0b000000
+MOV = 0b000001
+
+ADD = 0b001000
+SUB = 0b001001
+MUL = 0b001010
+DIV = 0b001011
+MOD = 0b001100
+ADDI = 0b001101 # the right operand is always immediate
+SUBI = 0b001110
+
+EQ = 0b010000
+NE = 0b010001
+GT = 0b010010
+LT = 0b010011
+
+AND = 0b011000
+ORR = 0b011001
+NOT = 0b011010
+
+BRCH = 0b100000
+CBZR = 0b100001
+CBNZ = 0b100010
+BLNK = 0b100011
+BEQ = 0b100100 # compare and branch, BLT a b label branches if a < b
+BNE = 0b100101
+BLT = 0b100110
+BGE = 0b100111
+
+READ = 0b101000
+PVAL = 0b101001
+PSTR = 0b101010
+
+# op code types (the XXX part)
+OTHER_TYPE = 0b000
+ARITHMETIC_TYPE = 0b001
+COMPARISON_TYPE = 0b010
+BOOLEAN_TYPE = 0b011
+BRANCHING_TYPE = 0b100
+IO_TYPE = 0b101
+
+# operand addressing modes and instructions are described in compiler/instruction.py
+# by the time they run every address is a number
+
+# ram is either a dict keyed by address or a fixed size array of 64 bit words
+RAM = Union[Dict, array]
+
+# raised when the program accesses memory outside of ram
+class MemoryFault(Exception):
+    pass
+
+# raised when a value does not fit in a 64 bit word of array ram
+class OverflowFault(Exception):
+    pass
+
+def ram_fetch(ram: RAM, addr: int) -> int:
     return ram[addr]
 
-def ram_store(ram: Dict, addr: int, val: int):
+def ram_store(ram: RAM, addr: int, val: int):
     ram[addr] = val
 
-def execute_machine_code(code: List[str]):
-    ram = {}
+# memory_size of 0 keeps the unbounded dict ram
+# otherwise ram is an array of memory_size 64 bit words, and a value which does not fit raises OverflowFault
+# profile is a compiler.profiler.Profile which is filled in while running, see execute_profiled
+def execute_machine_code(code: List[str], memory_size: int = 0, profile=None):
+    execute_program(decode_program(code), get_data(code), memory_size, profile)
+
+# runs an already decoded program, data is a list of (address, value) for every data word
+# instructions are kept separately from ram and are only ever executed from the decoded program
+def execute_program(instructions: List[Instruction], data: List[Tuple[int, int]], memory_size: int = 0, profile=None):
     pc = 0
-    ram = load_program(code, ram)
+    ram = create_ram(data, len(instructions), memory_size)
+    if profile is not None:
+        execute_profiled(instructions, data, ram, profile)
+        return
+
+    try:
+        while True:
+            instruction = instructions[pc]
+            op = instruction[0]
+            if op == HALT:
+                # print("CORE DUMPED")
+                # for i in ram.keys():
+                #     print(f"{i}: {ram[i]}")
+                break
+            type = op >> 3
+            if type == ARITHMETIC_TYPE:
+                execute_arithmetic_op(instruction, ram)
+                pc += 1
+
+            elif type == COMPARISON_TYPE:
+                execute_comparison_op(instruction, ram)
+                pc += 1
+
+            elif type == BOOLEAN_TYPE:
+                execute_boolean_op(instruction, ram)
+                pc += 1
+
+            elif type == BRANCHING_TYPE:
+                pc = execute_branching_op(instruction, ram, pc)
+
+            elif type == IO_TYPE:
+                execute_io_op(instruction, ram)
+                pc += 1
+
+            elif type == OTHER_TYPE:
+                execute_other_ops(instruction, ram)
+                pc += 1
 
-    while True:
-        command = ram[pc]
-        if isinstance(command, int) or command == "000000":
             # print("CORE DUMPED")
             # for i in ram.keys():
             #     print(f"{i}: {ram[i]}")
-            break
-        split_command = my_split(command)
-        operation = split_command[0]
-        if operation in arithmetic_ops:
-            execute_arithmetic_op(split_command, ram)
-            pc += 1
-
-        elif operation in comparison_ops:
-            execute_comparison_op(split_command, ram)
-            pc += 1
-
-        elif operation in binary_boolean_ops:
-            execute_binary_boolean_op(split_command, ram)
-            pc += 1
-
-        elif operation in unary_boolean_ops:
-            execute_unary_boolean_op(split_command, ram)
-            pc += 1
-
-        elif operation in branching_ops:
-            pc = execute_branching_op(split_command, ram, pc)
-
-        elif operation in io_ops:
-            execute_io_op(split_command, ram)
-            pc += 1
-
-        elif operation in other_ops:
-            execute_other_ops(split_command, ram)
-            pc += 1
-        
-        # print("CORE DUMPED")
-        # for i in ram.keys():
-        #     print(f"{i}: {ram[i]}")
+    except (KeyError, IndexError):
+        raise MemoryFault(f"memory fault at pc {pc}: address outside of ram") from None
+    except OverflowError:
+        raise OverflowFault(f"overflow at pc {pc}: value does not fit in a 64 bit word") from None
+
+# the same as the loop in execute_program but also records into profile
+# kept separate so running without a profile pays nothing for it
+def execute_profiled(instructions: List[Instruction], data: List[Tuple[int, int]], ram: RAM, profile):
+    profile.start(instructions, data)
+    counts = profile.counts
+    back_edges = profile.back_edges
+    stack_pointer = profile.stack_pointer
+    stack_base = profile.stack_base
+    max_stack_depth = 0
+    pc = 0
+
+    try:
+        while True:
+            counts[pc] += 1
+            instruction = instructions[pc]
+            next_pc = execute_instruction(instruction, ram, pc)
+            if next_pc == -1:
+                break
+            # a loop jumps back to a fixed label, calls and returns are not loops
+            if next_pc <= pc and instruction[0] != BLNK and instruction[-1][0] == IMMEDIATE:
+                edge = (pc, next_pc)
+                back_edges[edge] = back_edges.get(edge, 0) + 1
+            if stack_pointer != -1 and ram[stack_pointer] - stack_base > max_stack_depth:
+                max_stack_depth = ram[stack_pointer] - stack_base
+            pc = next_pc
+    except (KeyError, IndexError):
+        raise MemoryFault(f"memory fault at pc {pc}: address outside of ram") from None
+    except OverflowError:
+        raise OverflowFault(f"overflow at pc {pc}: value does not fit in a 64 bit word") from None
+    finally:
+        profile.max_stack_depth = max_stack_depth
+
+# runs one instruction, returns the next pc or -1 after a HALT
+def execute_instruction(instruction: Instruction, ram: RAM, pc: int) -> int:
+    op = instruction[0]
+    if op == HALT:
+        return -1
+    type = op >> 3
+    if type == ARITHMETIC_TYPE:
+        execute_arithmetic_op(instruction, ram)
+    elif type == COMPARISON_TYPE:
+        execute_comparison_op(instruction, ram)
+    elif type == BOOLEAN_TYPE:
+        execute_boolean_op(instruction, ram)
+    elif type == BRANCHING_TYPE:
+        return execute_branching_op(instruction, ram, pc)
+    elif type == IO_TYPE:
+        execute_io_op(instruction, ram)
+    elif type == OTHER_TYPE:
+        execute_other_ops(instruction, ram)
+    return pc + 1
+
+# runs a program a slice at a time, so it can be paused and resumed later
+# like interpreter/machine.py, kept separate from execute_program so that loop pays nothing for it
+#
+#   computer = Computer(instructions, data)
+#   while not computer.run(1000):   run at most 1000 instructions at a time
+#       ...                         anything else, the program is paused here
+class Computer:
+    def __init__(self, instructions: List[Instruction], data: List[Tuple[int, int]], memory_size: int = 0):
+        self.instructions = instructions
+        self.ram = create_ram(data, len(instructions), memory_size)
+        self.pc = 0 # stays on the HALT once the program has ended
+
+    def is_finished(self) -> bool:
+        return self.instructions[self.pc][0] == HALT
+
+    # runs until the program halts or max_steps instructions have run, -1 for no limit
+    # returns whether the program has ended
+    def run(self, max_steps: int = -1) -> bool:
+        return self.run_slice(max_steps, False)
+
+    # the same as run but also stops before a READ, so the input can be waited for
+    def run_until_input(self, max_steps: int = -1) -> bool:
+        return self.run_slice(max_steps, True)
+
+    # whether the next instruction is a READ
+    def wants_input(self) -> bool:
+        return self.instructions[self.pc][0] == READ
+
+    # runs one instruction, returns False once the program has ended
+    def step(self) -> bool:
+        if self.is_finished():
+            return False
+        self.run_slice(1, False)
+        return True
+
+    def run_slice(self, max_steps: int, stop_at_read: bool) -> bool:
+        instructions = self.instructions
+        ram = self.ram
+        pc = self.pc
+        try:
+            while max_steps != 0:
+                instruction = instructions[pc]
+                op = instruction[0]
+                if op == HALT:
+                    return True
+                if op == READ and stop_at_read:
+                    return False
+                pc = execute_instruction(instruction, ram, pc)
+                max_steps -= 1
+        except (KeyError, IndexError):
+            raise MemoryFault(f"memory fault at pc {pc}: address outside of ram") from None
+        except OverflowError:
+            raise OverflowFault(f"overflow at pc {pc}: value does not fit in a 64 bit word") from None
+        finally:
+            self.pc = pc
+        return self.is_finished()
 
 def is_int(string):
     try:
@@ -70,170 +238,238 @@ def is_int(string):
     except:
         return False
 
-def load_program(code, ram):
-    for i, line in enumerate(code):
-        if is_int(line):
-            ram[i] = int(line)
-        else:
-            ram[i] = line
+def create_ram(data: List[Tuple[int, int]], program_size: int, memory_size: int) -> RAM:
+    if memory_size == 0:
+        return load_program(data, {})
+    if program_size > memory_size:
+        raise MemoryFault(f"memory fault: program of {program_size} words does not fit in {memory_size} words of ram")
+    return load_program(data, array("q", bytes(8 * memory_size)))
+
+def load_program(data: List[Tuple[int, int]], ram: RAM) -> RAM:
+    for address, value in data:
+        try:
+            ram[address] = value
+        except IndexError:
+            raise MemoryFault(f"memory fault: data at address {address} is outside of {len(ram)} words of ram") from None
+        except OverflowError:
+            raise OverflowFault(f"overflow: data {value} at address {address} does not fit in a 64 bit word") from None
     return ram
 
-
-def execute_arithmetic_op(command, ram):
+# the data words of the program as (address, value)
+def get_data(code: List[str]) -> List[Tuple[int, int]]:
+    return [(i, int(line)) for i, line in enumerate(code) if is_int(line)]
+
+# ----------------------------------------------------------------
+# decoding
+# ----------------------------------------------------------------
+
+# decodes every word of the program once so the executor never parses strings
+# data words and empty lines decode to HALT, the same as the original executor
+def decode_program(code: List[str]) -> List[Instruction]:
+    return [decode_instruction(line) for line in code]
+
+# "001000 (5) (-1 (12)) 1" -> (ADD, (DIRECT, 5, 0), (INDIRECT, 12, -1), (IMMEDIATE, 1, 0))
+def decode_instruction(line: str) -> Instruction:
+    line = line.strip()
+    if line == "" or is_int(line):
+        return (HALT,)
+
+    split_command = my_split(line)
+    op = int(split_command[0], 2)
+    if op == PSTR:
+        return (op, split_command[1][1:-1]) # strip the quotes ""
+    if op >> 3 not in [OTHER_TYPE, ARITHMETIC_TYPE, COMPARISON_TYPE, BOOLEAN_TYPE, BRANCHING_TYPE, IO_TYPE]:
+        assert False, f"Unreachable in decode_instruction, bad command {line}"
+    operands = [decode_operand(operand) for operand in split_command[1:]]
+    return (op, *operands)
+
+# 5 -> (IMMEDIATE, 5, 0) and (5) -> (DIRECT, 5, 0) and (-1 (12)) -> (INDIRECT, 12, -1)
+def decode_operand(string: str) -> Operand:
+    string = string.strip()
+    if string[0] == "(" and string[-1] == ")":
+        split_operand = string[1:-1].split()
+        if len(split_operand) > 1:
+            offset, address = split_operand
+            return (INDIRECT, int(address[1:-1]), int(offset))
+        return (DIRECT, int(split_operand[0]), 0)
+    return (IMMEDIATE, int(string), 0)
+
+# ----------------------------------------------------------------
+# execution
+# ----------------------------------------------------------------
+def execute_arithmetic_op(instruction, ram):
     # ADD 10 5 6
-    op = command[0]
-    destination = get_destination(command[1], ram)
-    left = get_value(command[2], ram)
-    right = get_value(command[3], ram)
+    op = instruction[0]
+    destination = get_destination(instruction[1], ram)
+    left = get_value(instruction[2], ram)
+    if op == ADDI:
+        ram[destination] = left + instruction[3][1]
+        return
+    elif op == SUBI:
+        ram[destination] = left - instruction[3][1]
+        return
+    right = get_value(instruction[3], ram)
     result = 0
-    if op == "001000":
+    if op == ADD:
         result = left + right
-    elif op == "001001":
+    elif op == SUB:
         result = left - right
-    elif op == "001010":
+    elif op == MUL:
         result = left * right
-    elif op == "001011":
+    elif op == DIV:
         result = left // right
-    elif op == "001100":
+    elif op == MOD:
         result = left % right
     else:
-        assert False, f"Unreachable in execute_arithmetic_op, bad command {command}"
+        assert False, f"Unreachable in execute_arithmetic_op, bad instruction {instruction}"
 
     ram[destination] = result
 
 
-def execute_comparison_op(command, ram):
-    op = command[0]
-    destination = get_destination(command[1], ram)
-    left = get_value(command[2], ram)
-    right = get_value(command[3], ram)
+def execute_comparison_op(instruction, ram):
+    op = instruction[0]
+    destination = get_destination(instruction[1], ram)
+    left = get_value(instruction[2], ram)
+    right = get_value(instruction[3], ram)
     result = 0
-    if op == "010000":
+    if op == EQ:
         result = bool_to_int(left == right)
-    elif op == "010001":
+    elif op == NE:
         result = bool_to_int(left != right)
-    elif op == "010010":
+    elif op == GT:
         result = bool_to_int(left > right)
-    elif op == "010011":
+    elif op == LT:
         result = bool_to_int(left < right)
     else:
-        assert False, f"Unreachable in execute_comparison_op, bad command {command}"
+        assert False, f"Unreachable in execute_comparison_op, bad instruction {instruction}"
 
     ram[destination] = result
 
-def execute_binary_boolean_op(command, ram):
-    op = command[0]
-    destination = get_destination(command[1], ram)
-    left = int_to_bool(get_value(command[2], ram))
-    right = int_to_bool(get_value(command[3], ram))
+def execute_boolean_op(instruction, ram):
+    if instruction[0] == NOT:
+        execute_unary_boolean_op(instruction, ram)
+    else:
+        execute_binary_boolean_op(instruction, ram)
+
+def execute_binary_boolean_op(instruction, ram):
+    op = instruction[0]
+    destination = get_destination(instruction[1], ram)
+    left = int_to_bool(get_value(instruction[2], ram))
+    right = int_to_bool(get_value(instruction[3], ram))
     result = 0
-    if op == "011000":
+    if op == AND:
         result = left and right
-    elif op == "011001":
+    elif op == ORR:
         result = left or right
     else:
-        assert False, f"Unreachable in execute_binary_boolean_op, bad command {command}"
+        assert False, f"Unreachable in execute_binary_boolean_op, bad instruction {instruction}"
 
     ram[destination] = bool_to_int(result)
 
-def execute_unary_boolean_op(command, ram):
-    op = command[0]
-    destination = get_destination(command[1], ram)
-    body = int_to_bool(get_value(command[2], ram))
-    if op == "011010":
+def execute_unary_boolean_op(instruction, ram):
+    op = instruction[0]
+    destination = get_destination(instruction[1], ram)
+    body = int_to_bool(get_value(instruction[2], ram))
+    if op == NOT:
         ram[destination] = bool_to_int(not body)
     else:
-        assert False, f"Unreachable in execute_unary_boolean_op, bad command {command}"
-
-def execute_branching_op(command, ram, pc):
-    op = command[0]
-    if op == "100000":
-        target = get_value2(command[1], ram)
-        return target
-    elif op == "100010":
-        condition = ram[get_destination(command[1], ram)]
+        assert False, f"Unreachable in execute_unary_boolean_op, bad instruction {instruction}"
+
+def execute_branching_op(instruction, ram, pc):
+    op = instruction[0]
+    if op == BRCH:
+        return get_branch_target(instruction[1], ram)
+    elif op == CBNZ:
+        condition = ram[get_destination(instruction[1], ram)]
         if condition == 1:
-            return int(command[2])
+            return instruction[2][1]
         elif condition == 0:
             return pc + 1
         else:
             assert False, f"Unreachable in execute_branching_op > CBNZ, bad condition {condition}"
-    elif op == "100001":
-        condition = ram[get_destination(command[1], ram)]
+    elif op == CBZR:
+        condition = ram[get_destination(instruction[1], ram)]
         if condition == 0:
-            return int(command[2])
+            return instruction[2][1]
         elif condition == 1:
             return pc + 1
         else:
             assert False, f"Unreachable in execute_branching_op > CBZR, bad condition {condition}"
-    elif op == "100011":
-        link_address = get_destination(command[1], ram)
+    elif op == BLNK:
+        link_address = get_destination(instruction[1], ram)
         ram[link_address] = pc + 1
-        return int(command[2])
+        return instruction[2][1]
+    elif op == BEQ:
+        taken = get_value(instruction[1], ram) == get_value(instruction[2], ram)
+        return instruction[3][1] if taken else pc + 1
+    elif op == BNE:
+        taken = get_value(instruction[1], ram) != get_value(instruction[2], ram)
+        return instruction[3][1] if taken else pc + 1
+    elif op == BLT:
+        taken = get_value(instruction[1], ram) < get_value(instruction[2], ram)
+        return instruction[3][1] if taken else pc + 1
+    elif op == BGE:
+        taken = get_value(instruction[1], ram) >= get_value(instruction[2], ram)
+        return instruction[3][1] if taken else pc + 1
 
     else:
         assert False, f"Unreachable in execute_branching_op, bad op {op}"
 
 
-def execute_io_op(command, ram):
-    op = command[0]
-    if op == "101010":
-        print(command[1][1:-1]) # strip the quotes ""
-    elif op == "101001":
-        value_address = get_destination(command[1], ram)
-        print(ram[value_address])
-    elif op == "101000":
-        user_input = int(input())
-        destination = int(command[1])
+def execute_io_op(instruction, ram):
+    op = instruction[0]
+    if op == PSTR:
+        show(instruction[1])
+    elif op == PVAL:
+        value_address = get_destination(instruction[1], ram)
+        show(ram[value_address])
+    elif op == READ:
+        user_input = int(capture())
+        destination = instruction[1][1]
         ram[destination] = user_input
     else:
-        assert False, f"Unreachable in execute_io_op, bad command {command}"
+        assert False, f"Unreachable in execute_io_op, bad instruction {instruction}"
 
-def execute_other_ops(command, ram):
-    op = command[0]
+def execute_other_ops(instruction, ram):
+    op = instruction[0]
 
-    if op == "000001":
-        destination = get_destination(command[1], ram)
-        value = get_value(command[2], ram)
+    if op == MOV:
+        destination = get_destination(instruction[1], ram)
+        value = get_value(instruction[2], ram)
         ram[destination] = value
     else:
-        assert False, f"Unreachable in execute_other_ops, bad command {command}"
-
-
-    # MOV
-
-# (5) -> 5 and (-1 (12)) -> ram[12] + -1
-def get_destination(string, ram) -> int:
-    string = string[1:-1]
-    if len(string.split()) > 1:
-        offset, address2 = string.split()
-        return int(ram[int(address2[1:-1])]) + int(offset)
-    else:
-        return int(string)
-
-
-
-# (5) -> ram[5] or 5 -> 5 or (-1 (12)) -> ram[ram[12] + -1]
-def get_value(address, ram) -> int:
-    address = address.strip()
-    if address[0] == "(" and address[-1] == ")":
-        if len(address.split()) > 1:
-            offset, address2 = address[1:-1].split()
-            return ram[int(ram[int(address2[1:-1])]) + int(offset)]
-        else:
-            return int(ram[int(address[1:-1])])
-    return int(address)
-
-# (5) -> ram[5] or 5 -> 5 or (-1 (12)) -> ram[12] + -1
-def get_value2(address, ram) -> int:
-    address = address.strip()
-    if address[0] == "(" and address[-1] == ")":
-        if len(address.split()) > 1:
-            offset, address2 = address[1:-1].split()
-            return int(ram[int(address2[1:-1])]) + int(offset)
-        else:
-            return int(ram[int(address[1:-1])])
-    return int(address)
+        assert False, f"Unreachable in execute_other_ops, bad instruction {instruction}"
+
+# (DIRECT, 5) -> 5 and (INDIRECT, 12, -1) -> ram[12] + -1
+def get_destination(operand: Operand, ram) -> int:
+    mode, address, offset = operand
+    if mode == INDIRECT:
+        return check_address(ram[address] + offset)
+    return address
+
+# (IMMEDIATE, 5) -> 5 or (DIRECT, 5) -> ram[5] or (INDIRECT, 12, -1) -> ram[ram[12] + -1]
+def get_value(operand: Operand, ram) -> int:
+    mode, address, offset = operand
+    if mode == IMMEDIATE:
+        return address
+    if mode == DIRECT:
+        return ram[address]
+    return ram[check_address(ram[address] + offset)]
+
+# (IMMEDIATE, 5) -> 5 or (DIRECT, 5) -> ram[5] or (INDIRECT, 12, -1) -> ram[12] + -1
+def get_branch_target(operand: Operand, ram) -> int:
+    mode, address, offset = operand
+    if mode == IMMEDIATE:
+        return address
+    if mode == DIRECT:
+        return ram[address]
+    return ram[address] + offset
+
+# negative addresses would silently wrap around an array
+def check_address(address: int) -> int:
+    if address < 0:
+        raise IndexError(address)
+    return address
 
 def int_to_bool(num):
     if num == 1:
@@ -242,6 +478,6 @@ def int_to_bool(num):
         return False
     else:
         assert False, f"Unreachable in int_to_bool, bad num {num}"
-    
+
 def bool_to_int(b):
-    return 1 if b else 0
\ No newline at end of file
+    return 1 if b else 0
@@ -0,0 +1,72 @@
+from typing import List, Tuple, Union
+
+# the in memory form of assembly, made by the assembler and read by the compiler
+# so a program is only turned into text when the text is asked for
+#
+#   ("ADD", (DIRECT, "_RESULT", 0), (INDIRECT, "_STACK_POINTER", -1), (IMMEDIATE, 1, 0))
+#       ADD _RESULT (-1 _STACK_POINTER) 1
+#   ("BLT", (DIRECT, "i", 0), (DIRECT, "number", 0), (IMMEDIATE, "_LABEL_3", 0))
+#       BLT i number _LABEL_3
+#   ("LABEL", "_LABEL_3") and ("DATA", "i", 2) take no space
+#
+# operands are the same (mode, address, offset) the computer runs, except that until the program
+# is compiled an address can be the name of a LABEL or DATA, an immediate name is the address itself
+
+# operand addressing modes
+IMMEDIATE = 0 # 5 -> 5
+DIRECT = 1    # (5) -> ram[5]
+INDIRECT = 2  # (-1 (12)) -> ram[ram[12] + -1]
+
+Address = Union[int, str]
+# an operand is (mode, address, offset)
+Operand = Tuple[int, Address, int]
+# an instruction is (op, operand, ...), op is the name in assembly and the op code once compiled
+Instruction = Tuple
+
+LABEL = "LABEL"
+DATA = "DATA"
+PSTR = "PSTR"
+
+def immediate(value: Address) -> Operand:
+    return (IMMEDIATE, value, 0)
+
+def direct(address: Address) -> Operand:
+    return (DIRECT, address, 0)
+
+def indirect(offset: int, address: Address) -> Operand:
+    return (INDIRECT, address, offset)
+
+def label(name: str) -> Instruction:
+    return (LABEL, name)
+
+def data(name: str, value: Address) -> Instruction:
+    return (DATA, name, value)
+
+def pstr(string: str) -> Instruction:
+    return (PSTR, string)
+
+# ----------------------------------------------------------------
+# text
+# ----------------------------------------------------------------
+def format_program(program: List[Instruction]) -> List[str]:
+    return [format_instruction(instruction) for instruction in program]
+
+# ("ADD", (DIRECT, "_RESULT", 0), (IMMEDIATE, 1, 0)) -> ADD _RESULT 1
+def format_instruction(instruction: Instruction) -> str:
+    op = instruction[0]
+    if op == LABEL:
+        return f"LABEL {instruction[1]}"
+    if op == DATA:
+        return f"DATA {instruction[1]} {instruction[2]}"
+    if op == PSTR:
+        return f'PSTR "{instruction[1]}"'
+    return " ".join([op] + [format_operand(operand) for operand in instruction[1:]])
+
+# a name stands for its address when immediate and for what is stored there when direct
+def format_operand(operand: Operand) -> str:
+    mode, address, offset = operand
+    if mode == INDIRECT:
+        return f"({offset} {address})"
+    if mode == DIRECT and not isinstance(address, str):
+        return f"({address})"
+    return str(address)
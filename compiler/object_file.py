@@ -0,0 +1,206 @@
+import mmap
+import struct
+from typing import Dict, List, Tuple
+
+from compiler.computer import HALT, PSTR
+from compiler.instruction import INDIRECT, Instruction
+
+"""
+Binary object format for compiled programs
+
+header      magic "PYSO", version and flags, 1 byte each
+            then the word count, data count and symbol count as varints
+            flags is WITH_SYMBOLS when the symbol table is kept
+words       one word per instruction, data addresses take no word
+data        (address, value) for every data word, stored once
+symbols     (address, length, utf-8 bytes) for every LABEL and DATA name, only WITH_SYMBOLS
+
+a varint is a zigzag encoded integer in 7 bit groups, low group first, the top bit set on every group but the last
+so the small addresses, offsets and values of most programs take 1 or 2 bytes
+the words are not a fixed width, so the N-th word cannot be found without decoding every word before it,
+which costs nothing here as the reader decodes the whole program once before it runs
+
+each word is
+    op code          1 byte
+    operand info     1 byte, 2 bits of addressing mode per operand and the operand count in the top 2 bits
+    operands         the address of each operand, followed by its offset if it is indirect
+PSTR words hold the length and utf-8 bytes of their string instead of operands
+the reader puts a HALT word at every data address, the same as the compiler does
+"""
+
+MAGIC = b"PYSO"
+VERSION = 2
+WITH_SYMBOLS = 1
+
+header_format = struct.Struct("<4sBB")
+
+# raised when a program does not fit the format or a file is not a valid object file
+class ObjectFormatError(Exception):
+    pass
+
+# ----------------------------------------------------------------
+# writing
+# ----------------------------------------------------------------
+# takes the program as compiler.compiler.compile_program returns it
+# the symbols are only needed to read the program back, so they are dropped unless keep_symbols
+def write_object(instructions: List[Instruction], data: List[Tuple[int, int]], symbols: Dict[str, int],
+        keep_symbols: bool = False) -> bytes:
+    data_addresses = set(address for address, _ in data)
+    words = [instruction for address, instruction in enumerate(instructions) if address not in data_addresses]
+    if not keep_symbols:
+        symbols = {}
+
+    result = bytearray(header_format.pack(MAGIC, VERSION, WITH_SYMBOLS if keep_symbols else 0))
+    write_varint(result, len(words))
+    write_varint(result, len(data))
+    write_varint(result, len(symbols))
+    for instruction in words:
+        encode_word(instruction, result)
+    for address, value in data:
+        write_varint(result, address)
+        write_varint(result, value)
+    for name, address in symbols.items():
+        write_varint(result, address)
+        write_string(result, name)
+    return bytes(result)
+
+def encode_word(instruction: Instruction, result: bytearray):
+    op = instruction[0]
+    if op == PSTR:
+        result.append(op)
+        result.append(1 << 6)
+        write_string(result, instruction[1])
+        return
+
+    operands = instruction[1:]
+    if len(operands) > 3:
+        raise ObjectFormatError(f"too many operands for the object format: {instruction}")
+    modes = len(operands) << 6
+    for i, (mode, _, offset) in enumerate(operands):
+        if mode != INDIRECT and offset != 0:
+            raise ObjectFormatError(f"only indirect operands have an offset: {instruction}")
+        modes |= mode << (2 * i)
+    result.append(op)
+    result.append(modes)
+    for mode, address, offset in operands:
+        write_varint(result, address)
+        if mode == INDIRECT:
+            write_varint(result, offset)
+
+def write_varint(result: bytearray, value: int):
+    value = zigzag(value)
+    while value >= 0x80:
+        result.append((value & 0x7F) | 0x80)
+        value >>= 7
+    result.append(value)
+
+def write_string(result: bytearray, string: str):
+    encoded = string.encode()
+    write_varint(result, len(encoded))
+    result.extend(encoded)
+
+# 0, -1, 1, -2, 2 ... -> 0, 1, 2, 3, 4 ...
+def zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+def unzigzag(value: int) -> int:
+    return value >> 1 if value & 1 == 0 else -(value >> 1) - 1
+
+# ----------------------------------------------------------------
+# reading
+# ----------------------------------------------------------------
+# returns the decoded instructions, the data words and the symbols
+def read_object(buffer) -> Tuple[List[Instruction], List[Tuple[int, int]], Dict[str, int]]:
+    view = memoryview(buffer)
+    try:
+        return read_view(view)
+    finally:
+        # an mmap cannot be closed while a view of it is alive, even in the traceback of an error
+        view.release()
+
+def read_view(view: memoryview) -> Tuple[List[Instruction], List[Tuple[int, int]], Dict[str, int]]:
+    if len(view) < header_format.size:
+        raise ObjectFormatError("not an object file: too short")
+    magic, version, flags = header_format.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ObjectFormatError("not an object file: bad magic")
+    if version != VERSION:
+        raise ObjectFormatError(f"unsupported object file version {version}")
+
+    try:
+        reader = Reader(view, header_format.size)
+        word_count = reader.varint()
+        data_count = reader.varint()
+        symbol_count = reader.varint()
+        words = [decode_word(reader) for _ in range(word_count)]
+        data = [(reader.varint(), reader.varint()) for _ in range(data_count)]
+        symbols = {}
+        for _ in range(symbol_count):
+            address = reader.varint()
+            symbols[reader.string()] = address
+    except (IndexError, UnicodeDecodeError):
+        raise ObjectFormatError("object file is truncated or corrupt") from None
+
+    # the words fill every address which does not hold data
+    instructions = [(HALT,)] * (word_count + data_count)
+    data_addresses = set(address for address, _ in data)
+    if len(data_addresses) != data_count or any(address >= len(instructions) for address in data_addresses):
+        raise ObjectFormatError("object file is truncated or corrupt")
+    next_word = 0
+    for address in range(len(instructions)):
+        if address not in data_addresses:
+            instructions[address] = words[next_word]
+            next_word += 1
+    return (instructions, data, symbols)
+
+class Reader:
+    def __init__(self, view: memoryview, offset: int):
+        self.view = view
+        self.offset = offset
+
+    def byte(self) -> int:
+        value = self.view[self.offset]
+        self.offset += 1
+        return value
+
+    def varint(self) -> int:
+        value = 0
+        shift = 0
+        while True:
+            byte = self.byte()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return unzigzag(value)
+            shift += 7
+
+    def string(self) -> str:
+        length = self.varint()
+        if length < 0 or self.offset + length > len(self.view):
+            raise IndexError()
+        result = bytes(self.view[self.offset:self.offset + length]).decode()
+        self.offset += length
+        return result
+
+def decode_word(reader: Reader) -> Instruction:
+    op = reader.byte()
+    modes = reader.byte()
+    if op == PSTR:
+        return (op, reader.string())
+    operands = []
+    for i in range(modes >> 6):
+        mode = (modes >> (2 * i)) & 0b11
+        address = reader.varint()
+        offset = reader.varint() if mode == INDIRECT else 0
+        operands.append((mode, address, offset))
+    return (op, *operands)
+
+def load_object(file_name: str) -> Tuple[List[Instruction], List[Tuple[int, int]], Dict[str, int]]:
+    with open(file_name, "rb") as f:
+        if f.seek(0, 2) == 0:
+            raise ObjectFormatError("not an object file: empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return read_object(mapped)
+
+def is_object_file(file_name: str) -> bool:
+    with open(file_name, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
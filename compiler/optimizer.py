@@ -0,0 +1,231 @@
+from typing import List, Tuple
+
+from compiler.assembler import SP, RES, pop, push, result_operand
+from compiler.instruction import DATA, DIRECT, IMMEDIATE, INDIRECT, LABEL, PSTR, Instruction, Operand, indirect
+
+# peephole optimizer over the instructions produced by compiler/assembler.py
+# the patterns below are written as assembly text, the passes match the same instructions as tuples
+#
+# relies on how the assembler uses _RESULT: it is a scratch value which is always
+# written before it is read at the start of every basic block, so it is dead at
+# every LABEL and branch unless the branch itself reads it
+
+binary_ops = ["ADD", "SUB", "MUL", "DIV", "MOD", "ADDI", "SUBI", "EQ", "NE", "GT", "LT", "AND", "ORR"]
+unary_ops = ["NOT"]
+branch_ops = ["BRCH", "CBZR", "CBNZ", "BLNK", "BEQ", "BNE", "BLT", "BGE"]
+# these read their operand as an address so an immediate cannot be substituted in
+address_ops = ["PVAL", "CBZR", "CBNZ"]
+
+class Report:
+    def __init__(self):
+        self.before = 0
+        self.after = 0
+        self.counts = {}
+
+    def count(self, name: str, saved: int = 1):
+        self.counts[name] = self.counts.get(name, 0) + saved
+
+    def __str__(self):
+        saved = self.before - self.after
+        percent = 100 * saved / self.before if self.before else 0
+        lines = [f"peephole: {self.before} -> {self.after} instructions ({saved} saved, {percent:.1f}%)"]
+        for name, count in self.counts.items():
+            lines.append(f"    {name}: {count}")
+        return "\n".join(lines)
+
+def optimize(program: List[Instruction]) -> List[Instruction]:
+    return optimize_with_report(program)[0]
+
+# runs every pass until none of them changes the program
+def optimize_with_report(program: List[Instruction]) -> Tuple[List[Instruction], Report]:
+    report = Report()
+    report.before = count_instructions(program)
+
+    passes = [remove_jump_to_next, invert_branch_around, fold_push_pop, forward_result, remove_dead_result]
+    changed = True
+    while changed:
+        changed = False
+        for optimization_pass in passes:
+            optimized = optimization_pass(program, report)
+            if optimized != program:
+                changed = True
+            program = optimized
+
+    report.after = count_instructions(program)
+    return (program, report)
+
+# LABELs take no space in the compiled program
+def count_instructions(program: List[Instruction]) -> int:
+    return sum(1 for instruction in program if instruction[0] != LABEL)
+
+# ----------------------------------------------------------------
+# passes
+# ----------------------------------------------------------------
+
+# BRCH L                 ->
+# LABEL L                   LABEL L
+def remove_jump_to_next(program: List[Instruction], report: Report) -> List[Instruction]:
+    result = []
+    for i, instruction in enumerate(program):
+        if instruction[0] == "BRCH" and is_label(instruction[1], get_following_labels(program, i + 1)):
+            report.count("jump to next")
+            continue
+        result.append(instruction)
+    return result
+
+# CBNZ x L1              -> CBZR x L2
+# BRCH L2                   LABEL L1
+# LABEL L1
+#
+# BLT a b L1             -> BGE a b L2
+# BRCH L2                   LABEL L1
+# LABEL L1
+def invert_branch_around(program: List[Instruction], report: Report) -> List[Instruction]:
+    inverse = {"CBNZ": "CBZR", "CBZR": "CBNZ", "BEQ": "BNE", "BNE": "BEQ", "BLT": "BGE", "BGE": "BLT"}
+    result = []
+    i = 0
+    while i < len(program):
+        instruction = program[i]
+        if instruction[0] in inverse and i + 1 < len(program):
+            next_instruction = program[i + 1]
+            if next_instruction[0] == "BRCH" and not is_indirect(next_instruction[1]) \
+                    and is_label(instruction[-1], get_following_labels(program, i + 2)):
+                result.append((inverse[instruction[0]], *instruction[1:-1], next_instruction[1]))
+                report.count("branch around")
+                i += 2
+                continue
+        result.append(program[i])
+        i += 1
+    return result
+
+# MOV (0 SP) RES         -> OP RES RES x
+# ADDI SP SP 1
+# MOV RES x
+# OP RES (-1 SP) RES
+# SUBI SP SP 1
+def fold_push_pop(program: List[Instruction], report: Report) -> List[Instruction]:
+    result = []
+    i = 0
+    while i < len(program):
+        window = program[i:i + 5]
+        if len(window) == 5 and window[0:2] == push and window[4:5] == pop:
+            right = window[2]
+            op = window[3]
+            if right[0] == "MOV" and right[1] == result_operand and is_plain(right[2]) and right[2] != result_operand \
+                    and op[0] in binary_ops and op[1:] == (result_operand, indirect(-1, SP), result_operand):
+                result.append((op[0], result_operand, result_operand, right[2]))
+                report.count("push pop", 4)
+                i += 5
+                continue
+        result.append(program[i])
+        i += 1
+    return result
+
+# OP RES a b             -> OP x a b
+# MOV x RES
+#
+# MOV RES a              -> OP x a b
+# OP x RES b
+def forward_result(program: List[Instruction], report: Report) -> List[Instruction]:
+    result = []
+    i = 0
+    while i < len(program):
+        if i + 1 < len(program):
+            instruction = program[i]
+            next_instruction = program[i + 1]
+            if writes_result(instruction) and next_instruction[0] == "MOV" and next_instruction[2] == result_operand \
+                    and next_instruction[1] != result_operand and not is_result_live(program, i + 2):
+                result.append((instruction[0], next_instruction[1], *instruction[2:]))
+                report.count("forward mov", 1)
+                i += 2
+                continue
+            if instruction[0] == "MOV" and instruction[1] == result_operand and instruction[2] != result_operand \
+                    and can_substitute(next_instruction, instruction[2]) \
+                    and (writes_result(next_instruction) or not is_result_live(program, i + 2)):
+                # the destination is only replaced for the ops which read it as an address
+                first = 1 if next_instruction[0] in address_ops else 2
+                substituted = [instruction[2] if operand == result_operand else operand
+                    for operand in next_instruction[first:]]
+                result.append((*next_instruction[0:first], *substituted))
+                report.count("forward mov", 1)
+                i += 2
+                continue
+        result.append(program[i])
+        i += 1
+    return result
+
+# OP RES a b where RES is written again or the block ends before it is read
+def remove_dead_result(program: List[Instruction], report: Report) -> List[Instruction]:
+    result = []
+    for i, instruction in enumerate(program):
+        if writes_result(instruction) and not is_result_live(program, i + 1):
+            report.count("dead store")
+            continue
+        result.append(instruction)
+    return result
+
+# ----------------------------------------------------------------
+# helper functions
+# ----------------------------------------------------------------
+# the labels directly at index, before the next instruction
+def get_following_labels(program: List[Instruction], index: int) -> List[str]:
+    labels = []
+    while index < len(program) and program[index][0] == LABEL:
+        labels.append(program[index][1])
+        index += 1
+    return labels
+
+# a branch target naming one of labels
+def is_label(operand: Operand, labels: List[str]) -> bool:
+    return operand[0] == IMMEDIATE and operand[1] in labels
+
+# an instruction which only computes a value into RES
+def writes_result(instruction: Instruction) -> bool:
+    if instruction[0] == "MOV" or instruction[0] in binary_ops or instruction[0] in unary_ops:
+        return instruction[1] == result_operand
+    return False
+
+def reads_result(instruction: Instruction) -> bool:
+    op = instruction[0]
+    if op == LABEL or op == DATA or op == PSTR:
+        return False
+    if op == "MOV" or op in binary_ops or op in unary_ops or op == "BLNK":
+        # the destination is only read if it is an address calculation
+        return any(mentions_result(operand) for operand in instruction[2:]) \
+            or (is_indirect(instruction[1]) and mentions_result(instruction[1]))
+    return any(mentions_result(operand) for operand in instruction[1:])
+
+def mentions_result(operand: Operand) -> bool:
+    return operand[1] == RES
+
+def is_indirect(operand: Operand) -> bool:
+    return operand[0] == INDIRECT
+
+# a literal or a variable, not a stack slot
+def is_plain(operand: Operand) -> bool:
+    return not is_indirect(operand)
+
+# whether RES may be read after index before it is written again
+def is_result_live(program: List[Instruction], index: int) -> bool:
+    while index < len(program):
+        instruction = program[index]
+        if reads_result(instruction):
+            return True
+        if writes_result(instruction):
+            return False
+        if instruction[0] in branch_ops or instruction[0] in [LABEL, "HALT", DATA]:
+            return False
+        index += 1
+    return False
+
+# whether RES can be replaced by source in the operands that instruction reads
+def can_substitute(instruction: Instruction, source: Operand) -> bool:
+    op = instruction[0]
+    if op in address_ops:
+        # an immediate would be read as an address
+        return instruction[1] == result_operand and source[0] == DIRECT
+    if op == "MOV" or op in binary_ops or op in unary_ops:
+        operands = instruction[2:]
+        return result_operand in operands and not (is_indirect(instruction[1]) and mentions_result(instruction[1])) \
+            and not any(is_indirect(operand) and mentions_result(operand) for operand in operands)
+    return False
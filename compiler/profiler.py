@@ -0,0 +1,188 @@
+import bisect
+from typing import Dict, List, Tuple
+
+from compiler.computer import HALT, MOV, ADD, SUB, MUL, DIV, MOD, ADDI, SUBI, EQ, NE, GT, LT, AND, ORR, NOT
+from compiler.computer import BRCH, CBZR, CBNZ, BLNK, BEQ, BNE, BLT, BGE, READ, PVAL, PSTR
+from compiler.computer import IMMEDIATE, DIRECT, Instruction
+from compiler.assembler import SP
+
+# profile of one run of a compiled program, filled in by computer.execute_profiled
+#
+#   instructions, data, symbols = compile_program(assembled)
+#   profile = Profile(symbols)
+#   execute_program(instructions, data, profile=profile)
+#   print(profile)                      or profile.to_json()
+#
+# pcs are mapped back to the nearest LABEL before them and to the PyScript function they are in
+
+op_names = {
+    HALT: "HALT", MOV: "MOV",
+    ADD: "ADD", SUB: "SUB", MUL: "MUL", DIV: "DIV", MOD: "MOD", ADDI: "ADDI", SUBI: "SUBI",
+    EQ: "EQ", NE: "NE", GT: "GT", LT: "LT",
+    AND: "AND", ORR: "ORR", NOT: "NOT",
+    BRCH: "BRCH", CBZR: "CBZR", CBNZ: "CBNZ", BLNK: "BLNK", BEQ: "BEQ", BNE: "BNE", BLT: "BLT", BGE: "BGE",
+    READ: "READ", PVAL: "PVAL", PSTR: "PSTR"
+}
+
+FUNCTION_PREFIX = "_FUNCTION_"
+BODY_LABEL = "_START_BODY"
+STACK_LABEL = "_STACK"
+BODY_NAME = "@body"
+
+TOP_COUNT = 10 # rows shown in each section of the text report
+
+class Profile:
+    def __init__(self, symbols: Dict[str, int] = None):
+        self.symbols = symbols if symbols is not None else {}
+        self.instructions = []
+        self.counts = []      # times each pc was executed
+        self.back_edges = {}  # (branch pc, target pc) -> times a branch went backwards
+        self.max_stack_depth = 0
+        self.stack_pointer = -1 # address of the stack pointer, -1 if the program has none
+        self.stack_base = 0
+        self.labels = []      # (pc, label) sorted by pc
+        self.function_labels = []
+        self.data_names = {}  # address -> name
+
+    def start(self, instructions: List[Instruction], data: List[Tuple[int, int]]):
+        self.instructions = instructions
+        self.counts = [0] * len(instructions)
+        self.back_edges = {}
+        self.labels = []
+        self.data_names = {}
+        data_addresses = set(address for address, _ in data)
+        for name, address in self.symbols.items():
+            if address in data_addresses:
+                self.data_names[address] = name
+            else:
+                self.labels.append((address, name))
+        self.labels.sort()
+        self.function_labels = [(pc, label) for pc, label in self.labels
+            if label.startswith(FUNCTION_PREFIX) or label == BODY_LABEL]
+        if SP in self.symbols and STACK_LABEL in self.symbols:
+            self.stack_pointer = self.symbols[SP]
+            self.stack_base = self.symbols[STACK_LABEL]
+
+    def get_cycles(self) -> int:
+        return sum(self.counts)
+
+    def get_opcode_counts(self) -> Dict[str, int]:
+        result = {}
+        for pc, count in enumerate(self.counts):
+            if count > 0:
+                name = op_names[self.instructions[pc][0]]
+                result[name] = result.get(name, 0) + count
+        return sort_counts(result)
+
+    def get_function_cycles(self) -> Dict[str, int]:
+        result = {}
+        for pc, count in enumerate(self.counts):
+            if count > 0:
+                function = self.get_function(pc)
+                result[function] = result.get(function, 0) + count
+        return sort_counts(result)
+
+    # a loop is a branch which went backwards, its cycles include any loops nested in it
+    def get_loops(self) -> List[Dict]:
+        result = []
+        for (branch, target), iterations in self.back_edges.items():
+            result.append({
+                "label": self.get_location(target),
+                "function": self.get_function(target),
+                "start": target,
+                "end": branch,
+                "iterations": iterations,
+                "cycles": sum(self.counts[target:branch + 1])
+            })
+        result.sort(key=lambda loop: loop["cycles"], reverse=True)
+        return result
+
+    def get_instructions(self) -> List[Dict]:
+        result = []
+        for pc, count in enumerate(self.counts):
+            if count > 0:
+                result.append({
+                    "pc": pc,
+                    "location": self.get_location(pc),
+                    "function": self.get_function(pc),
+                    "instruction": self.format_instruction(self.instructions[pc]),
+                    "count": count
+                })
+        result.sort(key=lambda instruction: instruction["count"], reverse=True)
+        return result
+
+    # the nearest label at or before pc: _LABEL_3+2
+    def get_location(self, pc: int) -> str:
+        label_pc, label = get_label_before(self.labels, pc)
+        if label == "":
+            return str(pc)
+        if label_pc == pc:
+            return label
+        return f"{label}+{pc - label_pc}"
+
+    # the PyScript function pc is in, or @body
+    def get_function(self, pc: int) -> str:
+        _, label = get_label_before(self.function_labels, pc)
+        if label.startswith(FUNCTION_PREFIX):
+            return label[len(FUNCTION_PREFIX):]
+        return BODY_NAME
+
+    # (ADD, (DIRECT, 5, 0), (INDIRECT, 12, -1), (IMMEDIATE, 1, 0)) -> ADD _RESULT (-1 _STACK_POINTER) 1
+    def format_instruction(self, instruction: Instruction) -> str:
+        op = instruction[0]
+        if op == PSTR:
+            return f'PSTR "{instruction[1]}"'
+        words = [op_names[op]]
+        for mode, address, offset in instruction[1:]:
+            if mode == IMMEDIATE:
+                words.append(str(address))
+                continue
+            name = self.data_names.get(address, f"({address})")
+            words.append(name if mode == DIRECT else f"({offset} {name})")
+        return " ".join(words)
+
+    def to_json(self) -> Dict:
+        return {
+            "cycles": self.get_cycles(),
+            "max_stack_depth": self.max_stack_depth,
+            "opcodes": self.get_opcode_counts(),
+            "functions": self.get_function_cycles(),
+            "loops": self.get_loops(),
+            "instructions": self.get_instructions()
+        }
+
+    def __str__(self):
+        cycles = self.get_cycles()
+        lines = [f"cycles: {cycles}", f"max stack depth: {self.max_stack_depth}"]
+
+        lines.append("opcodes:")
+        for name, count in self.get_opcode_counts().items():
+            lines.append(f"    {name:<6} {count:>10} {percent(count, cycles):>6}")
+
+        lines.append("functions:")
+        for name, count in self.get_function_cycles().items():
+            lines.append(f"    {name:<24} {count:>10} {percent(count, cycles):>6}")
+
+        lines.append("hot loops:")
+        for loop in self.get_loops()[:TOP_COUNT]:
+            lines.append(f"    {loop['label']:<24} pc {loop['start']}-{loop['end']} in {loop['function']}: "
+                + f"{loop['iterations']} iterations, {loop['cycles']} cycles {percent(loop['cycles'], cycles)}")
+
+        lines.append("hot instructions:")
+        for instruction in self.get_instructions()[:TOP_COUNT]:
+            lines.append(f"    {instruction['pc']:>5} {instruction['location']:<24} {instruction['count']:>10}  "
+                + instruction["instruction"])
+        return "\n".join(lines)
+
+# the last (pc, label) at or before pc in labels sorted by pc, (0, "") if there is none
+def get_label_before(labels: List[Tuple[int, str]], pc: int) -> Tuple[int, str]:
+    index = bisect.bisect_right(labels, (pc, chr(0x10ffff)))
+    if index == 0:
+        return (0, "")
+    return labels[index - 1]
+
+def sort_counts(counts: Dict[str, int]) -> Dict[str, int]:
+    return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+def percent(count: int, total: int) -> str:
+    return f"{100 * count / total:.1f}%" if total else "0.0%"
@@ -0,0 +1,196 @@
+import operator
+from typing import Dict, List, Set, Tuple
+from tokenization.commands import Capture, Change, Declaration, Command, Run, Show, Skip, While, If, Function
+from tokenization.enums import PLUS, MINUS, DIVIDE, MULTIPLY, MOD
+from tokenization.enums import AND, OR, NOT
+from tokenization.enums import EQUAL, NOTEQUAL, LESSTHAN, GREATERTHAN
+
+from tokenization.value import BBinary, BCompare, BLiteral, BUnary, Boolean, NBinary, NLiteral, NVariable, Number, String, Value
+
+# constant folding and propagation over the AST, run before interpreting or assembling
+# * operations on literals are computed once: !2 * 8! -> 16, |true and false| -> false
+# * declared variables which are never changed or captured are replaced by their value
+# * an if with a constant condition is replaced by the branch it takes,
+#   a while with a false condition is removed
+# the trees passed in are never modified, folded nodes are new nodes
+
+# variable name to the value it always holds
+Constants = Dict[str, int]
+
+number_operations = {
+    PLUS: operator.add,
+    MINUS: operator.sub,
+    MULTIPLY: operator.mul,
+    DIVIDE: operator.floordiv,
+    MOD: operator.mod
+}
+
+comparison_operations = {
+    EQUAL: operator.eq,
+    NOTEQUAL: operator.ne,
+    LESSTHAN: operator.lt,
+    GREATERTHAN: operator.gt
+}
+
+boolean_operations = {
+    AND: operator.and_,
+    OR: operator.or_
+}
+
+def fold_program(declarations: List[Declaration], functions: List[Function], program: List[Command]) \
+        -> Tuple[List[Declaration], List[Function], List[Command]]:
+    changed = get_changed_variables(functions, program)
+
+    # declarations run in order before anything is changed so each can use the ones before it
+    declared = {}
+    folded_declarations = []
+    for declaration in declarations:
+        value = fold_value(declaration.value, declared)
+        folded_declarations.append(Declaration(declaration.variable, value))
+        if is_number_literal(value):
+            declared[declaration.variable] = value.content.content.value
+        else:
+            declared.pop(declaration.variable, None)
+
+    constants = {variable: value for variable, value in declared.items() if variable not in changed}
+    folded_functions = [Function(function.name, fold_body(function.body, constants)) for function in functions]
+    folded_program = fold_body(program, constants)
+    return (folded_declarations, folded_functions, folded_program)
+
+# every variable written by a change or capture anywhere in the program
+def get_changed_variables(functions: List[Function], program: List[Command]) -> Set[str]:
+    changed = set()
+    for function in functions:
+        add_changed_variables(function.body, changed)
+    add_changed_variables(program, changed)
+    return changed
+
+def add_changed_variables(body: List[Command], changed: Set[str]):
+    for command in body:
+        type = command.type
+        content = command.content
+        if type == Change or type == Capture:
+            changed.add(content.variable)
+        elif type == If:
+            add_changed_variables(content.true_part, changed)
+            add_changed_variables(content.false_part, changed)
+        elif type == While:
+            add_changed_variables(content.body, changed)
+
+# ----------------------------------------------------------------
+# fold commands
+# ----------------------------------------------------------------
+def fold_body(body: List[Command], constants: Constants) -> List[Command]:
+    result = []
+    for command in body:
+        result.extend(fold_command(command, constants))
+    return result
+
+# returns the commands which replace command
+def fold_command(command: Command, constants: Constants) -> List[Command]:
+    type = command.type
+    content = command.content
+    if type == Change:
+        return [Command(Change, Change(content.variable, fold_value(content.value, constants)), command.line, command.column)]
+    elif type == Show:
+        return [Command(Show, Show(fold_value(content.value, constants)), command.line, command.column)]
+    elif type == If:
+        condition = fold_boolean(content.condition, constants)
+        if condition.type == BLiteral:
+            taken = content.true_part if condition.content.value else content.false_part
+            return fold_body(taken, constants)
+        true_part = fold_body(content.true_part, constants)
+        false_part = fold_body(content.false_part, constants)
+        return [Command(If, If(condition, true_part, false_part), command.line, command.column)]
+    elif type == While:
+        condition = fold_boolean(content.condition, constants)
+        if condition.type == BLiteral and not condition.content.value:
+            return []
+        return [Command(While, While(condition, fold_body(content.body, constants)), command.line, command.column)]
+    elif type == Capture or type == Skip or type == Run:
+        return [command]
+    else:
+        assert False, f"Unreachable in fold_command, bad type {type}"
+
+# ----------------------------------------------------------------
+# fold values
+# ----------------------------------------------------------------
+def fold_value(value: Value, constants: Constants) -> Value:
+    if value.type == String:
+        return value
+    elif value.type == Number:
+        return Value(Number, fold_number(value.content, constants))
+    elif value.type == Boolean:
+        return Value(Boolean, fold_boolean(value.content, constants))
+    else:
+        assert False, f"Unreachable in fold_value, bad type {value.type}"
+
+def fold_number(num: Number, constants: Constants) -> Number:
+    type = num.type
+    if type == NLiteral:
+        return num
+    elif type == NVariable:
+        if num.content.variable in constants:
+            return make_number(constants[num.content.variable])
+        return num
+    elif type == NBinary:
+        operation = num.content.operation
+        left = fold_number(num.content.left, constants)
+        right = fold_number(num.content.right, constants)
+        if left.type == NLiteral and right.type == NLiteral:
+            try:
+                return make_number(number_operations[operation](left.content.value, right.content.value))
+            except ZeroDivisionError:
+                pass # left for the program to fail on when it runs
+        return Number(NBinary, NBinary(operation, left, right))
+    else:
+        assert False, f"Unreachable in fold_number, bad type {type}"
+
+def fold_boolean(boolean: Boolean, constants: Constants) -> Boolean:
+    type = boolean.type
+    if type == BLiteral:
+        return boolean
+    elif type == BCompare:
+        operation = boolean.content.operation
+        left = fold_number(boolean.content.left, constants)
+        right = fold_number(boolean.content.right, constants)
+        if left.type == NLiteral and right.type == NLiteral:
+            return make_boolean(comparison_operations[operation](left.content.value, right.content.value))
+        return Boolean(BCompare, BCompare(operation, left, right))
+    elif type == BUnary:
+        operation = boolean.content.operation
+        body = fold_boolean(boolean.content.body, constants)
+        if body.type == BLiteral and operation == NOT:
+            return make_boolean(not body.content.value)
+        return Boolean(BUnary, BUnary(operation, body))
+    elif type == BBinary:
+        return fold_bbinary(boolean.content, constants)
+    else:
+        assert False, f"Unreachable in fold_boolean, bad type {type}"
+
+# true and x -> x, false or x -> x
+# false and x, true or x are kept since x may still fail when it runs, as in !1 / 0!
+def fold_bbinary(boolean: BBinary, constants: Constants) -> Boolean:
+    operation = boolean.operation
+    left = fold_boolean(boolean.left, constants)
+    right = fold_boolean(boolean.right, constants)
+    if left.type == BLiteral and right.type == BLiteral:
+        return make_boolean(boolean_operations[operation](left.content.value, right.content.value))
+    identity = operation == AND
+    if left.type == BLiteral and left.content.value == identity:
+        return right
+    if right.type == BLiteral and right.content.value == identity:
+        return left
+    return Boolean(BBinary, BBinary(operation, left, right))
+
+# ----------------------------------------------------------------
+# helper functions
+# ----------------------------------------------------------------
+def make_number(value: int) -> Number:
+    return Number(NLiteral, NLiteral(value))
+
+def make_boolean(value: bool) -> Boolean:
+    return Boolean(BLiteral, BLiteral(value))
+
+def is_number_literal(value: Value) -> bool:
+    return value.type == Number and value.content.type == NLiteral
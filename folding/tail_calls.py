@@ -0,0 +1,35 @@
+from typing import List
+from tokenization.commands import Command, Function, If, Run
+
+# marks every run which is the last thing its function does as a tail call
+# a tail call can reuse the frame of the function making it, so the interpreters
+# loop instead of recursing and the assembler jumps instead of pushing a return address
+#
+#   function collatz {
+#       if |number > 1| {
+#           ...
+#           run collatz         <- tail call
+#       } {}
+#   }
+#
+# the trees passed in are never modified, marked commands are new commands
+
+def mark_tail_calls(functions: List[Function]) -> List[Function]:
+    return [Function(function.name, mark_tail_body(function.body)) for function in functions]
+
+# only the last command of a body in tail position is in tail position
+def mark_tail_body(body: List[Command]) -> List[Command]:
+    if len(body) == 0:
+        return body
+    return body[:-1] + [mark_tail_command(body[-1])]
+
+def mark_tail_command(command: Command) -> Command:
+    type = command.type
+    content = command.content
+    if type == Run:
+        return Command(Run, Run(content.function, True), command.line, command.column)
+    elif type == If:
+        marked = If(content.condition, mark_tail_body(content.true_part), mark_tail_body(content.false_part))
+        return Command(If, marked, command.line, command.column)
+    # a while runs its body again so nothing in it is in tail position
+    return command
@@ -0,0 +1,239 @@
+import operator
+from typing import Callable, Dict, List
+from tokenization.commands import Capture, Change, Declaration, Command, Run, Show, Skip, While, If, Function
+from tokenization.enums import PLUS, MINUS, DIVIDE, MULTIPLY, MOD
+from tokenization.enums import AND, OR, NOT
+from tokenization.enums import EQUAL, NOTEQUAL, LESSTHAN, GREATERTHAN
+
+from tokenization.value import BBinary, BCompare, BLiteral, BUnary, Boolean, NBinary, NLiteral, NVariable, Number, String, Value
+
+from parsing.parse_value import parse_number
+from streams.streams import capture, show
+from interpreter.interpreter import declarations_to_state
+from interpreter.resolve import Slots, get_slot, resolve
+from folding.fold import fold_program
+from folding.tail_calls import mark_tail_calls
+
+# compiles the AST once into nested closures which each take the state
+# so running the program does no type dispatch on the AST
+# the state is a flat list indexed by the slots from resolve
+Closure = Callable[[List], object]
+
+number_operations = {
+    PLUS: operator.add,
+    MINUS: operator.sub,
+    MULTIPLY: operator.mul,
+    DIVIDE: operator.floordiv,
+    MOD: operator.mod
+}
+
+comparison_operations = {
+    EQUAL: operator.eq,
+    NOTEQUAL: operator.ne,
+    LESSTHAN: operator.lt,
+    GREATERTHAN: operator.gt
+}
+
+def interpret_closures(declarations: List[Declaration], functions: List[Function], program: List[Command]):
+    slots = resolve(declarations, functions, program)
+    declarations, functions, program = fold_program(declarations, functions, program)
+    functions = mark_tail_calls(functions)
+    state = get_initial_state(declarations, slots)
+    run_program = compile_program(functions, program, slots)
+    run_program(state)
+
+def get_initial_state(declarations: List[Declaration], slots: Slots) -> List:
+    initial_state = declarations_to_state(declarations)
+    return [initial_state[variable]["value"] for variable in slots]
+
+def compile_program(functions: List[Function], program: List[Command], slots: Slots) -> Closure:
+    # filled in after compiling so functions can run each other and themselves
+    functions_table = {}
+    for function in functions:
+        functions_table[function.name] = compile_body(function.body, functions_table, slots)
+    return compile_body(program, functions_table, slots)
+
+def compile_body(body: List[Command], functions: Dict[str, Closure], slots: Slots) -> Closure:
+    commands = [compile_command(command, functions, slots) for command in body]
+    if len(commands) == 1:
+        return commands[0]
+    # the result of the last command is the function to tail call, if any
+    def run_body(state):
+        result = None
+        for command in commands:
+            result = command(state)
+        return result
+    return run_body
+
+# ----------------------------------------------------------------
+# compile commands
+# ----------------------------------------------------------------
+def compile_command(command: Command, functions: Dict[str, Closure], slots: Slots) -> Closure:
+    type = command.type
+    if type == Change:
+        return compile_change(command.content, slots)
+    elif type == Show:
+        return compile_show(command.content, slots)
+    elif type == Capture:
+        return compile_capture(command.content, slots)
+    elif type == If:
+        return compile_if(command.content, functions, slots)
+    elif type == While:
+        return compile_while(command.content, functions, slots)
+    elif type == Skip:
+        return compile_skip(command.content)
+    elif type == Run:
+        return compile_run(command.content, functions)
+    else:
+        assert False, f"Unreachable in compile_command, bad type {type}"
+
+def compile_change(content: Change, slots: Slots) -> Closure:
+    value = compile_value(content.value, slots)
+    slot = get_slot(content.variable, slots)
+    def run_change(state):
+        state[slot] = value(state)
+    return run_change
+
+def compile_show(content: Show, slots: Slots) -> Closure:
+    value = compile_value(content.value, slots)
+    def run_show(state):
+        show(value(state))
+    return run_show
+
+def compile_capture(content: Capture, slots: Slots) -> Closure:
+    slot = get_slot(content.variable, slots)
+    def run_capture(state):
+        value = compile_number(parse_number(capture()), slots)
+        state[slot] = value(state)
+    return run_capture
+
+def compile_if(content: If, functions: Dict[str, Closure], slots: Slots) -> Closure:
+    condition = compile_boolean(content.condition, slots)
+    true_part = compile_body(content.true_part, functions, slots)
+    false_part = compile_body(content.false_part, functions, slots)
+    def run_if(state):
+        if condition(state):
+            return true_part(state)
+        else:
+            return false_part(state)
+    return run_if
+
+def compile_while(content: While, functions: Dict[str, Closure], slots: Slots) -> Closure:
+    condition = compile_boolean(content.condition, slots)
+    body = compile_body(content.body, functions, slots)
+    def run_while(state):
+        while condition(state):
+            body(state)
+    return run_while
+
+def compile_skip(content: Skip) -> Closure:
+    def run_skip(state):
+        pass
+    return run_skip
+
+# a function returns the function it tail calls, which is run next in the same loop
+def compile_run(content: Run, functions: Dict[str, Closure]) -> Closure:
+    function_name = content.function
+    if content.tail:
+        def run_tail_call(state):
+            return functions[function_name]
+        return run_tail_call
+    def run_run(state):
+        function = functions[function_name]
+        while function is not None:
+            function = function(state)
+    return run_run
+
+# ----------------------------------------------------------------
+# compile values
+# ----------------------------------------------------------------
+def compile_value(value: Value, slots: Slots) -> Closure:
+    if value.type == String:
+        return compile_string(value.content)
+    elif value.type == Number:
+        return compile_number(value.content, slots)
+    elif value.type == Boolean:
+        return compile_boolean(value.content, slots)
+    else:
+        assert False, f"Unreachable in compile_value, bad type {value.type}"
+
+def compile_string(value: String) -> Closure:
+    content = value.content
+    return lambda state: content
+
+def compile_number(value: Number, slots: Slots) -> Closure:
+    type = value.type
+    if type == NBinary:
+        return compile_nbinary(value.content, slots)
+    elif type == NLiteral:
+        return compile_nliteral(value.content)
+    elif type == NVariable:
+        return compile_nvariable(value.content, slots)
+    else:
+        assert False, f"Unreachable in compile_number, bad type {type}"
+
+def compile_nbinary(value: NBinary, slots: Slots) -> Closure:
+    left = compile_number(value.left, slots)
+    right = compile_number(value.right, slots)
+    operation = number_operations[value.operation]
+    return lambda state: operation(left(state), right(state))
+
+def compile_nliteral(value: NLiteral) -> Closure:
+    literal = value.value
+    return lambda state: literal
+
+def compile_nvariable(value: NVariable, slots: Slots) -> Closure:
+    slot = get_slot(value.variable, slots)
+    return lambda state: state[slot]
+
+def compile_boolean(value: Boolean, slots: Slots) -> Closure:
+    type = value.type
+    if type == BCompare:
+        return compile_bcompare(value.content, slots)
+    elif type == BUnary:
+        return compile_bunary(value.content, slots)
+    elif type == BBinary:
+        return compile_bbinary(value.content, slots)
+    elif type == BLiteral:
+        return compile_bliteral(value.content)
+    else:
+        assert False, f"Unreachable in compile_boolean, bad type {type}"
+
+def compile_bliteral(value: BLiteral) -> Closure:
+    literal = value.value
+    return lambda state: literal
+
+# both sides are computed before they are combined, as in the interpreter,
+# since the right side may still fail when the left decides
+def compile_bbinary(value: BBinary, slots: Slots) -> Closure:
+    left = compile_boolean(value.left, slots)
+    right = compile_boolean(value.right, slots)
+    type = value.operation
+    if type == AND:
+        def run_and(state):
+            left_value = left(state)
+            right_value = right(state)
+            return left_value and right_value
+        return run_and
+    elif type == OR:
+        def run_or(state):
+            left_value = left(state)
+            right_value = right(state)
+            return left_value or right_value
+        return run_or
+    else:
+        assert False, f"Unreachable in compile_bbinary, bad operation {type}"
+
+def compile_bunary(value: BUnary, slots: Slots) -> Closure:
+    body = compile_boolean(value.body, slots)
+    type = value.operation
+    if type == NOT:
+        return lambda state: not body(state)
+    else:
+        assert False, f"Unreachable in compile_bunary, bad operation {type}"
+
+def compile_bcompare(value: BCompare, slots: Slots) -> Closure:
+    left = compile_number(value.left, slots)
+    right = compile_number(value.right, slots)
+    operation = comparison_operations[value.operation]
+    return lambda state: operation(left(state), right(state))
@@ -11,6 +11,10 @@ from tokenization.value import BBinary, BCompare, BLiteral, BUnary, Boolean, Boo
 # import parsing.parse_value
 # parse_value = parsing.parse_value.parse_value
 from parsing.parse_value import parse_number
+from streams.streams import capture, show
+from interpreter.resolve import resolve
+from folding.fold import fold_program
+from folding.tail_calls import mark_tail_calls
 
 ConcreteTypes = Union[str, bool, int]
 
@@ -22,8 +26,10 @@ def get_boolean_display(bool: bool) -> BooleanLiterals:
         return FALSEBOOL
 
 def interpret(declarations: List[Declaration], functions: List[Function], program: List[Command]):
+    resolve(declarations, functions, program)
+    declarations, functions, program = fold_program(declarations, functions, program)
     state = declarations_to_state(declarations)
-    functions = get_functions_table(functions)
+    functions = get_functions_table(mark_tail_calls(functions))
     for command in program:
         interpret_command(command, state, functions)
 
@@ -45,6 +51,7 @@ def get_functions_table(functions: List[Function]):
         result[function.name] = function.body
     return result
 
+# returns the name of the function to tail call next, if the command ended in a tail call
 def interpret_command(command: Command, state, functions):
     type = command.type
     if type == Change:
@@ -54,13 +61,13 @@ def interpret_command(command: Command, state, functions):
     elif type == Capture:
         interpret_capture(command.content, state)
     elif type == If:
-        interpret_if(command.content, state, functions)
+        return interpret_if(command.content, state, functions)
     elif type == While:
         interpret_while(command.content, state, functions)
     elif type == Skip:
         interpret_skip(command.content, state)
     elif type == Run:
-        interpret_run(command.content, state, functions)
+        return interpret_run(command.content, state, functions)
     else:
         print(f"unreachable in interpret_command bad type {type}")
 
@@ -77,22 +84,24 @@ def interpret_change(content: Change, state):
     store(value, content.variable, state)
 
 def interpret_show(content: Show, state):
-    print(interpret_value(content.value, state))
+    show(interpret_value(content.value, state))
 
 def interpret_capture(content: Capture, state):
-    user_input = input()
+    user_input = capture()
     parsed_input = parse_number(user_input)
     value = interpret_number(parsed_input, state)
     store(value, content.variable, state)
 
 def interpret_if(content: If, state, functions):
     condition = interpret_boolean(content.condition, state)
+    tail_call = None
     if condition:
         for command in content.true_part:
-            interpret_command(command, state, functions)
+            tail_call = interpret_command(command, state, functions)
     else:
         for command in content.false_part:
-            interpret_command(command, state, functions)
+            tail_call = interpret_command(command, state, functions)
+    return tail_call
 
 def interpret_while(content: While, state, functions):
     condition = interpret_boolean(content.condition, state)
@@ -105,16 +114,20 @@ def interpret_skip(content: Skip, state):
     # do nothing
     pass
 
+# a tail call is handed back to the run that called the current function,
+# which runs it next in a loop instead of nesting another call
 def interpret_run(content: Run, state, functions):
+    if content.tail:
+        return content.function
     function_name = content.function
-    function_body = functions[function_name]
-    for command in function_body:
-        interpret_command(command, state, functions)
+    while function_name is not None:
+        tail_call = None
+        for command in functions[function_name]:
+            tail_call = interpret_command(command, state, functions)
+        function_name = tail_call
 
+# interpret resolves the program first, so every variable here is declared
 def store(value, variable, state):
-    if variable not in state:
-        print("variable is not declared")
-        exit(1)
     state[variable]["value"] = value
 
 def interpret_string(value: String, state) -> str:
@@ -153,8 +166,6 @@ def interpret_nvariable(value: NVariable, state) -> int:
     return lookup(value.variable, state)
 
 def lookup(variable: str, state: Dict[str, Dict]) -> ConcreteTypes:
-    if variable not in state:
-        print(f"variable {variable} is not declared")
     return state[variable]["value"]
 
 def interpret_boolean(value: Boolean, state) -> bool:
@@ -0,0 +1,134 @@
+from typing import List
+from tokenization.commands import Capture, Change, Declaration, Command, Run, Show, Skip, While, If, Function
+from tokenization.value import Boolean
+
+from interpreter.interpreter import declarations_to_state, get_functions_table
+from interpreter.interpreter import interpret_boolean, interpret_capture, interpret_change, interpret_show
+from interpreter.resolve import resolve
+from folding.fold import fold_program
+from folding.tail_calls import mark_tail_calls
+
+# interprets the program from an explicit stack of frames instead of nesting Python calls,
+# so the depth of ifs, whiles and runs is limited only by memory
+# and the program can be paused after any step and resumed later
+#
+#   machine = Machine(declarations, functions, program)
+#   while not machine.run(1000):    run at most 1000 steps at a time
+#       ...                         anything else, the program is paused here
+
+class Frame:
+    def __init__(self, body: List[Command], condition: Boolean = None, function: str = ""):
+        self.body = body
+        self.index = 0              # the next command to run
+        self.condition = condition  # for the body of a while, tested again each time the body ends
+        self.function = function    # the function this is the body of, "" if it is not a function body
+
+class Machine:
+    def __init__(self, declarations: List[Declaration], functions: List[Function], program: List[Command]):
+        resolve(declarations, functions, program)
+        declarations, functions, program = fold_program(declarations, functions, program)
+        self.state = declarations_to_state(declarations)
+        self.functions = get_functions_table(mark_tail_calls(functions))
+        self.frames = [Frame(program)]
+        self.steps = 0
+
+    def is_finished(self) -> bool:
+        self.pop_finished_frames()
+        return len(self.frames) == 0
+
+    # runs until the program ends or max_steps steps have run, -1 for no limit
+    # returns whether the program has ended
+    def run(self, max_steps: int = -1) -> bool:
+        while max_steps != 0:
+            if not self.step():
+                return True
+            max_steps -= 1
+        return self.is_finished()
+
+    # the same as run but also stops before a capture, so the input can be waited for
+    def run_until_input(self, max_steps: int = -1) -> bool:
+        while max_steps != 0:
+            if self.wants_input():
+                return False
+            if not self.step():
+                return True
+            max_steps -= 1
+        return self.is_finished()
+
+    # whether the next step is a capture
+    def wants_input(self) -> bool:
+        self.pop_finished_frames()
+        if len(self.frames) == 0:
+            return False
+        frame = self.frames[-1]
+        return frame.index < len(frame.body) and frame.body[frame.index].type == Capture
+
+    # runs one command or one test of a while condition, returns False once the program has ended
+    def step(self) -> bool:
+        self.pop_finished_frames()
+        if len(self.frames) == 0:
+            return False
+        self.steps += 1
+
+        frame = self.frames[-1]
+        if frame.index == len(frame.body):
+            # the end of the body of a while
+            if interpret_boolean(frame.condition, self.state):
+                frame.index = 0
+            else:
+                self.frames.pop()
+            return True
+
+        command = frame.body[frame.index]
+        frame.index += 1
+        self.execute_command(command)
+        return True
+
+    def pop_finished_frames(self):
+        frames = self.frames
+        while len(frames) > 0 and frames[-1].index == len(frames[-1].body) and frames[-1].condition is None:
+            frames.pop()
+
+    # ----------------------------------------------------------------
+    # commands
+    # ----------------------------------------------------------------
+    def execute_command(self, command: Command):
+        type = command.type
+        content = command.content
+        if type == Change:
+            interpret_change(content, self.state)
+        elif type == Show:
+            interpret_show(content, self.state)
+        elif type == Capture:
+            interpret_capture(content, self.state)
+        elif type == If:
+            self.execute_if(content)
+        elif type == While:
+            self.execute_while(content)
+        elif type == Skip:
+            pass
+        elif type == Run:
+            self.execute_run(content)
+        else:
+            assert False, f"Unreachable in execute_command, bad type {type}"
+
+    def execute_if(self, content: If):
+        if interpret_boolean(content.condition, self.state):
+            self.frames.append(Frame(content.true_part))
+        else:
+            self.frames.append(Frame(content.false_part))
+
+    def execute_while(self, content: While):
+        if interpret_boolean(content.condition, self.state):
+            self.frames.append(Frame(content.body, content.condition))
+
+    # a tail call is the last thing its function does, so the function's frames
+    # are all finished and are replaced by the frame of the called function
+    def execute_run(self, content: Run):
+        if content.tail:
+            while self.frames.pop().function == "":
+                pass
+        self.frames.append(Frame(self.functions[content.function], function=content.function))
+
+def interpret_machine(declarations: List[Declaration], functions: List[Function], program: List[Command]):
+    Machine(declarations, functions, program).run()
@@ -0,0 +1,168 @@
+import time
+from typing import Dict, List, Tuple
+from tokenization.commands import Capture, Change, Declaration, Command, Run, Show, Skip, While, If, Function
+
+from interpreter.interpreter import declarations_to_state, get_functions_table
+from interpreter.interpreter import interpret_boolean, interpret_capture, interpret_change, interpret_show
+from interpreter.resolve import resolve
+from folding.fold import fold_program
+from folding.tail_calls import mark_tail_calls
+
+# runs the program like interpreter.interpret while timing every command and function run
+#
+#   profile = Profile()
+#   profile_program(declarations, functions, program, profile)
+#   print(profile.report(source_lines))
+#   profile.collapsed_stacks()          for flamegraph.pl and similar tools
+#
+# kept separate from the interpreter so interpreting without a profile pays nothing for it
+
+BODY_NAME = "@body"
+TOP_COUNT = 15 # rows shown in each section of the report
+
+command_names = {
+    Change: "change",
+    Show: "show",
+    Capture: "capture",
+    If: "if",
+    While: "while",
+    Skip: "skip",
+    Run: "run"
+}
+
+# (function, line, column, command name)
+CommandKey = Tuple[str, int, int, str]
+
+class Profile:
+    def __init__(self):
+        self.commands = {}  # CommandKey -> [count, seconds including nested commands]
+        self.functions = {} # name -> [count, seconds]
+        self.stacks = {}    # "frame;frame;..." -> seconds spent in the last frame itself
+        self.frames = [BODY_NAME]
+        self.function_names = [BODY_NAME]
+        self.child_seconds = [0.0]
+        self.active = {}    # key -> how many runs of it are in progress, for recursion
+
+    def enter(self, frame: str):
+        self.frames.append(frame)
+        self.child_seconds.append(0.0)
+
+    # records seconds for the current frame and returns to the one before it
+    def leave(self, seconds: float):
+        own_seconds = seconds - self.child_seconds.pop()
+        self.child_seconds[-1] += seconds
+        stack = ";".join(self.frames)
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + own_seconds
+        self.frames.pop()
+
+    def begin(self, key):
+        self.active[key] = self.active.get(key, 0) + 1
+
+    # only the outermost of recursive runs adds its time so it is not counted twice
+    def record(self, table: Dict, key, seconds: float):
+        self.active[key] -= 1
+        entry = table.setdefault(key, [0, 0.0])
+        entry[0] += 1
+        if self.active[key] == 0:
+            entry[1] += seconds
+
+    # hottest commands and functions by total time
+    def report(self, source_lines: List[str] = None) -> str:
+        lines = ["functions:"]
+        lines.append(f"    {'name':<24} {'runs':>10} {'total ms':>12} {'ms/run':>10}")
+        for name, (count, seconds) in sort_by_time(self.functions):
+            lines.append(f"    {name:<24} {count:>10} {1000 * seconds:>12.3f} {1000 * seconds / count:>10.4f}")
+
+        lines.append("commands:")
+        lines.append(f"    {'line':<10} {'function':<20} {'runs':>10} {'total ms':>12} {'ms/run':>10}")
+        for (function, line, column, name), (count, seconds) in sort_by_time(self.commands)[:TOP_COUNT]:
+            text = name
+            if source_lines is not None and 0 < line <= len(source_lines):
+                text = source_lines[line - 1].strip()
+            lines.append(f"    {f'{line}:{column}':<10} {function:<20} {count:>10} {1000 * seconds:>12.3f} "
+                + f"{1000 * seconds / count:>10.4f}  {text}")
+        return "\n".join(lines)
+
+    # one line per stack, "@body;@body:40 while;print_message;print_message:9 if 1234"
+    # where the number is microseconds spent in the last frame itself
+    def collapsed_stacks(self) -> str:
+        lines = []
+        for stack, seconds in sorted(self.stacks.items()):
+            lines.append(f"{stack} {round(seconds * 1000000)}")
+        return "\n".join(lines)
+
+def sort_by_time(table: Dict) -> List:
+    return sorted(table.items(), key=lambda item: item[1][1], reverse=True)
+
+def profile_program(declarations: List[Declaration], functions: List[Function], program: List[Command], profile: Profile):
+    resolve(declarations, functions, program)
+    declarations, functions, program = fold_program(declarations, functions, program)
+    state = declarations_to_state(declarations)
+    functions = get_functions_table(mark_tail_calls(functions))
+    profile.begin(BODY_NAME)
+    start = time.perf_counter()
+    profile_body(program, state, functions, profile)
+    profile.record(profile.functions, BODY_NAME, time.perf_counter() - start)
+
+# returns the name of the function to tail call next, the same as interpreter.interpret_command
+def profile_body(body: List[Command], state, functions, profile: Profile):
+    tail_call = None
+    for command in body:
+        tail_call = profile_command(command, state, functions, profile)
+    return tail_call
+
+def profile_command(command: Command, state, functions, profile: Profile):
+    name = command_names[command.type]
+    function = profile.function_names[-1]
+    key = (function, command.line, command.column, name)
+    profile.enter(f"{function}:{command.line} {name}")
+    profile.begin(key)
+    start = time.perf_counter()
+
+    tail_call = None
+    type = command.type
+    content = command.content
+    if type == Change:
+        interpret_change(content, state)
+    elif type == Show:
+        interpret_show(content, state)
+    elif type == Capture:
+        interpret_capture(content, state)
+    elif type == If:
+        if interpret_boolean(content.condition, state):
+            tail_call = profile_body(content.true_part, state, functions, profile)
+        else:
+            tail_call = profile_body(content.false_part, state, functions, profile)
+    elif type == While:
+        while interpret_boolean(content.condition, state):
+            profile_body(content.body, state, functions, profile)
+    elif type == Skip:
+        pass
+    elif type == Run:
+        tail_call = profile_run(content, state, functions, profile)
+    else:
+        assert False, f"Unreachable in profile_command, bad type {type}"
+
+    seconds = time.perf_counter() - start
+    profile.leave(seconds)
+    profile.record(profile.commands, key, seconds)
+    return tail_call
+
+# a tail call is handed back to the run that called the current function, which runs it next in a loop,
+# so the function it replaces leaves the stack first and a chain of tail calls never gets deeper
+# the time of the whole chain is counted in the command which started it
+def profile_run(content: Run, state, functions, profile: Profile):
+    if content.tail:
+        return content.function
+    name = content.function
+    while name is not None:
+        profile.enter(name)
+        profile.function_names.append(name)
+        profile.begin(name)
+        start = time.perf_counter()
+        tail_call = profile_body(functions[name], state, functions, profile)
+        seconds = time.perf_counter() - start
+        profile.function_names.pop()
+        profile.leave(seconds)
+        profile.record(profile.functions, name, seconds)
+        name = tail_call
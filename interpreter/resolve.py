@@ -0,0 +1,101 @@
+from typing import Dict, List
+from tokenization.commands import Capture, Change, Declaration, Command, Run, Show, Skip, While, If, Function
+from tokenization.value import BBinary, BCompare, BUnary, Boolean, NBinary, NVariable, Number, Value
+
+# maps every declared variable to an integer slot so the program
+# can run against a flat list instead of a dict of dicts
+Slots = Dict[str, int]
+
+# raised when the program uses a variable or function that was never declared
+class ResolveError(Exception):
+    pass
+
+def resolve(declarations: List[Declaration], functions: List[Function], program: List[Command]) -> Slots:
+    slots = get_slots(declarations)
+    function_names = set(function.name for function in functions)
+
+    errors = []
+    for function in functions:
+        errors.extend(check_body(function.body, slots, function_names))
+    errors.extend(check_body(program, slots, function_names))
+    if errors:
+        raise ResolveError("\n".join(errors))
+    return slots
+
+def get_slots(declarations: List[Declaration]) -> Slots:
+    slots = {}
+    for declaration in declarations:
+        if declaration.variable not in slots:
+            slots[declaration.variable] = len(slots)
+    return slots
+
+def get_slot(variable: str, slots: Slots) -> int:
+    if variable not in slots:
+        raise ResolveError(f"variable {variable} is not declared")
+    return slots[variable]
+
+# ----------------------------------------------------------------
+# check commands
+# ----------------------------------------------------------------
+def check_body(body: List[Command], slots: Slots, function_names) -> List[str]:
+    errors = []
+    for command in body:
+        errors.extend(check_command(command, slots, function_names))
+    return errors
+
+def check_command(command: Command, slots: Slots, function_names) -> List[str]:
+    type = command.type
+    content = command.content
+    if type == Change:
+        return check_variable(content.variable, slots) + check_value(content.value, slots)
+    elif type == Show:
+        return check_value(content.value, slots)
+    elif type == Capture:
+        return check_variable(content.variable, slots)
+    elif type == If:
+        return check_boolean(content.condition, slots) \
+            + check_body(content.true_part, slots, function_names) \
+            + check_body(content.false_part, slots, function_names)
+    elif type == While:
+        return check_boolean(content.condition, slots) + check_body(content.body, slots, function_names)
+    elif type == Skip:
+        return []
+    elif type == Run:
+        if content.function not in function_names:
+            return [f"function {content.function} is not declared"]
+        return []
+    else:
+        assert False, f"Unreachable in check_command, bad type {type}"
+
+def check_variable(variable: str, slots: Slots) -> List[str]:
+    if variable not in slots:
+        return [f"variable {variable} is not declared"]
+    return []
+
+# ----------------------------------------------------------------
+# check values
+# ----------------------------------------------------------------
+def check_value(value: Value, slots: Slots) -> List[str]:
+    if value.type == Number:
+        return check_number(value.content, slots)
+    elif value.type == Boolean:
+        return check_boolean(value.content, slots)
+    return []
+
+def check_number(value: Number, slots: Slots) -> List[str]:
+    type = value.type
+    if type == NBinary:
+        return check_number(value.content.left, slots) + check_number(value.content.right, slots)
+    elif type == NVariable:
+        return check_variable(value.content.variable, slots)
+    return []
+
+def check_boolean(value: Boolean, slots: Slots) -> List[str]:
+    type = value.type
+    if type == BCompare:
+        return check_number(value.content.left, slots) + check_number(value.content.right, slots)
+    elif type == BUnary:
+        return check_boolean(value.content.body, slots)
+    elif type == BBinary:
+        return check_boolean(value.content.left, slots) + check_boolean(value.content.right, slots)
+    return []
@@ -1,10 +1,24 @@
+import json
 import sys
-from compiler.computer import execute_machine_code
+from compiler.computer import MemoryFault, OverflowFault, execute_machine_code, execute_program
+from compiler.optimizer import optimize, optimize_with_report
+from compiler.object_file import ObjectFormatError, is_object_file, load_object, write_object
+from compiler.profiler import Profile
 
 from interpreter.interpreter import interpret
-from parsing.parse import parse
-from compiler.assembler import assemble
-from compiler.compiler import compile
+from interpreter.closures import interpret_closures
+from interpreter.machine import interpret_machine
+from interpreter.profiler import Profile as InterpreterProfile, profile_program
+from interpreter.resolve import ResolveError
+from parsing.lexer import ParseError
+from vm.bytecode import compile_bytecode
+from vm.disassembler import disassemble
+from vm.vm import interpret_vm
+from transpiler.transpile import run_python
+from compiler.compiler import compile_program, format_compiled
+from compiler.instruction import format_program
+from cache.cache import cached_assemble, cached_compile, cached_parse, cached_transpile, get_cache_directory
+from streams.streams import flush, terminal_streams, using_streams
 
 """
 [file] is a file name
@@ -27,11 +41,25 @@ python3 main.py [file] [flag]
 
 flags:
 * -interpret [file]
-* -compile [file]
+* -interpret-closures [file]
+* -interpret-machine [file]
+* -profile [file]
+* -vm [file]
+* -get-bytecode [file]
+* -transpile [file]
+* -get-python [file]
+* -compile [file] [memory_size]
+* -compile-optimized [file] [memory_size]
 * -get-compiled [file]
 * -get-assembled [file]
-* -run-assembled file
-* -run-compiled file
+* -get-optimized [file]
+* -get-object file
+* -get-object-symbols file
+* -profile-compiled [file]
+* -profile-optimized [file]
+* -run-assembled file [memory_size]
+* -run-compiled file [memory_size]
+* -run-python file
 
 """
 
@@ -44,28 +72,80 @@ Usage: {program} [file] [flag]
 
 Flags:
     -interpret             
-    -compile
+    -interpret-closures
+    -interpret-machine
+    -profile [stacks_file]
+    -vm
+    -get-bytecode [output_file]
+    -transpile
+    -get-python [output_file]
+    -compile [memory_size]
+    -compile-optimized [memory_size]
     -get-compiled [output_file]
     -get-assembled [output_file]
-    -run-assembled
-    -run-compiled
+    -get-optimized [output_file]
+    -get-object output_file
+    -get-object-symbols output_file
+    -profile-compiled [json_file]
+    -profile-optimized [json_file]
+    -run-assembled [memory_size]
+    -run-compiled [memory_size]
+    -run-python
 
 All Possibilities:
     {program}
     {program} -help
     {program} input_file
     {program} input_file -interpret
-    {program} input_file -compile
+    {program} input_file -interpret-closures
+    {program} input_file -interpret-machine
+    {program} input_file -profile [stacks_file]
+    {program} input_file -vm
+    {program} input_file -get-bytecode [output_file]
+    {program} input_file -transpile
+    {program} input_file -get-python [output_file]
+    {program} input_file -compile [memory_size]
+    {program} input_file -compile-optimized [memory_size]
     {program} input_file -get-compiled
     {program} input_file -get-assembled
     {program} input_file -get-compiled [output_file]
     {program} input_file -get-assembled [output_file]
-    {program} input_file -run-assembled
-    {program} input_file -run-compiled
+    {program} input_file -get-optimized [output_file]
+    {program} input_file -get-object output_file
+    {program} input_file -get-object-symbols output_file
+    {program} input_file -profile-compiled [json_file]
+    {program} input_file -profile-optimized [json_file]
+    {program} input_file -run-assembled [memory_size]
+    {program} input_file -run-compiled [memory_size]
+    {program} input_file -run-python
     """)
 
 
+# the optional memory size of the compiled modes, 0 keeps the unbounded ram
+def get_memory_size(argument: str) -> int:
+    if argument == "":
+        return 0
+    if not argument.isdigit():
+        print(f"Invalid memory size: {argument}, expected a number of words")
+        sys.exit(1)
+    return int(argument)
+
+# errors in the program being run rather than in PyScript, shown as one line instead of a traceback
+program_errors = (ParseError, ResolveError, MemoryFault, OverflowFault, ObjectFormatError)
+
+def describe_error(error: Exception) -> str:
+    return f"{type(error).__name__}: {error}"
+
 def main():
+    # the program's output is buffered and written when it halts, before any error
+    try:
+        with using_streams(terminal_streams()):
+            run()
+    except program_errors as error:
+        print(describe_error(error), file=sys.stderr)
+        sys.exit(1)
+
+def run():
     inputFile = "test.ps"
     outputFile = ""
     mode = "-interpret" # interpret or compile or run assembled or run compiled
@@ -85,34 +165,115 @@ def main():
     
     if mode == "-run-assembled":
         f = open(inputFile, "r")
-        compiled = compile(f.read().split("\n"))
-        execute_machine_code(compiled)
+        instructions, data, _ = compile_program(f.read().split("\n"))
+        execute_program(instructions, data, get_memory_size(outputFile))
         f.close()
         return
     elif mode == "-run-compiled":
+        if is_object_file(inputFile):
+            instructions, data, _ = load_object(inputFile)
+            execute_program(instructions, data, get_memory_size(outputFile))
+            return
+        f = open(inputFile, "r")
+        execute_machine_code(f.read().split("\n"), get_memory_size(outputFile))
+        f.close()
+        return
+    elif mode == "-run-python":
         f = open(inputFile, "r")
-        execute_machine_code(f.read().split("\n"))
+        source = f.read()
         f.close()
+        run_python(source, inputFile)
         return
     
-    declarations, functions, program = parse(inputFile)
+    # set PYSCRIPT_CACHE_DIR to reuse the parsed, assembled and compiled program between runs
+    cache_directory = get_cache_directory()
     if mode == "-interpret":
-        interpret(declarations, functions, program)
+        interpret(*cached_parse(inputFile, cache_directory))
+    elif mode == "-interpret-closures":
+        interpret_closures(*cached_parse(inputFile, cache_directory))
+    elif mode == "-interpret-machine":
+        interpret_machine(*cached_parse(inputFile, cache_directory))
+    elif mode == "-profile":
+        # the report goes to stderr, the collapsed stacks for flame graphs to the output file
+        profile = InterpreterProfile()
+        profile_program(*cached_parse(inputFile, cache_directory), profile)
+        flush()
+        f = open(inputFile, "r")
+        source_lines = f.read().split("\n")
+        f.close()
+        print(profile.report(source_lines), file=sys.stderr)
+        if outputFile != "":
+            f = open(outputFile, "w")
+            f.write(profile.collapsed_stacks())
+            f.close()
+    elif mode == "-vm":
+        interpret_vm(*cached_parse(inputFile, cache_directory))
+    elif mode == "-get-bytecode":
+        disassembled = disassemble(compile_bytecode(*cached_parse(inputFile, cache_directory)))
+        if outputFile == "":
+            print(disassembled)
+        else:
+            f = open(outputFile, "w")
+            f.write(disassembled)
+            f.close()
+    elif mode == "-transpile":
+        run_python(cached_transpile(inputFile, cache_directory), inputFile)
+    elif mode == "-get-python":
+        transpiled = cached_transpile(inputFile, cache_directory)
+        if outputFile == "":
+            print(transpiled)
+        else:
+            f = open(outputFile, "w")
+            f.write(transpiled)
+            f.close()
     elif mode == "-compile":
-        assembled = assemble(declarations, functions, program)
-        compiled = compile(assembled)
-        execute_machine_code(compiled)
+        instructions, data, _ = cached_compile(inputFile, cache_directory)
+        execute_program(instructions, data, get_memory_size(outputFile))
+    elif mode == "-compile-optimized":
+        instructions, data, _ = compile_program(optimize(cached_assemble(inputFile, cache_directory)))
+        execute_program(instructions, data, get_memory_size(outputFile))
+    elif mode == "-profile-compiled" or mode == "-profile-optimized":
+        # the report goes to stderr so it does not mix with the program's output
+        assembled = cached_assemble(inputFile, cache_directory)
+        if mode == "-profile-optimized":
+            assembled = optimize(assembled)
+        instructions, data, symbols = compile_program(assembled)
+        profile = Profile(symbols)
+        execute_program(instructions, data, profile=profile)
+        flush()
+        print(profile, file=sys.stderr)
+        if outputFile != "":
+            f = open(outputFile, "w")
+            json.dump(profile.to_json(), f, indent=4)
+            f.close()
+    elif mode == "-get-optimized":
+        optimized, report = optimize_with_report(cached_assemble(inputFile, cache_directory))
+        print(report, file=sys.stderr)
+        optimized = "\n".join(format_program(optimized))
+        if outputFile == "":
+            print(optimized)
+        else:
+            f = open(outputFile, "w")
+            f.write(optimized)
+            f.close()
     elif mode == "-get-assembled":
-        assembled = "\n".join(assemble(declarations, functions, program))
+        assembled = "\n".join(format_program(cached_assemble(inputFile, cache_directory)))
         if outputFile == "":
             print(assembled)
         else:
             f = open(outputFile, "w")
             f.write(assembled)
             f.close()
+    elif mode == "-get-object" or mode == "-get-object-symbols":
+        if outputFile == "":
+            print(f"{mode} needs an output_file")
+            return
+        f = open(outputFile, "wb")
+        f.write(write_object(*cached_compile(inputFile, cache_directory), keep_symbols=mode == "-get-object-symbols"))
+        f.close()
     elif mode == "-get-compiled":
-        assembled = assemble(declarations, functions, program)
-        compiled = "\n".join(compile(assembled))
+        instructions, data, _ = cached_compile(inputFile, cache_directory)
+        compiled = "\n".join(format_compiled(instructions, data))
         if outputFile == "":
             print(compiled)
         else:
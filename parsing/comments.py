@@ -0,0 +1,115 @@
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple
+
+from tokenization.enums import STRINGQUOTE, COMMENTEND, COMMENTSTART
+
+# a piece of the program kept after removing comments: (offset in the source, text)
+Segment = Tuple[int, str]
+
+# maps offsets in the program with comments removed back to the original source
+class OffsetMap:
+    def __init__(self):
+        self.stripped_starts = [] # offset of each segment in the stripped program
+        self.source_starts = []   # offset of each segment in the source
+        self.line_starts = [0]    # offset of the start of every line in the source
+        self.length = 0
+
+    def add_segment(self, source_offset: int, text: str):
+        self.stripped_starts.append(self.length)
+        self.source_starts.append(source_offset)
+        self.length += len(text)
+
+    def add_source(self, source_offset: int, text: str):
+        newline = text.find("\n")
+        while newline != -1:
+            self.line_starts.append(source_offset + newline + 1)
+            newline = text.find("\n", newline + 1)
+
+    def source_offset(self, offset: int) -> int:
+        segment = bisect_right(self.stripped_starts, offset) - 1
+        if segment < 0:
+            return offset
+        return self.source_starts[segment] + offset - self.stripped_starts[segment]
+
+    # returns the (line, column) in the source, both starting at 1
+    def source_position(self, offset: int) -> Tuple[int, int]:
+        source_offset = self.source_offset(offset)
+        line = bisect_right(self.line_starts, source_offset)
+        return (line, source_offset - self.line_starts[line - 1] + 1)
+
+# removes comments from a program given as chunks of text, for example the blocks of a large file
+# comment markers inside strings are kept and markers split across chunks are handled
+# yields the kept segments along with their offset in the source
+def scan_comments(chunks: Iterable[str], offset_map: OffsetMap = None) -> Iterator[Segment]:
+    in_string = False
+    in_comment = False
+    carry = "" # the start of a marker which may continue in the next chunk
+    source_offset = 0 # offset of the start of text in the source
+
+    for chunk in chunks:
+        if offset_map is not None:
+            offset_map.add_source(source_offset + len(carry), chunk)
+        text = carry + chunk
+        carry = ""
+        i = 0
+        while i < len(text):
+            if in_comment:
+                end = text.find(COMMENTEND, i)
+                if end == -1:
+                    if text.endswith(COMMENTEND[0]):
+                        carry = COMMENTEND[0]
+                    i = len(text)
+                    break
+                in_comment = False
+                i = end + len(COMMENTEND)
+            elif in_string:
+                end = text.find(STRINGQUOTE, i)
+                if end == -1:
+                    yield (source_offset + i, text[i:])
+                    i = len(text)
+                    break
+                in_string = False
+                yield (source_offset + i, text[i:end + 1])
+                i = end + 1
+            else:
+                quote = text.find(STRINGQUOTE, i)
+                comment = text.find(COMMENTSTART, i)
+                if quote == -1 and comment == -1:
+                    end = len(text)
+                    if text.endswith(COMMENTSTART[0]):
+                        end -= 1
+                        carry = COMMENTSTART[0]
+                    if end > i:
+                        yield (source_offset + i, text[i:end])
+                    i = len(text)
+                    break
+                if comment == -1 or (quote != -1 and quote < comment):
+                    in_string = True
+                    yield (source_offset + i, text[i:quote + 1])
+                    i = quote + 1
+                else:
+                    in_comment = True
+                    if comment > i:
+                        yield (source_offset + i, text[i:comment])
+                    i = comment + len(COMMENTSTART)
+        source_offset += len(text) - len(carry)
+
+    if carry and not in_comment:
+        yield (source_offset, carry)
+
+# returns the program without comments and the map back to source offsets
+def strip_comments(chunks: Iterable[str]) -> Tuple[str, OffsetMap]:
+    offset_map = OffsetMap()
+    pieces: List[str] = []
+    for source_offset, text in scan_comments(chunks, offset_map):
+        offset_map.add_segment(source_offset, text)
+        pieces.append(text)
+    return ("".join(pieces), offset_map)
+
+# reads a file in blocks so very large programs are never copied character by character
+def read_chunks(file, size: int = 1 << 16) -> Iterator[str]:
+    while True:
+        chunk = file.read(size)
+        if chunk == "":
+            return
+        yield chunk
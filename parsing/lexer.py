@@ -0,0 +1,120 @@
+import re
+from typing import List
+
+from parsing.comments import OffsetMap
+from tokenization.enums import STRINGQUOTE, COMMENTSTART, COMMENTEND
+
+# token types
+WORD = "WORD"       # variable, function and command names and true/false
+NUMBER = "NUMBER"   # non-negative integer literal
+STRING = "STRING"   # `...` with the quotes removed
+SYMBOL = "SYMBOL"   # one of ! | { } + - * / % = < >
+SECTION = "SECTION" # @declarations @functions @body
+END = "END"         # end of the token stream
+
+# raised on any syntax error, the message contains the line and column
+class ParseError(Exception):
+    pass
+
+class Token:
+    def __init__(self, type: str, text: str, line: int, column: int, offset: int = 0):
+        self.type = type
+        self.text = text
+        self.line = line
+        self.column = column
+        self.offset = offset
+
+    def __repr__(self):
+        return f"Token({self.type}, {self.text!r}, {self.line}:{self.column})"
+
+token_pattern = re.compile(
+    r"(?P<NEWLINE>\n)"
+    r"|(?P<SPACE>[^\S\n]+)"
+    rf"|(?P<COMMENT>{re.escape(COMMENTSTART)}.*?(?:{re.escape(COMMENTEND)}|\Z))"
+    rf"|(?P<STRING>{STRINGQUOTE}[^{STRINGQUOTE}]*{STRINGQUOTE})"
+    r"|(?P<SECTION>@\w+)"
+    r"|(?P<SYMBOL>[!|{}+\-*/%=<>])"
+    rf"|(?P<WORD>(?:(?!{re.escape(COMMENTSTART)})[^\s!<>=`+\-*/%\"|@{{}}])+)"
+    r"|(?P<MISMATCH>.)",
+    re.DOTALL
+)
+
+# turns the program into a list of tokens in a single pass
+# comments and whitespace are dropped
+# if the comments were already removed, offset_map gives the positions in the original source
+def tokenize(program: str, offset_map: OffsetMap = None) -> List[Token]:
+    tokens = []
+    line = 1
+    line_start = 0
+    for match in token_pattern.finditer(program):
+        kind = match.lastgroup
+        text = match.group()
+        start = match.start()
+        column = start - line_start + 1
+        if offset_map is not None and kind != "NEWLINE" and kind != "SPACE":
+            line, column = offset_map.source_position(start)
+
+        if kind == "NEWLINE":
+            line += 1
+            line_start = match.end()
+            continue
+        if kind == "MISMATCH":
+            if text == STRINGQUOTE:
+                raise ParseError(f"line {line}, column {column}: unterminated string")
+            raise ParseError(f"line {line}, column {column}: unexpected character {text!r}")
+
+        if kind == "STRING":
+            tokens.append(Token(STRING, text[1:-1], line, column, start))
+        elif kind == "WORD":
+            tokens.append(Token(NUMBER if text.isdigit() else WORD, text, line, column, start))
+        elif kind != "SPACE" and kind != "COMMENT":
+            tokens.append(Token(kind, text, line, column, start))
+
+        # comments and strings can span lines
+        newlines = text.count("\n") if kind == "COMMENT" or kind == "STRING" else 0
+        if newlines:
+            line += newlines
+            line_start = start + text.rfind("\n") + 1
+    return tokens
+
+# a cursor over a list of tokens which the parser consumes from left to right
+class TokenStream:
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.index = 0
+        last = tokens[-1] if tokens else None
+        self.end = Token(END, "", last.line if last else 1, last.column + len(last.text) if last else 1)
+
+    def peek(self, offset: int = 0) -> Token:
+        index = self.index + offset
+        if index < len(self.tokens):
+            return self.tokens[index]
+        return self.end
+
+    def next(self) -> Token:
+        token = self.peek()
+        if self.index < len(self.tokens):
+            self.index += 1
+        return token
+
+    def at_end(self) -> bool:
+        return self.index >= len(self.tokens)
+
+    def at(self, text: str) -> bool:
+        token = self.peek()
+        return token.type != STRING and token.text == text
+
+    def expect(self, text: str) -> Token:
+        if not self.at(text):
+            raise self.error(f"expected {text!r}")
+        return self.next()
+
+    def expect_type(self, type: str) -> Token:
+        if self.peek().type != type:
+            raise self.error(f"expected {type.lower()}")
+        return self.next()
+
+    def error(self, message: str) -> ParseError:
+        token = self.peek()
+        found = "end of input" if token.type == END else repr(token.text)
+        return ParseError(f"line {token.line}, column {token.column}: {message}, found {found}")
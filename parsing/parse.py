@@ -1,75 +1,58 @@
 from typing import List, Tuple
-from parsing.parse_value import parse_value
-from parsing.split_program import STRINGQUOTE, split_program
+from parsing.comments import OffsetMap, read_chunks, strip_comments
+from parsing.lexer import WORD, TokenStream, tokenize
+from parsing.parse_value import read_value
+from parsing.split_program import split_program
 from tokenization.commands import Command, Declaration, Function
 
-from parsing.utility import get_command_type
-from parsing.parse_command import parse_command
-
-from tokenization.enums import STRINGQUOTE, COMMENTEND, COMMENTSTART
+from parsing.parse_command import parse_block, parse_command
 
 def parse(file_name: str) -> Tuple[List[Declaration], List[Command]]:
     f = open(file_name, "r")
-    program = f.read()
-    comments_removed = remove_comments(program)
-
-    parsed_program = parse_program(comments_removed)
+    program, offset_map = strip_comments(read_chunks(f))
     f.close()
+
+    parsed_program = parse_program(program, offset_map)
     return parsed_program
 
+# the same as parse for a program which has already been read
+def parse_source(source: str) -> Tuple[List[Declaration], List[Command]]:
+    program, offset_map = strip_comments([source])
+    return parse_program(program, offset_map)
+
 # account for strings
 def remove_comments(program: str) -> str:
-    result = ""
-    ignore_string = False
-    ignore_comment = False
-    i = 0
-    while i < len(program):
-        if not ignore_string:
-            if program[i:i+len(COMMENTSTART)] == COMMENTSTART:
-                ignore_comment = True
-                i += 1
-            if program[i:i+len(COMMENTEND)] == COMMENTEND:
-                ignore_comment = False
-                i += 2
-        if not ignore_comment:
-            if program[i] == STRINGQUOTE:
-                ignore_string = not ignore_string
-        if ignore_comment:
-            i += 1
-            continue
-        
-        result += program[i]
-        i += 1
-    return result
+    return strip_comments([program])[0]
 
-def parse_program(program: str) -> Tuple[List[Declaration], List[Command]]:
-    declarations, functions, body = split_program(program)
+def parse_program(program: str, offset_map: OffsetMap = None) -> Tuple[List[Declaration], List[Command]]:
+    declarations, functions, body = split_program(tokenize(program, offset_map))
     parsed_declarations = parse_declarations(declarations)
     parsed_functions = parse_functions(functions)
     parsed_body = parse_body(body)
     return (parsed_declarations, parsed_functions, parsed_body)
 
-# returns a list of Declarations
-def parse_declarations(declarations: List[Tuple[str, str]]) -> List[Declaration]:
+# declare <variable name> <simple value>
+def parse_declarations(tokens: TokenStream) -> List[Declaration]:
     parsed_declarations = []
-    for variable, value in declarations:
-        declaration = Declaration(variable, parse_value(value))
+    while not tokens.at_end():
+        tokens.expect("declare")
+        variable = tokens.expect_type(WORD).text
+        declaration = Declaration(variable, read_value(tokens))
         parsed_declarations.append(declaration)
     return parsed_declarations
 
-def parse_functions(functions: List[Tuple[str, List[Tuple[str, str]]]]) -> List[Function]:
+# function <function name> { <body> }
+def parse_functions(tokens: TokenStream) -> List[Function]:
     parsed_functions = []
-    for name, commands in functions:
-        parsed_commands = parse_body(commands)
-        new_function = Function(name.strip(), parsed_commands)
+    while not tokens.at_end():
+        tokens.expect("function")
+        name = tokens.expect_type(WORD).text
+        new_function = Function(name, parse_block(tokens))
         parsed_functions.append(new_function)
     return parsed_functions
 
-def parse_body(body: List[Tuple[str, str]]) -> List[Command]:
+def parse_body(tokens: TokenStream) -> List[Command]:
     parsed_body = []
-    for command, content in body:
-        command_type = get_command_type(command)
-        parsed_content = parse_command(command_type, content)
-        new_command = Command(command_type, parsed_content)
-        parsed_body.append(new_command)
-    return parsed_body
\ No newline at end of file
+    while not tokens.at_end():
+        parsed_body.append(parse_command(tokens))
+    return parsed_body
@@ -1,93 +1,71 @@
 from typing import List
-import parsing.parse
 
-from parsing.parse_value import parse_boolean, parse_value
-from parsing.split_program import split_body
-from parsing.utility import get_body_size, get_first_open_bracket
+from parsing.lexer import WORD, TokenStream
+from parsing.parse_value import read_boolean, read_value
+from parsing.utility import command_names, get_command_type
 from tokenization.commands import CommandTypes, Run
 from tokenization.commands import Change, Command, Show, Capture, If, While, Skip
-from tokenization.commands import CommandTypes
 
-def parse_command(command: CommandTypes, content: str) -> CommandTypes:
+def parse_command(tokens: TokenStream) -> Command:
+    token = tokens.peek()
+    if token.type != WORD or token.text not in command_names:
+        raise tokens.error("expected a command")
+    tokens.next()
+    command = get_command_type(token.text)
+
     if command == Change:
-        return parse_change(content)
+        content = parse_change(tokens)
     elif command == Show:
-        return parse_show(content)
+        content = parse_show(tokens)
     elif command == Capture:
-        return parse_capture(content)
+        content = parse_capture(tokens)
     elif command == If:
-        return parse_if(content)
+        content = parse_if(tokens)
     elif command == While:
-        return parse_while(content)
+        content = parse_while(tokens)
     elif command == Skip:
-        return parse_skip(content)
+        content = parse_skip(tokens)
     elif command == Run:
-        return parse_run(content)
-    print("unreachable in parse_command")
+        content = parse_run(tokens)
+    return Command(command, content, token.line, token.column)
 
 # (change) <variable> <value>
-def parse_change(content: str) -> Change:
-    content = content.strip()
-    first_space = content.find(" ")
-    variable = content[:first_space].strip()
-    value = content[first_space:].strip()
-
-    return Change(variable, parse_value(value))
+def parse_change(tokens: TokenStream) -> Change:
+    variable = tokens.expect_type(WORD).text
+    return Change(variable, read_value(tokens))
 
 # show <value>
-def parse_show(content: str) -> Show:
-    return Show(parse_value(content.strip()))
+def parse_show(tokens: TokenStream) -> Show:
+    return Show(read_value(tokens))
 
 # capture <variable name>
-def parse_capture(content: str) -> Capture:
-    return Capture(content.strip())
+def parse_capture(tokens: TokenStream) -> Capture:
+    return Capture(tokens.expect_type(WORD).text)
 
 # if <boolean> { <commands> ... } { <commands> ... }
-def parse_if(content: str) -> If:
-    condition, true_statement, false_statement = split_if(content)
-    return If(parse_boolean(condition), split_parse_body(true_statement), split_parse_body(false_statement))
-
-def parse_while(content: str) -> While:
-    condition, body = split_while(content)
-    return While(parse_boolean(condition), split_parse_body(body))
-
-def parse_skip(content: str) -> Skip:
+def parse_if(tokens: TokenStream) -> If:
+    condition = read_boolean(tokens)
+    true_statement = parse_block(tokens)
+    false_statement = parse_block(tokens)
+    return If(condition, true_statement, false_statement)
+
+# while <boolean> { <commands> ... }
+def parse_while(tokens: TokenStream) -> While:
+    condition = read_boolean(tokens)
+    return While(condition, parse_block(tokens))
+
+def parse_skip(tokens: TokenStream) -> Skip:
     return Skip()
 
-def parse_run(content: str) -> Run:
-    return Run(content.strip())
-
-def split_if(content: str):
-    # get the condition
-    end_of_condition = get_first_open_bracket(content) - 1
-
-    # count the whitespace between
-    whitespace = 0
-    i = end_of_condition
-    while content[i] != "{":
-        whitespace += 1
-        i += 1
-
-    start_of_true_part = end_of_condition + whitespace
-    end_of_true_part = start_of_true_part + get_body_size(content[start_of_true_part:]) + 1
-
-    boolean = content[:end_of_condition].strip()
-    true_statement = content[end_of_condition:end_of_true_part].strip()[1:-1]
-    false_statement = content[end_of_true_part:].strip()[1:-1]
-
-    return (boolean, true_statement, false_statement)
-
-def split_while(content):
-    end_of_condition = get_first_open_bracket(content) - 1
-
-    boolean = content[:end_of_condition].strip()
-    body = content[end_of_condition:].strip()[1:-1]
-
-    return (boolean, body)
-    
-
-
-
-def split_parse_body(string: str) -> List[Command]:
-    return parsing.parse.parse_body(split_body(string))
-
+# run <function name>
+def parse_run(tokens: TokenStream) -> Run:
+    return Run(tokens.expect_type(WORD).text)
+
+# { <commands> ... }
+def parse_block(tokens: TokenStream) -> List[Command]:
+    tokens.expect("{")
+    body = []
+    while not tokens.at("}"):
+        body.append(parse_command(tokens))
+    tokens.expect("}")
+    return body
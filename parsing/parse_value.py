@@ -1,55 +1,164 @@
-from parsing.utility import get_type, is_simple_number, is_single_boolean_token, is_single_number_token, is_single_word
+from parsing.lexer import NUMBER, STRING, SYMBOL, WORD, ParseError, Token, TokenStream, tokenize
 from tokenization.operators import get_operation_type, number_operators, boolean_binary_operators, boolean_unary_operators, boolean_comparison_operators
+from tokenization.operators import operator_precedence
+from parsing.utility import command_names
 
 from tokenization.value import Value, String, Number, Boolean, NBinary, NLiteral, NVariable, BCompare, BUnary, BBinary, BLiteral
 
 
 from tokenization.enums import TRUEBOOL, FALSEBOOL
-from tokenization.enums import ENCLOSENUMBER
+from tokenization.enums import ENCLOSENUMBER, ENCLOSEBOOLEAN
 
+MINUS_SIGN = "-"
+PLUS_SIGN = "+"
+
+# ----------------------------------------------------------------
+# parse from a string
+# ----------------------------------------------------------------
 def parse_value(value: str) -> Value:
-    type = get_type(value)
-    content = None
-    if type == Number:
-        content = parse_number(value)
-    elif type == Boolean:
-        content = parse_boolean(value)
-    elif type == String:
-        content = parse_string(value)
-    else:
-        print(f"unreachable in parse_value bad type: {type}")
-
-    return Value(type, content)
+    return parse_whole(value, read_value)
 
 def parse_number(string: str) -> Number:
-    string = string.strip()
-
-    if is_simple_number(string):
-        return Number(NLiteral, NLiteral(int(string)))
-
-    if is_single_word(string):
-        return Number(NVariable, NVariable(string))
-
-    if not (string[0] == ENCLOSENUMBER and string[-1] == ENCLOSENUMBER):
-        print(f"bad number: ({string})")
-
-    # remove the starting and ending 
-    string = string.strip()[1:-1]
-    operator = ""
-    left = ""
-    right = ""
-    for i in range(len(string)):
-        for current_operator in number_operators:
-            if string[i:i+len(current_operator)] != current_operator:
-                continue
-
-            left = string[0:i].strip()
-            right = string[i+len(current_operator):].strip()
-            operator = current_operator
-            if is_single_number_token(left) and is_single_number_token(right):
-                parsed_number = NBinary(get_operation_type(operator), parse_number(left), parse_number(right))
-                return Number(NBinary, parsed_number)
+    return parse_whole(string, read_number)
 
+def parse_boolean(string: str) -> Boolean:
+    return parse_whole(string, read_boolean)
+
+def parse_whole(string: str, read):
+    tokens = TokenStream(tokenize(string))
+    result = read(tokens)
+    if not tokens.at_end():
+        raise tokens.error("expected end of value")
+    return result
+
+# ----------------------------------------------------------------
+# read from a token stream
+# ----------------------------------------------------------------
+def read_value(tokens: TokenStream) -> Value:
+    token = tokens.peek()
+    if token.type == STRING:
+        return Value(String, read_string(tokens))
+    expression = read_expression(tokens)
+    if isinstance(expression, Boolean):
+        return Value(Boolean, expression)
+    return Value(Number, expression)
+
+def read_number(tokens: TokenStream) -> Number:
+    token = tokens.peek()
+    expression = read_expression(tokens)
+    if not isinstance(expression, Number):
+        raise ParseError(f"line {token.line}, column {token.column}: expected a number")
+    return expression
+
+def read_boolean(tokens: TokenStream) -> Boolean:
+    token = tokens.peek()
+    expression = read_expression(tokens)
+    if not isinstance(expression, Boolean):
+        raise ParseError(f"line {token.line}, column {token.column}: expected a boolean")
+    return expression
+
+# precedence climbing over the token stream
+# brackets are optional, !...! groups a number and |...| groups a boolean
+# a + b * c > 10 and not d = 0 -> |||a + !b * c!| > 10| and |not |d = 0|||
+def read_expression(tokens: TokenStream, min_precedence: int = 1):
+    left = read_unary(tokens)
+    while True:
+        token = tokens.peek()
+        operator = token.text
+        if not is_binary_operator(token) or operator_precedence[operator] < min_precedence:
+            return left
+        tokens.next()
+        right = read_expression(tokens, operator_precedence[operator] + 1)
+        left = make_binary(token, left, right)
+
+def is_binary_operator(token: Token) -> bool:
+    if token.type == SYMBOL:
+        return token.text in number_operators or token.text in boolean_comparison_operators
+    if token.type == WORD:
+        return token.text in boolean_binary_operators
+    return False
+
+# not <boolean>
+def read_unary(tokens: TokenStream):
+    token = tokens.peek()
+    if token.type == WORD and token.text in boolean_unary_operators:
+        tokens.next()
+        body = read_expression(tokens, operator_precedence[token.text])
+        check_operand(token, body, Boolean)
+        return Boolean(BUnary, BUnary(get_operation_type(token.text), body))
+    return read_primary(tokens)
+
+# <simple number> or <simple boolean> or <variable name> or !...! or |...|
+def read_primary(tokens: TokenStream):
+    token = tokens.peek()
+    if token.type == NUMBER:
+        tokens.next()
+        return Number(NLiteral, NLiteral(int(token.text)))
+
+    # negative literal, or 0 - <number>
+    if tokens.at(MINUS_SIGN):
+        tokens.next()
+        if tokens.peek().type == NUMBER:
+            return Number(NLiteral, NLiteral(-int(tokens.next().text)))
+        body = read_primary(tokens)
+        check_operand(token, body, Number)
+        return Number(NBinary, NBinary(get_operation_type(MINUS_SIGN), Number(NLiteral, NLiteral(0)), body))
+
+    # +5 is 5, as int() reads it
+    if tokens.at(PLUS_SIGN):
+        tokens.next()
+        body = read_primary(tokens)
+        check_operand(token, body, Number)
+        return body
+
+    if tokens.at(TRUEBOOL) or tokens.at(FALSEBOOL):
+        tokens.next()
+        return Boolean(BLiteral, BLiteral(boolean(token.text)))
+
+    if token.type == WORD and is_variable_name(token.text):
+        tokens.next()
+        return Number(NVariable, NVariable(token.text))
+
+    if tokens.at(ENCLOSENUMBER):
+        tokens.next()
+        body = read_expression(tokens)
+        check_operand(token, body, Number)
+        tokens.expect(ENCLOSENUMBER)
+        return body
+
+    if tokens.at(ENCLOSEBOOLEAN):
+        tokens.next()
+        body = read_expression(tokens)
+        check_operand(token, body, Boolean)
+        tokens.expect(ENCLOSEBOOLEAN)
+        return body
+
+    raise tokens.error("expected a value")
+
+def is_variable_name(word: str) -> bool:
+    return word not in boolean_binary_operators and word not in boolean_unary_operators and word not in command_names
+
+def make_binary(operator: Token, left, right):
+    operation = get_operation_type(operator.text)
+    if operator.text in number_operators:
+        check_operand(operator, left, Number)
+        check_operand(operator, right, Number)
+        return Number(NBinary, NBinary(operation, left, right))
+    if operator.text in boolean_comparison_operators:
+        check_operand(operator, left, Number)
+        check_operand(operator, right, Number)
+        return Boolean(BCompare, BCompare(operation, left, right))
+    check_operand(operator, left, Boolean)
+    check_operand(operator, right, Boolean)
+    return Boolean(BBinary, BBinary(operation, left, right))
+
+def check_operand(token: Token, operand, expected):
+    if not isinstance(operand, expected):
+        name = "a number" if expected == Number else "a boolean"
+        raise ParseError(f"line {token.line}, column {token.column}: {token.text} expects {name}")
+
+def read_string(tokens: TokenStream) -> String:
+    return String(tokens.expect_type(STRING).text)
 
 def boolean(value: str) -> bool:
     if value == FALSEBOOL:
@@ -57,46 +166,3 @@ def boolean(value: str) -> bool:
     if value == TRUEBOOL:
         return True
     print(f"unreachable in boolean, {value}")
-
-def parse_boolean(string: str) -> Boolean:
-    string = string.strip()
-
-    # boolean literals
-    if string == TRUEBOOL or string == FALSEBOOL:
-        return Boolean(BLiteral, BLiteral(boolean(string)))
-
-    # strip the starting and ending "|"
-    string = string.strip()[1:-1]
-
-    # boolean unary operators
-    first_space = string.find(" ")
-    for current_operation in boolean_unary_operators:
-        if string[0:first_space] == current_operation:
-            parsed_boolean = BUnary(get_operation_type(current_operation), parse_boolean(string[first_space:].strip()))
-            return Boolean(BUnary, parsed_boolean)
-
-    # boolean binary operators
-    for i in range(len(string)):
-        for current_operation in boolean_binary_operators:
-            if string[i:i+len(current_operation)] == current_operation:
-                left = string[:i].strip()
-                right = string[i+len(current_operation):].strip()
-                if is_single_boolean_token(left) and is_single_boolean_token(right):
-                    parsed_boolean = BBinary(get_operation_type(current_operation), parse_boolean(left), parse_boolean(right))
-                    return Boolean(BBinary, parsed_boolean)
-
-    # boolean comparison operators
-    for i in range(len(string)):
-        for current_operation in boolean_comparison_operators:
-            if string[i:i+len(current_operation)] == current_operation:
-                left = string[:i].strip()
-                right = string[i+len(current_operation):].strip()
-                if is_single_number_token(left) and is_single_number_token(right):
-                    parsed_boolean = BCompare(get_operation_type(current_operation), parse_number(left), parse_number(right))
-                    return Boolean(BCompare, parsed_boolean)
-    
-    print(f"unreachable in parse_boolean, bad value {string}")
-
-def parse_string(value) -> str:
-    
-    return String(value[1:-1])
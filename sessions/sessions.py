@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import io
+import os
+import sys
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from cache.cache import cached_compile, cached_parse, get_cache_directory
+from compiler.computer import Computer
+from interpreter.machine import Machine
+from streams.streams import BUFFER_LINES, Streams, using_streams
+
+"""
+Runs many PyScript programs at once on one asyncio event loop
+
+each session runs an engine which can be paused, an interpreter/machine.py Machine or a compiler/computer.py Computer
+a session runs SLICE_STEPS steps and then lets the other sessions run, so a busy program never holds up the rest
+before a capture or READ it sends its output and waits for a line of input without blocking the others
+
+    await run_session(Machine(*parse(program)), read_line, write)
+
+read_line is an async function returning the next line of input, or None once there is no more
+write is an async function given the output of the session each time it pauses
+
+python3 sessions/sessions.py programs/prime.ps
+python3 sessions/sessions.py programs/prime.ps --mode compile --port 8765 --slice-steps 500
+
+serves the program over TCP, every connection is a new session with the connection as its input and output
+"""
+
+SLICE_STEPS = 1000 # steps a session runs before the others get a turn
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MODES = ["interpret", "compile"]
+
+ReadLine = Callable[[], Awaitable[Optional[str]]]
+Write = Callable[[str], Awaitable[None]]
+
+# the lines a session has read but not yet captured
+class PendingLines:
+    def __init__(self):
+        self.lines = deque()
+        self.ended = False # read_line returned None
+
+    def __iter__(self):
+        return self
+
+    # the streams see the end of the input whenever nothing is pending
+    def __next__(self) -> str:
+        if len(self.lines) == 0:
+            raise StopIteration
+        return self.lines.popleft()
+
+# runs engine until it ends, raises what the program raises
+# the engine is anything with run_until_input(max_steps), wants_input() and step() like Machine and Computer
+async def run_session(engine, read_line: ReadLine, write: Write, slice_steps: int = SLICE_STEPS):
+    pending = PendingLines()
+    output = io.StringIO()
+    streams = Streams(pending, output, BUFFER_LINES)
+    try:
+        while True:
+            if engine.wants_input():
+                if len(pending.lines) == 0 and not pending.ended:
+                    # the prompt is seen before waiting
+                    await send_output(output, write)
+                    line = await read_line()
+                    if line is None:
+                        pending.ended = True
+                    else:
+                        pending.lines.append(line)
+                # with no line pending the capture fails as it does at the end of any input
+                with using_streams(streams):
+                    if not engine.step():
+                        break
+            with using_streams(streams):
+                if engine.run_until_input(slice_steps):
+                    break
+            await send_output(output, write)
+            # the other sessions ready to run go first
+            await asyncio.sleep(0)
+    finally:
+        await send_output(output, write)
+
+async def send_output(output: io.StringIO, write: Write):
+    text = output.getvalue()
+    if text == "":
+        return
+    output.seek(0)
+    output.truncate()
+    await write(text)
+
+# ----------------------------------------------------------------
+# asyncio streams
+# ----------------------------------------------------------------
+def reader_lines(reader: asyncio.StreamReader) -> ReadLine:
+    async def read_line() -> Optional[str]:
+        line = await reader.readline()
+        if line == b"":
+            return None
+        return line.decode().rstrip("\r\n")
+    return read_line
+
+def writer_output(writer: asyncio.StreamWriter) -> Write:
+    async def write(text: str):
+        writer.write(text.encode())
+        await writer.drain()
+    return write
+
+# ----------------------------------------------------------------
+# serving
+# ----------------------------------------------------------------
+# returns a function making a new engine for each session, the program is parsed or compiled only once
+def get_engine_factory(file_name: str, mode: str) -> Callable:
+    cache_directory = get_cache_directory()
+    if mode == "interpret":
+        parsed = cached_parse(file_name, cache_directory)
+        return lambda: Machine(*parsed)
+    elif mode == "compile":
+        instructions, data, _ = cached_compile(file_name, cache_directory)
+        return lambda: Computer(instructions, data)
+    else:
+        assert False, f"Unreachable in get_engine_factory, bad mode {mode}"
+
+async def serve(new_engine: Callable, host: str, port: int, slice_steps: int):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write = writer_output(writer)
+        try:
+            await run_session(new_engine(), reader_lines(reader), write, slice_steps)
+        except (Exception, SystemExit) as error:
+            # one failing program ends only its own session
+            try:
+                await write(f"{type(error).__name__}: {error}\n")
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"serving on {host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="serve a PyScript program over TCP, one session per connection")
+    parser.add_argument("program", help="the PyScript file to run")
+    parser.add_argument("--mode", default="interpret", choices=MODES, help="run with the interpreter or the compiler")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--slice-steps", type=int, default=SLICE_STEPS, help="steps a session runs before the others")
+    arguments = parser.parse_args()
+
+    new_engine = get_engine_factory(arguments.program, arguments.mode)
+    try:
+        asyncio.run(serve(new_engine, arguments.host, arguments.port, arguments.slice_steps))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
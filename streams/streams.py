@@ -0,0 +1,92 @@
+import sys
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+# the input and output of a running program, shared by every engine
+#
+#   show(value)     for show, PVAL and PSTR, the value is written on its own line
+#   capture()       for capture and READ, the next line of input without its newline
+#
+# the engines call show and capture, which go to the current Streams
+# by default that is the terminal a line at a time like print and input,
+# using_streams swaps in other streams while a program runs
+#
+#   with using_streams(Streams(["27"], output=f)):
+#       interpret(*parse(program))
+
+BUFFER_LINES = 4096 # lines kept before they are written out
+
+class Streams:
+    # lines is any iterable of input lines, None reads each line with input()
+    # output is any text file, None writes to sys.stdout as it is when flushed
+    # buffer_lines of 1 writes every line as it is shown
+    def __init__(self, lines: Optional[Iterable[str]] = None, output: Optional[TextIO] = None, buffer_lines: int = 1):
+        self.lines = None if lines is None else iter(lines)
+        self.output = output
+        self.buffer = []
+        self.buffer_lines = buffer_lines
+
+    def show(self, value):
+        self.buffer.append(str(value))
+        if len(self.buffer) >= self.buffer_lines:
+            self.flush()
+
+    # raises EOFError once the input runs out, like input()
+    def capture(self) -> str:
+        if self.lines is None:
+            # a prompt shown before the capture must be seen before the program waits
+            self.flush()
+            return input()
+        line = next(self.lines, None)
+        if line is None:
+            raise EOFError("EOF when reading a line")
+        return line.rstrip("\n")
+
+    def flush(self):
+        if len(self.buffer) == 0:
+            return
+        output = sys.stdout if self.output is None else self.output
+        output.write("\n".join(self.buffer) + "\n")
+        output.flush()
+        self.buffer = []
+
+current = Streams()
+
+def show(value):
+    current.show(value)
+
+def capture() -> str:
+    return current.capture()
+
+def flush():
+    current.flush()
+
+# the streams are flushed when the program halts and also when it fails
+@contextmanager
+def using_streams(streams: Streams):
+    global current
+    previous = current
+    current = streams
+    try:
+        yield streams
+    finally:
+        streams.flush()
+        current = previous
+
+# buffered streams for sys.stdin and sys.stdout
+# piped input is read all at once on the first capture, input from a terminal a line at a time
+def terminal_streams() -> Streams:
+    if sys.stdin.isatty():
+        return Streams(None, sys.stdout, BUFFER_LINES)
+    return Streams(read_lines(sys.stdin), sys.stdout, BUFFER_LINES)
+
+# reads the whole file when the first line is asked for
+def read_lines(file: TextIO) -> Iterator[str]:
+    yield from split_lines(file.read())
+
+# "1\n2\n" -> ["1", "2"], the lines input() would return
+def split_lines(text: str) -> List[str]:
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return lines
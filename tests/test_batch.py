@@ -0,0 +1,39 @@
+import os
+import signal
+import sys
+import unittest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from batch.batch import JobTimeout, time_limit
+
+"""
+python3 -m unittest discover tests
+"""
+
+def ignore_alarm(signal_number, frame):
+    pass
+
+@unittest.skipUnless(hasattr(signal, "SIGALRM"), "time limits need SIGALRM")
+class TestTimeLimit(unittest.TestCase):
+    def setUp(self):
+        self.original_handler = signal.signal(signal.SIGALRM, ignore_alarm)
+
+    def tearDown(self):
+        signal.signal(signal.SIGALRM, self.original_handler)
+
+    def test_restores_the_previous_handler(self):
+        with time_limit(5):
+            pass
+        self.assertIs(signal.getsignal(signal.SIGALRM), ignore_alarm)
+
+    def test_restores_the_previous_handler_after_a_timeout(self):
+        with self.assertRaises(JobTimeout):
+            with time_limit(0.01):
+                while True:
+                    pass
+        self.assertIs(signal.getsignal(signal.SIGALRM), ignore_alarm)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import io
+import os
+import sys
+import unittest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from interpreter.interpreter import interpret
+from interpreter.closures import interpret_closures
+from interpreter.machine import interpret_machine
+from vm.vm import interpret_vm
+from transpiler.transpile import interpret_transpiled
+from compiler.assembler import assemble
+from compiler.compiler import compile_program
+from compiler.computer import execute_program
+from parsing.parse import parse_program
+from streams.streams import Streams, using_streams
+
+"""
+python3 -m unittest discover tests
+"""
+
+def interpret_compiled(declarations, functions, program):
+    instructions, data, _ = compile_program(assemble(declarations, functions, program))
+    execute_program(instructions, data)
+
+engines = [interpret, interpret_closures, interpret_machine, interpret_vm, interpret_transpiled, interpret_compiled]
+
+# the output of running source with engine, or the type of the error it raised
+def run(engine, source: str) -> str:
+    output = io.StringIO()
+    try:
+        with using_streams(Streams([], output)):
+            engine(*parse_program(source))
+    except ZeroDivisionError as error:
+        return output.getvalue() + type(error).__name__
+    return output.getvalue()
+
+def program(body: str) -> str:
+    return f"""
+@declarations
+declare z 0
+declare t 1
+@declarations
+
+@functions
+@functions
+
+@body
+{body}
+@body
+"""
+
+# the right side of and and or is computed even when the left side decides
+failing_right_sides = [
+    "show |false and |!5 % z! = 0||",
+    "show |t = 1 or |!5 / z! = 0||",
+    "if |true or |!5 / z! = 0|| {\n    show `taken`\n} {\n}",
+    "while |t = 1 and |false or |!5 / z! = 0||| {\n    change t 0\n}",
+]
+
+class TestBooleans(unittest.TestCase):
+    def test_right_side_is_computed(self):
+        for body in failing_right_sides:
+            for engine in engines:
+                self.assertEqual(run(engine, program(body)), "ZeroDivisionError", (engine.__name__, body))
+
+    def test_and_or_values(self):
+        source = program("show |t = 1 and t = 0|\nshow |t = 1 or t = 0|\nshow |t = 0 or t = 0|\nshow |t = 1 and t = 1|")
+        for engine in engines:
+            # the computer shows booleans as 0 and 1
+            expected = "0\n1\n0\n1\n" if engine == interpret_compiled else "False\nTrue\nFalse\nTrue\n"
+            self.assertEqual(run(engine, source), expected, engine.__name__)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import unittest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from folding.fold import fold_program
+from parsing.parse import parse_program
+from tokenization.commands import Change, If, Show, While
+from tokenization.enums import AND, DIVIDE, EQUAL, GREATERTHAN, LESSTHAN, MINUS, MOD, MULTIPLY, NOT, NOTEQUAL, OR, PLUS
+from tokenization.value import BBinary, BCompare, BLiteral, BUnary, Boolean, NBinary, NLiteral, NVariable, Number, String
+
+"""
+python3 -m unittest discover tests
+"""
+
+symbols = {
+    PLUS: "+", MINUS: "-", MULTIPLY: "*", DIVIDE: "/", MOD: "%",
+    EQUAL: "=", NOTEQUAL: "!=", LESSTHAN: "<", GREATERTHAN: ">",
+    AND: "and", OR: "or", NOT: "not"
+}
+
+# a value as fully bracketed text, (1 + (2 * x))
+def describe(value) -> str:
+    type = value.type
+    content = value.content
+    if type == String:
+        return f"`{content.content}`"
+    if type == Number or type == Boolean:
+        return describe(content)
+    if type == NLiteral:
+        return str(content.value)
+    if type == NVariable:
+        return content.variable
+    if type == BLiteral:
+        return "true" if content.value else "false"
+    if type == BUnary:
+        return f"(not {describe(content.body)})"
+    if type == NBinary or type == BCompare or type == BBinary:
+        return f"({describe(content.left)} {symbols[content.operation]} {describe(content.right)})"
+    assert False, f"Unreachable in describe, bad type {type}"
+
+# the body of the program as one line of text per command, after folding
+def fold_body(declarations: str, body: str):
+    _, _, program = fold_program(*parse_program(f"""
+@declarations
+{declarations}
+@declarations
+
+@functions
+@functions
+
+@body
+{body}
+@body
+"""))
+    return [describe_command(command) for command in program]
+
+def describe_command(command) -> str:
+    type = command.type
+    content = command.content
+    if type == Change:
+        return f"change {content.variable} {describe(content.value)}"
+    if type == Show:
+        return f"show {describe(content.value)}"
+    if type == If:
+        return f"if {describe(content.condition)} {[describe_command(c) for c in content.true_part]} " \
+            + f"{[describe_command(c) for c in content.false_part]}"
+    if type == While:
+        return f"while {describe(content.condition)} {[describe_command(c) for c in content.body]}"
+    return type.__name__.lower()
+
+class TestFold(unittest.TestCase):
+    def test_changed_variables_are_kept(self):
+        self.assertEqual(fold_body("declare x 3", "change x 4\nshow 1 + 2 * x"), ["change x 4", "show (1 + (2 * x))"])
+
+    def test_constant_variables_are_propagated(self):
+        self.assertEqual(fold_body("declare x 3", "show 1 + 2 * x"), ["show 7"])
+        self.assertEqual(fold_body("declare x 3\ndeclare y !x * x!", "show y - 1"), ["show 8"])
+
+    def test_literal_operations_are_computed(self):
+        self.assertEqual(fold_body("declare x 3", "capture x\nshow 2 * 3 + x"), ["capture", "show (6 + x)"])
+        self.assertEqual(fold_body("", "show |1 < 2 and not |3 = 4||"), ["show true"])
+
+    def test_division_by_zero_is_left_to_fail_when_run(self):
+        self.assertEqual(fold_body("", "show !1 / 0!"), ["show (1 / 0)"])
+
+    def test_a_failing_right_side_is_kept(self):
+        body = "show |false and |!1 / 0! = 0||\nshow |true and |!1 / 0! = 0||"
+        self.assertEqual(fold_body("", body), ["show (false and ((1 / 0) = 0))", "show ((1 / 0) = 0)"])
+
+    def test_constant_conditions_pick_their_branch(self):
+        body = "if |1 < 2| {\n    show `yes`\n} {\n    show `no`\n}\nwhile |1 > 2| {\n    show `never`\n}"
+        self.assertEqual(fold_body("", body), ["show `yes`"])
+
+if __name__ == "__main__":
+    unittest.main()
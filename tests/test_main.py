@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+"""
+python3 -m unittest discover tests
+"""
+
+def program(body: str) -> str:
+    return f"@declarations\ndeclare a 0\n@declarations\n\n@functions\n@functions\n\n@body\n{body}\n@body\n"
+
+# runs main.py on source, returns the exit code, stdout and stderr
+def run_main(source: str, *arguments: str, input: str = ""):
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "program.ps")
+        with open(file_name, "w") as f:
+            f.write(source)
+        completed = subprocess.run([sys.executable, os.path.join(root_directory, "main.py"), file_name, *arguments],
+            input=input, capture_output=True, text=True, timeout=60)
+    return (completed.returncode, completed.stdout, completed.stderr)
+
+class TestErrors(unittest.TestCase):
+    def test_errors_are_one_line(self):
+        cases = [
+            (program("show !1 +!"), ["-interpret"], "ParseError: line 9, column 11: expected a value"),
+            (program("change b 1"), ["-vm"], "ResolveError: variable b is not declared"),
+            (program("show `before`"), ["-compile", "5"], "MemoryFault: memory fault: program of"),
+        ]
+        for source, arguments, message in cases:
+            code, _, error = run_main(source, *arguments)
+            self.assertEqual(code, 1, arguments)
+            self.assertEqual(len(error.splitlines()), 1, error)
+            self.assertTrue(error.startswith(message), error)
+
+    def test_output_comes_before_the_error(self):
+        # every run of deeper pushes onto the stack until it runs out of ram
+        source = "@declarations\ndeclare a 0\n@declarations\n\n@functions\nfunction deeper {\n    run deeper\n    show a\n}\n" \
+            + "@functions\n\n@body\nshow `before`\nrun deeper\n@body\n"
+        code, output, error = run_main(source, "-compile", "100")
+        self.assertEqual(code, 1)
+        self.assertEqual(output, "before\n")
+        self.assertTrue(error.startswith("MemoryFault"), error)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import glob
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from compiler.assembler import assemble
+from compiler.compiler import compile_program, format_compiled
+from compiler.computer import execute_program
+from compiler.object_file import ObjectFormatError, load_object, read_object, write_object
+from parsing.parse import parse
+from streams.streams import Streams, using_streams
+
+"""
+python3 -m unittest discover tests
+"""
+
+program_files = sorted(glob.glob(os.path.join(root_directory, "programs", "*.ps")))
+
+def compile_file(file_name: str):
+    return compile_program(assemble(*parse(file_name)))
+
+class TestObjectFile(unittest.TestCase):
+    def test_round_trip_with_symbols(self):
+        for file_name in program_files:
+            compiled = compile_file(file_name)
+            self.assertEqual(read_object(write_object(*compiled, keep_symbols=True)), compiled, file_name)
+
+    def test_round_trip_without_symbols(self):
+        for file_name in program_files:
+            instructions, data, _ = compile_file(file_name)
+            read = read_object(write_object(instructions, data, {"unused": 1}))
+            self.assertEqual(read, (instructions, data, {}), file_name)
+
+    def test_smaller_than_the_text(self):
+        for file_name in program_files:
+            instructions, data, symbols = compile_file(file_name)
+            text = "\n".join(format_compiled(instructions, data)).encode()
+            self.assertLess(len(write_object(instructions, data, symbols)), len(text), file_name)
+
+    def test_loaded_program_runs(self):
+        instructions, data, symbols = compile_file(os.path.join(root_directory, "programs", "factorial.ps"))
+        with tempfile.TemporaryDirectory() as directory:
+            object_file = os.path.join(directory, "factorial.o")
+            with open(object_file, "wb") as f:
+                f.write(write_object(instructions, data, symbols))
+            loaded_instructions, loaded_data, _ = load_object(object_file)
+        output = io.StringIO()
+        with using_streams(Streams(["5"], output)):
+            execute_program(loaded_instructions, loaded_data)
+        self.assertTrue(output.getvalue().endswith("120\n"), output.getvalue())
+
+    def test_corrupt_files_are_rejected(self):
+        valid = write_object(*compile_file(program_files[0]), keep_symbols=True)
+        for corrupt in [b"", b"PYS", b"ELF\x00\x02\x00", valid[:4] + bytes([99]) + valid[5:], valid[:len(valid) // 2]]:
+            with self.assertRaises(ObjectFormatError, msg=corrupt[:8]):
+                read_object(corrupt)
+
+if __name__ == "__main__":
+    unittest.main()
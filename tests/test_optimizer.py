@@ -0,0 +1,67 @@
+import io
+import os
+import sys
+import unittest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from compiler.assembler import assemble
+from compiler.compiler import compile_program
+from compiler.computer import execute_program
+from compiler.optimizer import optimize_with_report
+from parsing.parse import parse, parse_program
+from streams.streams import Streams, using_streams
+
+"""
+python3 -m unittest discover tests
+"""
+
+# the output of the compiled program, optimized or not
+def run_compiled(parsed, optimized: bool, lines=()) -> str:
+    assembled = assemble(*parsed)
+    if optimized:
+        assembled = optimize_with_report(assembled)[0]
+    instructions, data, _ = compile_program(assembled)
+    output = io.StringIO()
+    with using_streams(Streams(lines, output)):
+        execute_program(instructions, data)
+    return output.getvalue()
+
+quoted_source = """
+@declarations
+@declarations
+
+@functions
+@functions
+
+@body
+show `yes #~ not a comment ~# "q"`
+show `a "b" c`
+@body
+"""
+
+program_inputs = {
+    "collatz_recursive": ["97"],
+    "fizzbuzz": ["30"],
+    "palindromic_prime": ["200"],
+    "prime": ["100"]
+}
+
+class TestOptimizer(unittest.TestCase):
+    def test_strings_are_kept_whole(self):
+        output = run_compiled(parse_program(quoted_source), True)
+        self.assertEqual(output, 'yes #~ not a comment ~# "q"\na "b" c\n')
+
+    def test_optimized_programs_show_the_same(self):
+        for name, lines in program_inputs.items():
+            parsed = parse(os.path.join(root_directory, "programs", f"{name}.ps"))
+            self.assertEqual(run_compiled(parsed, True, lines), run_compiled(parsed, False, lines), name)
+
+    def test_instructions_are_saved(self):
+        parsed = parse(os.path.join(root_directory, "programs", "palindromic_prime.ps"))
+        _, report = optimize_with_report(assemble(*parsed))
+        self.assertLess(report.after, report.before)
+
+if __name__ == "__main__":
+    unittest.main()
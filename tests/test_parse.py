@@ -0,0 +1,80 @@
+import os
+import sys
+import unittest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from interpreter.interpreter import interpret_number
+from parsing.lexer import ParseError
+from parsing.parse import parse_program
+from parsing.parse_value import parse_number
+from tokenization.commands import Capture, Change, If, Run, Show, While
+
+"""
+python3 -m unittest discover tests
+"""
+
+class TestParseNumber(unittest.TestCase):
+    def test_signs(self):
+        # captured input is read with parse_number, which took "+5" as int() does before the parser was rewritten
+        cases = {"5": 5, "+5": 5, "-5": -5, "  +12 ": 12, "!3 + +4!": 7, "-!2 * 3!": -6}
+        for string, value in cases.items():
+            self.assertEqual(interpret_number(parse_number(string), {}), value, string)
+
+    def test_a_sign_needs_a_number(self):
+        for string in ["+", "-", "+true"]:
+            with self.assertRaises(ParseError, msg=string):
+                parse_number(string)
+
+def program(body: str, functions: str = "") -> str:
+    return f"@declarations\ndeclare x 0\ndeclare s `text`\n@declarations\n\n@functions\n{functions}\n@functions\n\n@body\n{body}\n@body\n"
+
+# the message of the ParseError which parsing source raises
+def get_error(source: str) -> str:
+    try:
+        parse_program(source)
+    except ParseError as error:
+        return str(error)
+    return ""
+
+class TestParseProgram(unittest.TestCase):
+    def test_sections(self):
+        functions = "function twice {\n    change x !x * 2!\n}"
+        declarations, parsed_functions, body = parse_program(program("capture x\nrun twice\nshow x", functions))
+        self.assertEqual([declaration.variable for declaration in declarations], ["x", "s"])
+        self.assertEqual([function.name for function in parsed_functions], ["twice"])
+        self.assertEqual([command.type for command in parsed_functions[0].body], [Change])
+        self.assertEqual([command.type for command in body], [Capture, Run, Show])
+
+    def test_blocks_and_positions(self):
+        body = "while |x < 3| {\n    if |x = 1| {\n        show x\n    } {\n    }\n    change x !x + 1!\n}"
+        _, _, commands = parse_program(program(body))
+        loop = commands[0]
+        self.assertEqual((loop.type, loop.line, loop.column), (While, 11, 1))
+        choice, change = loop.content.body
+        self.assertEqual((choice.type, choice.line, choice.column), (If, 12, 5))
+        self.assertEqual((change.type, change.line, change.column), (Change, 16, 5))
+        shown = choice.content.true_part[0]
+        self.assertEqual((shown.type, shown.line, shown.column), (Show, 13, 9))
+        self.assertEqual(choice.content.false_part, [])
+
+    def test_comments_keep_positions(self):
+        _, _, commands = parse_program(program("#~ a comment\nover lines ~# show x"))
+        self.assertEqual((commands[0].line, commands[0].column), (12, 15))
+
+    def test_errors_give_the_position(self):
+        cases = {
+            program("show !1 + !"): "line 11, column 12: expected a value",
+            program("shwo x"): "line 11, column 1: expected a command, found 'shwo'",
+            program("show `abc"): "line 11, column 6: unterminated string",
+            program("if |x = 1| {\n    show x\n"): "line 12, column 11: expected a command",
+            program("    show |x and 1|"): "line 11, column 13: and expects a boolean",
+            program("show x #~ c\nomment ~# show !1 +!"): "line 12, column 21: expected a value",
+            "@declarations\n@declarations\n@body\n@body\n": "line 3, column 1: expected @functions, found @body"
+        }
+        for source, message in cases.items():
+            self.assertTrue(get_error(source).startswith(message), (source, get_error(source)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import io
+import os
+import sys
+import unittest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from interpreter.interpreter import interpret
+from interpreter.profiler import BODY_NAME, Profile, profile_program
+from parsing.parse import parse_program
+from streams.streams import Streams, using_streams
+
+"""
+python3 -m unittest discover tests
+"""
+
+# counts down from the captured number, one tail call per step
+countdown_source = """
+@declarations
+declare n 0
+declare steps 0
+@declarations
+
+@functions
+function step {
+    change steps !steps + 1!
+}
+
+function countdown {
+    if |n > 0| {
+        change n !n - 1!
+        run step
+        run countdown
+    } {}
+}
+@functions
+
+@body
+capture n
+run countdown
+show steps
+@body
+"""
+
+class TestProfiler(unittest.TestCase):
+    def test_tail_calls_deeper_than_the_recursion_limit(self):
+        depth = sys.getrecursionlimit() + 1000
+        profile = Profile()
+        output = io.StringIO()
+        with using_streams(Streams([str(depth)], output)):
+            profile_program(*parse_program(countdown_source), profile)
+        self.assertEqual(output.getvalue(), f"{depth}\n")
+        self.assertEqual(profile.functions["countdown"][0], depth + 1)
+        self.assertEqual(profile.functions["step"][0], depth)
+        self.assertEqual(profile.functions[BODY_NAME][0], 1)
+        # the tail calls replace each other on the stack instead of nesting
+        self.assertTrue(all(stack.count("countdown;") <= 1 for stack in profile.stacks))
+
+    def test_output_matches_interpret(self):
+        outputs = []
+        for run in [interpret, lambda *program: profile_program(*program, Profile())]:
+            output = io.StringIO()
+            with using_streams(Streams(["25"], output)):
+                run(*parse_program(countdown_source))
+            outputs.append(output.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import os
+import sys
+import unittest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from folding.tail_calls import mark_tail_calls
+from interpreter.interpreter import interpret
+from interpreter.closures import interpret_closures
+from interpreter.machine import interpret_machine
+from vm.vm import interpret_vm
+from transpiler.transpile import interpret_transpiled
+from compiler.assembler import assemble
+from compiler.compiler import compile_program
+from compiler.computer import execute_program
+from parsing.parse import parse_program
+from streams.streams import Streams, using_streams
+from tokenization.commands import If, Run
+
+"""
+python3 -m unittest discover tests
+"""
+
+def interpret_compiled(declarations, functions, program):
+    instructions, data, _ = compile_program(assemble(declarations, functions, program))
+    execute_program(instructions, data)
+
+engines = [interpret, interpret_closures, interpret_machine, interpret_vm, interpret_transpiled, interpret_compiled]
+
+# counts down from the captured number, one tail call per step
+countdown_source = """
+@declarations
+declare n 0
+declare steps 0
+@declarations
+
+@functions
+function step {
+    change steps !steps + 1!
+}
+
+function countdown {
+    if |n > 0| {
+        change n !n - 1!
+        run step
+        run countdown
+    } {
+        skip
+    }
+}
+
+function loop {
+    while |n > 0| {
+        run countdown
+    }
+}
+@functions
+
+@body
+capture n
+run countdown
+show steps
+@body
+"""
+
+# the functions of the source by name with their runs as (name, tail)
+def get_runs(source: str):
+    _, functions, _ = parse_program(source)
+    return {function.name: collect_runs(function.body) for function in mark_tail_calls(functions)}
+
+def collect_runs(body):
+    runs = []
+    for command in body:
+        if command.type == Run:
+            runs.append((command.content.function, command.content.tail))
+        elif command.type == If:
+            runs.extend(collect_runs(command.content.true_part))
+            runs.extend(collect_runs(command.content.false_part))
+    return runs
+
+class TestTailCalls(unittest.TestCase):
+    def test_only_the_last_run_is_marked(self):
+        runs = get_runs(countdown_source)
+        self.assertEqual(runs["countdown"], [("step", False), ("countdown", True)])
+
+    # the body of a while runs again, so nothing in it is a tail call
+    def test_runs_in_a_while_are_not_marked(self):
+        _, functions, _ = parse_program(countdown_source)
+        loop = [function for function in mark_tail_calls(functions) if function.name == "loop"][0]
+        self.assertFalse(loop.body[0].content.body[0].content.tail)
+
+    def test_deeper_than_the_recursion_limit(self):
+        depth = sys.getrecursionlimit() + 1000
+        for engine in engines:
+            output = io.StringIO()
+            with using_streams(Streams([str(depth)], output)):
+                engine(*parse_program(countdown_source))
+            self.assertEqual(output.getvalue(), f"{depth}\n", engine.__name__)
+
+if __name__ == "__main__":
+    unittest.main()
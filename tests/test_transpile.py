@@ -0,0 +1,109 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+
+from interpreter.interpreter import interpret
+from parsing.parse import parse_program
+from streams.streams import Streams, using_streams
+from transpiler.transpile import interpret_transpiled, safe_name
+
+"""
+python3 -m unittest discover tests
+"""
+
+# the output of running source with engine
+def run(engine, source: str, lines=()) -> str:
+    output = io.StringIO()
+    with using_streams(Streams(lines, output)):
+        engine(*parse_program(source))
+    return output.getvalue()
+
+injected_source = """
+@declarations
+declare a 0
+declare a;__import__('os').system('touch\\x20pwned_marker');b 0
+declare a;b 5
+declare a_3b_b 7
+@declarations
+
+@functions
+function say;hi {
+    show `hi`
+}
+@functions
+
+@body
+run say;hi
+show a;b
+show a_3b_b
+@body
+"""
+
+class TestNames(unittest.TestCase):
+    def test_names_are_not_run_as_code(self):
+        directory = os.getcwd()
+        with tempfile.TemporaryDirectory() as temporary:
+            os.chdir(temporary)
+            try:
+                output = run(interpret_transpiled, injected_source)
+                self.assertFalse(os.path.exists("pwned_marker"))
+            finally:
+                os.chdir(directory)
+        self.assertEqual(output, run(interpret, injected_source))
+        self.assertEqual(output, "hi\n5\n7\n")
+
+    def test_safe_names_are_identifiers(self):
+        for name in ["number", "current_number", "a;b", "a.b()", "a_3b_b", "é"]:
+            self.assertTrue(f"v_{safe_name(name)}".isidentifier(), name)
+
+    def test_distinct_names_stay_distinct(self):
+        names = ["a;b", "a_3b_b", "a_3b__b", "a__b", "a_b", "ab"]
+        self.assertEqual(len(set(safe_name(name) for name in names)), len(names))
+
+failing_right_side_source = """
+@declarations
+declare z 0
+@declarations
+
+@functions
+@functions
+
+@body
+show `before`
+show |false and |!5 % z! = 0||
+@body
+"""
+
+class TestBooleans(unittest.TestCase):
+    # the right side of and and or is computed even when the left decides, as by the interpreter
+    def test_right_side_is_computed(self):
+        for engine in [interpret, interpret_transpiled]:
+            with self.assertRaises(ZeroDivisionError):
+                run(engine, failing_right_side_source)
+
+    def test_and_or_values(self):
+        source = """
+@declarations
+declare t 1
+@declarations
+
+@functions
+@functions
+
+@body
+show |t = 1 and t = 0|
+show |t = 1 or t = 0|
+show |t = 0 or t = 0|
+show |t = 1 and t = 1|
+@body
+"""
+        self.assertEqual(run(interpret_transpiled, source), "False\nTrue\nFalse\nTrue\n")
+        self.assertEqual(run(interpret_transpiled, source), run(interpret, source))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,10 +13,13 @@ class Declaration:
 
 # where type is one of CHANGE SHOW CAPTURE IF WHILE SKIP
 # where content is one of Change Show Capture If While Skip
+# where line and column are where the command starts in the source, 0 if unknown
 class Command:
-    def __init__(self, type: CommandTypes, content: CommandTypes):
+    def __init__(self, type: CommandTypes, content: CommandTypes, line: int = 0, column: int = 0):
         self.type = type
         self.content = content
+        self.line = line
+        self.column = column
     
 class Function:
     def __init__(self, name: str, body: List[Command]):
@@ -59,6 +62,8 @@ class Skip:
     def __init__(self):
         pass
 
+# where tail is whether the run is the last thing its function does, see folding/tail_calls.py
 class Run:
-    def __init__(self, function: Function):
+    def __init__(self, function: Function, tail: bool = False):
         self.function = function
+        self.tail = tail
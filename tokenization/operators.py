@@ -8,6 +8,22 @@ boolean_binary_operators = ["and", "or"]
 boolean_unary_operators = ["not"]
 boolean_comparison_operators = ["=", ">", "<"]
 
+# binding strength of each operator when brackets are left out, higher binds tighter
+# binary operators are left associative
+operator_precedence = {
+    "or": 1,
+    "and": 2,
+    "not": 3,
+    "=": 4,
+    ">": 4,
+    "<": 4,
+    "+": 5,
+    "-": 5,
+    "*": 6,
+    "/": 6,
+    "%": 6
+}
+
 def get_operation_type(op):
     operation_name_table = {
         "+": PLUS,
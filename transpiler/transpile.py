@@ -0,0 +1,227 @@
+from typing import Dict, List, Set
+from tokenization.commands import Capture, Change, Declaration, Command, Run, Show, Skip, While, If, Function
+from tokenization.enums import PLUS, MINUS, DIVIDE, MULTIPLY, MOD
+from tokenization.enums import AND, OR, NOT
+from tokenization.enums import EQUAL, NOTEQUAL, LESSTHAN, GREATERTHAN
+
+from tokenization.value import BBinary, BCompare, BLiteral, BUnary, Boolean, NBinary, NLiteral, NVariable, Number, String, Value
+
+from parsing.parse_value import parse_number
+from streams.streams import show, capture as capture_line
+from interpreter.interpreter import interpret_number
+from interpreter.resolve import resolve
+from folding.fold import fold_program, add_changed_variables
+from folding.tail_calls import mark_tail_calls
+
+# translates the AST to the source of a Python module which CPython compiles and runs
+#
+#   def run_program():
+#       v_i = 2                         declared variables are locals of run_program
+#       def f_increment_number():       functions are nested functions
+#           nonlocal v_i                which declare the variables they change
+#           v_i = (v_i + 1)
+#       while (v_i < v_number):
+#           f_increment_number()
+#
+# variables and functions are prefixed so they never clash with Python names, and escaped by safe_name
+# a function ending in a tail call returns the function to call next,
+# and every run of it calls the returned functions in a loop until one returns None
+
+PROGRAM_FUNCTION = "run_program"
+TAIL_CALL = "tail_call"
+INDENT = "    "
+
+number_operators = {
+    PLUS: "+",
+    MINUS: "-",
+    MULTIPLY: "*",
+    DIVIDE: "//",
+    MOD: "%"
+}
+
+comparison_operators = {
+    EQUAL: "==",
+    NOTEQUAL: "!=",
+    LESSTHAN: "<",
+    GREATERTHAN: ">"
+}
+
+# & and | on bools rather than and and or, so the right side is computed even when the left decides
+# as in every other engine, since it may still fail as in false and !1 / 0! = 0
+boolean_operators = {
+    AND: "&",
+    OR: "|"
+}
+
+def interpret_transpiled(declarations: List[Declaration], functions: List[Function], program: List[Command]):
+    run_python(transpile(declarations, functions, program))
+
+# compiles and runs the source of a module made by transpile
+def run_python(source: str, file_name: str = "<pyscript>"):
+    namespace = {"__name__": "pyscript"}
+    exec(compile(source, file_name, "exec"), namespace)
+    namespace[PROGRAM_FUNCTION]()
+
+# called by the generated module for capture, variables maps each variable name to its current value
+# since the input is a number expression which may use the program's variables
+def capture(variables: Dict[str, object]) -> int:
+    state = {variable: {"value": value} for variable, value in variables.items()}
+    return interpret_number(parse_number(capture_line()), state)
+
+def transpile(declarations: List[Declaration], functions: List[Function], program: List[Command]) -> str:
+    resolve(declarations, functions, program)
+    declarations, functions, program = fold_program(declarations, functions, program)
+    functions = mark_tail_calls(functions)
+    tail_callers = set(function.name for function in functions if has_tail_call(function.body))
+    variables = []
+    for declaration in declarations:
+        if declaration.variable not in variables:
+            variables.append(declaration.variable)
+
+    lines = [
+        "# generated from a PyScript program by transpiler/transpile.py",
+        "from transpiler.transpile import capture, show",
+        "",
+        f"def {PROGRAM_FUNCTION}():"
+    ]
+    for declaration in declarations:
+        lines.append(f"{INDENT}{variable_name(declaration.variable)} = {transpile_value(declaration.value)}")
+    for function in functions:
+        transpile_function(function, lines, tail_callers, variables)
+    transpile_body(program, lines, 1, tail_callers, variables)
+    lines.extend([
+        "",
+        "if __name__ == \"__main__\":",
+        f"{INDENT}{PROGRAM_FUNCTION}()",
+        ""
+    ])
+    return "\n".join(lines)
+
+def has_tail_call(body: List[Command]) -> bool:
+    if len(body) == 0:
+        return False
+    last = body[-1]
+    if last.type == Run:
+        return last.content.tail
+    if last.type == If:
+        return has_tail_call(last.content.true_part) or has_tail_call(last.content.false_part)
+    return False
+
+def variable_name(variable: str) -> str:
+    return f"v_{safe_name(variable)}"
+
+def function_name(function: str) -> str:
+    return f"f_{safe_name(function)}"
+
+# PyScript names may hold characters Python names cannot, as in a;b or a.b
+# so anything but an ASCII letter or digit is escaped, _ as __ and any other character as _<hex code>_
+# which makes distinct names stay distinct, and keeps them from ever reaching the source as code
+def safe_name(name: str) -> str:
+    result = []
+    for character in name:
+        if character.isascii() and character.isalnum():
+            result.append(character)
+        elif character == "_":
+            result.append("__")
+        else:
+            result.append(f"_{ord(character):x}_")
+    return "".join(result)
+
+# ----------------------------------------------------------------
+# transpile commands
+# ----------------------------------------------------------------
+def transpile_function(function: Function, lines: List[str], tail_callers: Set[str], variables: List[str]):
+    lines.append(f"{INDENT}def {function_name(function.name)}():")
+    changed = set()
+    add_changed_variables(function.body, changed)
+    if changed:
+        names = ", ".join(variable_name(variable) for variable in variables if variable in changed)
+        lines.append(f"{INDENT * 2}nonlocal {names}")
+    transpile_body(function.body, lines, 2, tail_callers, variables)
+
+def transpile_body(body: List[Command], lines: List[str], depth: int, tail_callers: Set[str], variables: List[str]):
+    if len(body) == 0:
+        lines.append(f"{INDENT * depth}pass")
+    for command in body:
+        transpile_command(command, lines, depth, tail_callers, variables)
+
+def transpile_command(command: Command, lines: List[str], depth: int, tail_callers: Set[str], variables: List[str]):
+    indent = INDENT * depth
+    type = command.type
+    content = command.content
+    if type == Change:
+        lines.append(f"{indent}{variable_name(content.variable)} = {transpile_value(content.value)}")
+    elif type == Show:
+        lines.append(f"{indent}show({transpile_value(content.value)})")
+    elif type == Capture:
+        current = ", ".join(f"{variable!r}: {variable_name(variable)}" for variable in variables)
+        lines.append(f"{indent}{variable_name(content.variable)} = capture({{{current}}})")
+    elif type == If:
+        lines.append(f"{indent}if {transpile_boolean(content.condition)}:")
+        transpile_body(content.true_part, lines, depth + 1, tail_callers, variables)
+        if len(content.false_part) > 0:
+            lines.append(f"{indent}else:")
+            transpile_body(content.false_part, lines, depth + 1, tail_callers, variables)
+    elif type == While:
+        lines.append(f"{indent}while {transpile_boolean(content.condition)}:")
+        transpile_body(content.body, lines, depth + 1, tail_callers, variables)
+    elif type == Skip:
+        lines.append(f"{indent}pass")
+    elif type == Run:
+        transpile_run(content, lines, indent, tail_callers)
+    else:
+        assert False, f"Unreachable in transpile_command, bad type {type}"
+
+def transpile_run(content: Run, lines: List[str], indent: str, tail_callers: Set[str]):
+    name = function_name(content.function)
+    if content.tail:
+        lines.append(f"{indent}return {name}")
+    elif content.function in tail_callers:
+        lines.append(f"{indent}{TAIL_CALL} = {name}()")
+        lines.append(f"{indent}while {TAIL_CALL} is not None:")
+        lines.append(f"{indent}{INDENT}{TAIL_CALL} = {TAIL_CALL}()")
+    else:
+        lines.append(f"{indent}{name}()")
+
+# ----------------------------------------------------------------
+# transpile values to Python expressions
+# ----------------------------------------------------------------
+def transpile_value(value: Value) -> str:
+    if value.type == String:
+        return repr(value.content.content)
+    elif value.type == Number:
+        return transpile_number(value.content)
+    elif value.type == Boolean:
+        return transpile_boolean(value.content)
+    else:
+        assert False, f"Unreachable in transpile_value, bad type {value.type}"
+
+def transpile_number(value: Number) -> str:
+    type = value.type
+    content = value.content
+    if type == NBinary:
+        operator = number_operators[content.operation]
+        return f"({transpile_number(content.left)} {operator} {transpile_number(content.right)})"
+    elif type == NLiteral:
+        return repr(content.value)
+    elif type == NVariable:
+        return variable_name(content.variable)
+    else:
+        assert False, f"Unreachable in transpile_number, bad type {type}"
+
+def transpile_boolean(value: Boolean) -> str:
+    type = value.type
+    content = value.content
+    if type == BCompare:
+        operator = comparison_operators[content.operation]
+        return f"({transpile_number(content.left)} {operator} {transpile_number(content.right)})"
+    elif type == BUnary:
+        assert content.operation == NOT, f"Unreachable in transpile_boolean, bad operation {content.operation}"
+        return f"(not {transpile_boolean(content.body)})"
+    elif type == BBinary:
+        operator = boolean_operators[content.operation]
+        return f"({transpile_boolean(content.left)} {operator} {transpile_boolean(content.right)})"
+    elif type == BLiteral:
+        return repr(content.value)
+    else:
+        assert False, f"Unreachable in transpile_boolean, bad type {type}"
@@ -0,0 +1,331 @@
+from typing import Dict, List, Tuple
+from tokenization.commands import Capture, Change, Declaration, Command, Run, Show, Skip, While, If, Function
+from tokenization.enums import PLUS, MINUS, DIVIDE, MULTIPLY, MOD as MODULO
+from tokenization.enums import AND, OR, NOT as NEGATE
+from tokenization.enums import EQUAL, NOTEQUAL, LESSTHAN, GREATERTHAN
+
+from tokenization.value import BBinary, BCompare, BLiteral, BUnary, Boolean, NBinary, NLiteral, NVariable, Number, String, Value
+
+from interpreter.resolve import Slots, get_slot, resolve
+from interpreter.closures import get_initial_state
+from folding.fold import fold_program
+from folding.tail_calls import mark_tail_calls
+from compiler.assembler import can_fail
+
+# compiles the AST to bytecode for the stack machine in vm/vm.py
+#
+# every instruction is two integers, an opcode and its argument (0 if it takes none)
+# * constants are indexes into bytecode.constants
+# * variables are the slots from resolve, indexes into the list of variables
+# * jumps are offsets from the instruction after the jump
+# * calls are the address of the first instruction of the function
+#
+# the program comes first and ends in HALT, each function follows it and ends in RETURN
+
+HALT = 0
+LOAD_CONST = 1          # push constants[argument]
+LOAD_VAR = 2            # push variables[argument]
+STORE_VAR = 3           # pop into variables[argument]
+ADD = 4                 # pop right, pop left, push left + right
+SUB = 5
+MUL = 6
+DIV = 7
+MOD = 8
+ADD_CONST = 9           # pop left, push left + constants[argument]
+SUB_CONST = 10
+EQ = 11                 # pop right, pop left, push left == right
+NE = 12
+LT = 13
+GT = 14
+NOT = 15                # pop a boolean, push the opposite
+JUMP = 16               # move by argument
+JUMP_IF_FALSE = 17      # pop, move by argument if it is false
+JUMP_IF_TRUE = 18       # pop, move by argument if it is true
+BINARY_AND = 19         # pop right, pop left, push left and right
+BINARY_OR = 20
+CALL = 21               # push the return address, go to argument
+TAIL_CALL = 22          # go to argument, returning to the current caller
+RETURN = 23             # go to the popped return address
+SHOW = 24               # pop and print
+CAPTURE = 25            # read a number into variables[argument]
+JUMP_IF_EQ = 26         # pop right, pop left, move by argument if left == right
+JUMP_IF_NE = 27
+JUMP_IF_LT = 28
+JUMP_IF_GE = 29
+
+op_names = {
+    HALT: "HALT", LOAD_CONST: "LOAD_CONST", LOAD_VAR: "LOAD_VAR", STORE_VAR: "STORE_VAR",
+    ADD: "ADD", SUB: "SUB", MUL: "MUL", DIV: "DIV", MOD: "MOD", ADD_CONST: "ADD_CONST", SUB_CONST: "SUB_CONST",
+    EQ: "EQ", NE: "NE", LT: "LT", GT: "GT", NOT: "NOT",
+    JUMP: "JUMP", JUMP_IF_FALSE: "JUMP_IF_FALSE", JUMP_IF_TRUE: "JUMP_IF_TRUE",
+    BINARY_AND: "BINARY_AND", BINARY_OR: "BINARY_OR",
+    CALL: "CALL", TAIL_CALL: "TAIL_CALL", RETURN: "RETURN", SHOW: "SHOW", CAPTURE: "CAPTURE",
+    JUMP_IF_EQ: "JUMP_IF_EQ", JUMP_IF_NE: "JUMP_IF_NE", JUMP_IF_LT: "JUMP_IF_LT", JUMP_IF_GE: "JUMP_IF_GE"
+}
+
+jump_ops = set([JUMP, JUMP_IF_FALSE, JUMP_IF_TRUE,
+    JUMP_IF_EQ, JUMP_IF_NE, JUMP_IF_LT, JUMP_IF_GE])
+call_ops = set([CALL, TAIL_CALL])
+
+number_ops = {
+    PLUS: ADD,
+    MINUS: SUB,
+    MULTIPLY: MUL,
+    DIVIDE: DIV,
+    MODULO: MOD
+}
+
+comparison_ops = {
+    EQUAL: EQ,
+    NOTEQUAL: NE,
+    LESSTHAN: LT,
+    GREATERTHAN: GT
+}
+
+class Bytecode:
+    def __init__(self, slots: Slots):
+        self.code = []          # opcode, argument, opcode, argument, ...
+        self.lines = []         # source line of each instruction, one per pair in code
+        self.constants = []
+        self.constant_indexes = {}  # (type, value) -> index in constants
+        self.slots = slots
+        self.variables = []     # initial value of each slot
+        self.functions = {}     # name -> address
+        self.calls = []         # (address of a call, name of the function), filled in once all functions are placed
+        self.line = 0           # line of the command being compiled
+
+    def emit(self, op: int, argument: int = 0) -> int:
+        self.code.append(op)
+        self.code.append(argument)
+        self.lines.append(self.line)
+        return len(self.code) - 2
+
+    def add_constant(self, value) -> int:
+        # bools are kept apart from the equal ints 0 and 1 since show prints them differently
+        key = (type(value), value)
+        if key not in self.constant_indexes:
+            self.constant_indexes[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constant_indexes[key]
+
+    def here(self) -> int:
+        return len(self.code)
+
+    def point_jump(self, address: int, target: int):
+        self.code[address + 1] = target - (address + 2)
+
+    # points the jump at address to the next instruction emitted
+    def patch_jump(self, address: int):
+        self.point_jump(address, self.here())
+
+def compile_bytecode(declarations: List[Declaration], functions: List[Function], program: List[Command]) -> Bytecode:
+    slots = resolve(declarations, functions, program)
+    declarations, functions, program = fold_program(declarations, functions, program)
+    bytecode = Bytecode(slots)
+    bytecode.variables = get_initial_state(declarations, slots)
+
+    compile_body(program, bytecode)
+    bytecode.emit(HALT)
+    for function in mark_tail_calls(functions):
+        bytecode.functions[function.name] = bytecode.here()
+        compile_body(function.body, bytecode)
+        bytecode.emit(RETURN)
+
+    for address, name in bytecode.calls:
+        bytecode.code[address + 1] = bytecode.functions[name]
+    return bytecode
+
+# ----------------------------------------------------------------
+# compile commands
+# ----------------------------------------------------------------
+def compile_body(body: List[Command], bytecode: Bytecode):
+    for command in body:
+        compile_command(command, bytecode)
+
+def compile_command(command: Command, bytecode: Bytecode):
+    type = command.type
+    content = command.content
+    bytecode.line = command.line
+    if type == Change:
+        compile_value(content.value, bytecode)
+        bytecode.emit(STORE_VAR, get_slot(content.variable, bytecode.slots))
+    elif type == Show:
+        compile_value(content.value, bytecode)
+        bytecode.emit(SHOW)
+    elif type == Capture:
+        bytecode.emit(CAPTURE, get_slot(content.variable, bytecode.slots))
+    elif type == If:
+        compile_if(content, bytecode)
+    elif type == While:
+        compile_while(content, bytecode, command.line)
+    elif type == Skip:
+        pass
+    elif type == Run:
+        address = bytecode.emit(TAIL_CALL if content.tail else CALL)
+        bytecode.calls.append((address, content.function))
+    else:
+        assert False, f"Unreachable in compile_command, bad type {type}"
+
+def compile_if(content: If, bytecode: Bytecode):
+    to_false = compile_branch(content.condition, bytecode, False)
+    compile_body(content.true_part, bytecode)
+    if len(content.false_part) > 0:
+        to_end = bytecode.emit(JUMP)
+        for address in to_false:
+            bytecode.patch_jump(address)
+        compile_body(content.false_part, bytecode)
+        bytecode.patch_jump(to_end)
+    else:
+        for address in to_false:
+            bytecode.patch_jump(address)
+
+# the condition is tested at the bottom so each iteration takes one jump
+#       JUMP test
+# body: ...
+# test: jump to body if the condition holds
+def compile_while(content: While, bytecode: Bytecode, line: int):
+    to_test = bytecode.emit(JUMP)
+    body = bytecode.here()
+    compile_body(content.body, bytecode)
+    bytecode.patch_jump(to_test)
+    bytecode.line = line
+    for address in compile_branch(content.condition, bytecode, True):
+        bytecode.point_jump(address, body)
+
+# ----------------------------------------------------------------
+# compile branches
+# ----------------------------------------------------------------
+# emits jumps taken when condition is when and falls through otherwise
+# returns the addresses of the jumps for the caller to point at their target
+def compile_branch(condition: Boolean, bytecode: Bytecode, when: bool) -> List[int]:
+    type = condition.type
+    content = condition.content
+    if type == BLiteral:
+        return [bytecode.emit(JUMP)] if content.value == when else []
+    elif type == BUnary and content.operation == NEGATE:
+        return compile_branch(content.body, bytecode, not when)
+    elif type == BCompare:
+        return [compile_compare_branch(content, bytecode, when)]
+    elif type == BBinary and not can_fail(content.right):
+        return compile_short_circuit(content, bytecode, when)
+    compile_boolean(condition, bytecode)
+    return [bytecode.emit(JUMP_IF_TRUE if when else JUMP_IF_FALSE)]
+
+# a > b is tested as b < a, so b is computed first like in the assembler
+def compile_compare_branch(compare: BCompare, bytecode: Bytecode, when: bool) -> int:
+    operation = compare.operation
+    left, right = compare.left, compare.right
+    if operation == GREATERTHAN:
+        operation = LESSTHAN
+        left, right = right, left
+    if operation == NOTEQUAL:
+        operation = EQUAL
+        when = not when
+
+    compile_number(left, bytecode)
+    compile_number(right, bytecode)
+    if operation == EQUAL:
+        return bytecode.emit(JUMP_IF_EQ if when else JUMP_IF_NE)
+    elif operation == LESSTHAN:
+        return bytecode.emit(JUMP_IF_LT if when else JUMP_IF_GE)
+    else:
+        assert False, f"Unreachable in compile_compare_branch, bad operation {operation}"
+
+# a and b jumps when both hold, or when either fails, and a or b the other way around
+# the right side is skipped when the left decides, so it is only used when the right side cannot fail
+def compile_short_circuit(value: BBinary, bytecode: Bytecode, when: bool) -> List[int]:
+    operation = value.operation
+    if operation == AND:
+        decided_by_left = False
+    elif operation == OR:
+        decided_by_left = True
+    else:
+        assert False, f"Unreachable in compile_short_circuit, bad operation {operation}"
+
+    if when == decided_by_left:
+        # the left alone can take the jump
+        return compile_branch(value.left, bytecode, when) + compile_branch(value.right, bytecode, when)
+    # the left alone can skip the jump
+    skips = compile_branch(value.left, bytecode, not when)
+    jumps = compile_branch(value.right, bytecode, when)
+    for address in skips:
+        bytecode.patch_jump(address)
+    return jumps
+
+# ----------------------------------------------------------------
+# compile values, each leaves its result on top of the stack
+# ----------------------------------------------------------------
+def compile_value(value: Value, bytecode: Bytecode):
+    if value.type == String:
+        bytecode.emit(LOAD_CONST, bytecode.add_constant(value.content.content))
+    elif value.type == Number:
+        compile_number(value.content, bytecode)
+    elif value.type == Boolean:
+        compile_boolean(value.content, bytecode)
+    else:
+        assert False, f"Unreachable in compile_value, bad type {value.type}"
+
+def compile_number(value: Number, bytecode: Bytecode):
+    type = value.type
+    if type == NBinary:
+        compile_nbinary(value.content, bytecode)
+    elif type == NLiteral:
+        bytecode.emit(LOAD_CONST, bytecode.add_constant(value.content.value))
+    elif type == NVariable:
+        bytecode.emit(LOAD_VAR, get_slot(value.content.variable, bytecode.slots))
+    else:
+        assert False, f"Unreachable in compile_number, bad type {type}"
+
+# x + 1 and x - 1 use the constant directly instead of pushing it
+def compile_nbinary(value: NBinary, bytecode: Bytecode):
+    op = number_ops[value.operation]
+    compile_number(value.left, bytecode)
+    if (op == ADD or op == SUB) and value.right.type == NLiteral:
+        constant = bytecode.add_constant(value.right.content.value)
+        bytecode.emit(ADD_CONST if op == ADD else SUB_CONST, constant)
+        return
+    compile_number(value.right, bytecode)
+    bytecode.emit(op)
+
+def compile_boolean(value: Boolean, bytecode: Bytecode):
+    type = value.type
+    content = value.content
+    if type == BCompare:
+        compile_number(content.left, bytecode)
+        compile_number(content.right, bytecode)
+        bytecode.emit(comparison_ops[content.operation])
+    elif type == BUnary:
+        assert content.operation == NEGATE, f"Unreachable in compile_boolean, bad operation {content.operation}"
+        compile_boolean(content.body, bytecode)
+        bytecode.emit(NOT)
+    elif type == BBinary:
+        compile_bbinary(content, bytecode)
+    elif type == BLiteral:
+        bytecode.emit(LOAD_CONST, bytecode.add_constant(content.value))
+    else:
+        assert False, f"Unreachable in compile_boolean, bad type {type}"
+
+# both sides are computed like in the interpreter, since the right side may still fail when the left decides
+def compile_bbinary(value: BBinary, bytecode: Bytecode):
+    operation = value.operation
+    if operation == AND:
+        op = BINARY_AND
+    elif operation == OR:
+        op = BINARY_OR
+    else:
+        assert False, f"Unreachable in compile_bbinary, bad operation {operation}"
+    compile_boolean(value.left, bytecode)
+    compile_boolean(value.right, bytecode)
+    bytecode.emit(op)
+
+# ----------------------------------------------------------------
+# helper functions
+# ----------------------------------------------------------------
+# (address, opcode, argument) of every instruction
+def get_instructions(bytecode: Bytecode) -> List[Tuple[int, int, int]]:
+    code = bytecode.code
+    return [(address, code[address], code[address + 1]) for address in range(0, len(code), 2)]
+
+# address -> function name
+def get_function_addresses(bytecode: Bytecode) -> Dict[int, str]:
+    return {address: name for name, address in bytecode.functions.items()}
@@ -0,0 +1,42 @@
+from vm.bytecode import Bytecode, LOAD_CONST, LOAD_VAR, STORE_VAR, ADD_CONST, SUB_CONST, CAPTURE
+from vm.bytecode import op_names, jump_ops, call_ops, get_instructions, get_function_addresses
+
+# lists bytecode one instruction per line for debugging
+#
+# @body
+#     line   address  op                     argument
+#        4         0  LOAD_CONST             0          (10)
+#        5         2  JUMP_IF_FALSE          6          (-> 10)
+#        6         4  CALL                   20         (fizzbuzz)
+
+constant_ops = set([LOAD_CONST, ADD_CONST, SUB_CONST])
+variable_ops = set([LOAD_VAR, STORE_VAR, CAPTURE])
+
+def disassemble(bytecode: Bytecode) -> str:
+    names = {slot: variable for variable, slot in bytecode.slots.items()}
+    function_addresses = get_function_addresses(bytecode)
+    lines = []
+
+    lines.append("constants:")
+    for index, constant in enumerate(bytecode.constants):
+        lines.append(f"    {index:>4}  {constant!r}")
+    lines.append("variables:")
+    for slot, value in enumerate(bytecode.variables):
+        lines.append(f"    {slot:>4}  {names[slot]} = {value!r}")
+
+    lines.append("@body")
+    for address, op, argument in get_instructions(bytecode):
+        if address in function_addresses:
+            lines.append(f"function {function_addresses[address]}")
+        line = bytecode.lines[address // 2]
+        text = f"    {line:>4} {address:>9}  {op_names[op]:<22}"
+        if op in constant_ops:
+            text += f" {argument:<10} ({bytecode.constants[argument]!r})"
+        elif op in variable_ops:
+            text += f" {argument:<10} ({names[argument]})"
+        elif op in jump_ops:
+            text += f" {argument:<10} (-> {address + 2 + argument})"
+        elif op in call_ops:
+            text += f" {argument:<10} ({function_addresses[argument]})"
+        lines.append(text.rstrip())
+    return "\n".join(lines)
@@ -0,0 +1,116 @@
+from typing import List
+from tokenization.commands import Declaration, Command, Function
+
+from parsing.parse_value import parse_number
+from streams.streams import capture, show
+from interpreter.closures import compile_number
+from vm.bytecode import Bytecode, compile_bytecode
+from vm.bytecode import HALT, LOAD_CONST, LOAD_VAR, STORE_VAR, ADD, SUB, MUL, DIV, MOD, ADD_CONST, SUB_CONST
+from vm.bytecode import EQ, NE, LT, GT, NOT, JUMP, JUMP_IF_FALSE, JUMP_IF_TRUE, BINARY_AND, BINARY_OR
+from vm.bytecode import JUMP_IF_EQ, JUMP_IF_NE, JUMP_IF_LT, JUMP_IF_GE, CALL, TAIL_CALL, RETURN, SHOW, CAPTURE
+
+# runs bytecode from vm/bytecode.py on a stack of values
+# calls keep their return addresses in a list, so call depth is limited only by memory
+
+def interpret_vm(declarations: List[Declaration], functions: List[Function], program: List[Command]):
+    run_bytecode(compile_bytecode(declarations, functions, program))
+
+# the dispatch loop, the most frequent ops are tested first
+def run_bytecode(bytecode: Bytecode):
+    code = bytecode.code
+    constants = bytecode.constants
+    variables = list(bytecode.variables)
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    returns = []
+    pc = 0
+    while True:
+        op = code[pc]
+        argument = code[pc + 1]
+        pc += 2
+        if op == LOAD_VAR:
+            push(variables[argument])
+        elif op == LOAD_CONST:
+            push(constants[argument])
+        elif op == STORE_VAR:
+            variables[argument] = pop()
+        elif op == JUMP_IF_LT:
+            right = pop()
+            if pop() < right:
+                pc += argument
+        elif op == JUMP_IF_GE:
+            right = pop()
+            if pop() >= right:
+                pc += argument
+        elif op == JUMP_IF_EQ:
+            right = pop()
+            if pop() == right:
+                pc += argument
+        elif op == JUMP_IF_NE:
+            right = pop()
+            if pop() != right:
+                pc += argument
+        elif op == JUMP_IF_FALSE:
+            if not pop():
+                pc += argument
+        elif op == JUMP_IF_TRUE:
+            if pop():
+                pc += argument
+        elif op == ADD_CONST:
+            stack[-1] += constants[argument]
+        elif op == SUB_CONST:
+            stack[-1] -= constants[argument]
+        elif op == LT:
+            right = pop()
+            stack[-1] = stack[-1] < right
+        elif op == GT:
+            right = pop()
+            stack[-1] = stack[-1] > right
+        elif op == EQ:
+            right = pop()
+            stack[-1] = stack[-1] == right
+        elif op == NE:
+            right = pop()
+            stack[-1] = stack[-1] != right
+        elif op == ADD:
+            right = pop()
+            stack[-1] += right
+        elif op == SUB:
+            right = pop()
+            stack[-1] -= right
+        elif op == MUL:
+            right = pop()
+            stack[-1] *= right
+        elif op == DIV:
+            right = pop()
+            stack[-1] //= right
+        elif op == MOD:
+            right = pop()
+            stack[-1] %= right
+        elif op == JUMP:
+            pc += argument
+        elif op == BINARY_AND:
+            right = pop()
+            stack[-1] = stack[-1] and right
+        elif op == BINARY_OR:
+            right = pop()
+            stack[-1] = stack[-1] or right
+        elif op == NOT:
+            stack[-1] = not stack[-1]
+        elif op == CALL:
+            returns.append(pc)
+            pc = argument
+        elif op == TAIL_CALL:
+            pc = argument
+        elif op == RETURN:
+            pc = returns.pop()
+        elif op == SHOW:
+            show(pop())
+        elif op == CAPTURE:
+            # the input is a number expression which may use the program's variables
+            variables[argument] = compile_number(parse_number(capture()), bytecode.slots)(variables)
+        elif op == HALT:
+            return
+        else:
+            assert False, f"Unreachable in run_bytecode, bad op {op} at {pc - 2}"